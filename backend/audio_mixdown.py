@@ -0,0 +1,142 @@
+import asyncio
+import concurrent.futures
+import logging
+import multiprocessing
+import os
+import shutil
+import subprocess
+import wave
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+MIXDOWN_SAMPLE_RATE = 48000
+
+
+def decode_audio(path: str, sample_rate: int = MIXDOWN_SAMPLE_RATE) -> np.ndarray:
+    """Decode an audio file to mono float32 samples in [-1, 1]"""
+    if path.endswith(".wav"):
+        with wave.open(path, "rb") as wav_file:
+            if wav_file.getframerate() == sample_rate and wav_file.getsampwidth() == 2:
+                frames = wav_file.readframes(wav_file.getnframes())
+                samples = np.frombuffer(frames, dtype="<i2").astype(np.float32) / 32768.0
+                channels = wav_file.getnchannels()
+                if channels > 1:
+                    samples = samples.reshape(-1, channels).mean(axis=1)
+                return samples
+
+    # Browser recordings are webm/opus: let ffmpeg resample and downmix
+    ffmpeg = shutil.which("ffmpeg")
+    if not ffmpeg:
+        raise RuntimeError("ffmpeg is required to decode recordings")
+
+    completed = subprocess.run(
+        [ffmpeg, "-v", "error", "-i", path, "-f", "f32le", "-ac", "1", "-ar", str(sample_rate), "-"],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        check=True
+    )
+    return np.frombuffer(completed.stdout, dtype="<f4")
+
+
+def mix_tracks(tracks: List[Tuple[np.ndarray, int, float]]) -> np.ndarray:
+    """Sum (samples, offset, gain) tracks into one buffer, normalizing only on overload"""
+    if not tracks:
+        return np.zeros(0, dtype=np.float32)
+
+    length = max(offset + len(samples) for samples, offset, _ in tracks)
+    mix = np.zeros(length, dtype=np.float32)
+
+    for samples, offset, gain in tracks:
+        mix[offset:offset + len(samples)] += samples * np.float32(gain)
+
+    peak = float(np.abs(mix).max()) if length else 0.0
+    if peak > 1.0:
+        mix /= peak
+    return mix
+
+
+def write_wav(path: str, samples: np.ndarray, sample_rate: int = MIXDOWN_SAMPLE_RATE) -> None:
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767.0).astype("<i2")
+    with wave.open(path, "wb") as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(pcm.tobytes())
+
+
+def run_mixdown(tracks: List[Dict[str, Any]], output_path: str, sample_rate: int = MIXDOWN_SAMPLE_RATE) -> Dict[str, Any]:
+    """Decode, align by start time, apply volumes and write the mix (runs in a worker process)"""
+    starts = [track["start"] for track in tracks]
+    origin = min(starts) if starts else 0.0
+
+    decoded = []
+    skipped = []
+    for track in tracks:
+        try:
+            samples = decode_audio(track["path"], sample_rate)
+        except Exception as e:
+            skipped.append({"path": os.path.basename(track["path"]), "error": str(e)})
+            continue
+        offset = int(round((track["start"] - origin) * sample_rate))
+        decoded.append((samples, offset, float(track.get("volume", 1.0))))
+
+    if not decoded:
+        raise RuntimeError("No decodable tracks to mix")
+
+    mix = mix_tracks(decoded)
+    write_wav(output_path, mix, sample_rate)
+
+    return {
+        "output_path": output_path,
+        "duration": int(round(len(mix) / sample_rate)),
+        "file_size": os.path.getsize(output_path),
+        "track_count": len(decoded),
+        "skipped": skipped
+    }
+
+
+class MixdownService:
+    """Runs recording mixdowns in a process pool, away from the event loop"""
+
+    def __init__(self, max_workers: Optional[int] = None, sample_rate: int = MIXDOWN_SAMPLE_RATE):
+        self.max_workers = max_workers or max(1, min(2, os.cpu_count() or 1))
+        self.sample_rate = sample_rate
+        self._pool: Optional[concurrent.futures.ProcessPoolExecutor] = None
+
+    @property
+    def pool(self) -> concurrent.futures.ProcessPoolExecutor:
+        if self._pool is None:
+            # Never fork the threaded server process (Motor, executors): spawn clean workers
+            self._pool = concurrent.futures.ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._pool
+
+    async def mixdown(self, recordings: List[Dict[str, Any]], paths: List[Path], output_path: Path) -> Dict[str, Any]:
+        """Mix recording documents (with their file paths) into output_path"""
+        tracks = []
+        for recording, path in zip(recordings, paths):
+            created_at = recording["created_at"]
+            start = created_at.timestamp() if isinstance(created_at, datetime) else float(created_at)
+            tracks.append({
+                "path": str(path),
+                "start": start,
+                "volume": recording.get("volume", 1.0)
+            })
+
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(self.pool, run_mixdown, tracks, str(output_path), self.sample_rate)
+
+        for skipped in result["skipped"]:
+            logging.warning(f"Mixdown skipped {skipped['path']}: {skipped['error']}")
+        logging.info(f"Mixdown written to {output_path.name}: {result['track_count']} tracks, {result['duration']}s")
+        return result
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
@@ -0,0 +1,97 @@
+import bisect
+import math
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Set, Tuple
+
+from song_catalog import song_identity, tokenize
+
+# Word positions indexed per title/artist: "garota de ipanema" is found from "gar", "de i" and "ipa"
+MAX_WORD_STARTS = 6
+
+
+class SongAutocomplete:
+    """Typeahead over song titles and artists backed by a sorted array.
+
+    Every word-start suffix of a title or artist (and title + artist) is
+    kept in one sorted list, so a prefix is a ``bisect`` plus a short scan.
+    Matches are ranked by how many rooms used the song, its popularity and
+    whether the prefix starts the title or artist. Songs are added and
+    replaced one at a time with ``insort``; nothing is rebuilt.
+    """
+
+    def __init__(self, max_scan: int = 2000):
+        self.max_scan = max_scan
+        self._keys: List[Tuple[str, str]] = []
+        self._phrases: Dict[str, List[str]] = {}
+        # Phrases that start the title or artist rather than a later word
+        self._heads: Dict[str, Set[str]] = {}
+        self.songs: Dict[str, Dict[str, Any]] = {}
+        self.uses: Counter = Counter()
+
+    def __len__(self) -> int:
+        return len(self.songs)
+
+    @staticmethod
+    def _song_phrases(song: Dict[str, Any]) -> Tuple[List[str], Set[str]]:
+        title = tokenize(song.get("title"))
+        artist = tokenize(song.get("artist"))
+        heads = {" ".join(title + artist), " ".join(title), " ".join(artist)}
+        phrases = set(heads)
+        for words in (title, artist):
+            for start in range(1, min(len(words), MAX_WORD_STARTS)):
+                phrases.add(" ".join(words[start:]))
+        phrases.discard("")
+        return sorted(phrases), heads
+
+    def add(self, song: Dict[str, Any]) -> None:
+        """Index or replace a song (same normalized title and artist)"""
+        if not song.get("title"):
+            return
+        key = song_identity(song)
+        for phrase in self._phrases.pop(key, ()):
+            index = bisect.bisect_left(self._keys, (phrase, key))
+            if index < len(self._keys) and self._keys[index] == (phrase, key):
+                del self._keys[index]
+        phrases, heads = self._song_phrases(song)
+        for phrase in phrases:
+            bisect.insort(self._keys, (phrase, key))
+        self._phrases[key] = phrases
+        self._heads[key] = heads
+        self.songs[key] = {
+            "id": song.get("id"),
+            "title": song["title"],
+            "artist": song.get("artist") or "",
+            "popularity": song.get("popularity") or 0
+        }
+
+    def add_many(self, songs: Iterable[Dict[str, Any]]) -> int:
+        count = 0
+        for song in songs:
+            self.add(song)
+            count += 1
+        return count
+
+    def record_use(self, song: Dict[str, Any], count: int = 1) -> None:
+        """Count a song being put in a room's playlist"""
+        self.uses[song_identity(song)] += count
+
+    def _score(self, key: str, starts_song: bool) -> float:
+        song = self.songs[key]
+        return 2 * math.log1p(self.uses[key]) + song["popularity"] / 50 + (1.0 if starts_song else 0.0)
+
+    def suggest(self, prefix: str, limit: int = 8) -> List[Dict[str, Any]]:
+        prefix = " ".join(tokenize(prefix))
+        if not prefix:
+            return []
+        matches: Dict[str, bool] = {}
+        index = bisect.bisect_left(self._keys, (prefix,))
+        end = min(len(self._keys), index + self.max_scan)
+        while index < end:
+            phrase, key = self._keys[index]
+            if not phrase.startswith(prefix):
+                break
+            matches[key] = matches.get(key, False) or phrase in self._heads[key]
+            index += 1
+
+        ranked = sorted(matches, key=lambda key: (-self._score(key, matches[key]), self.songs[key]["title"]))
+        return [{**self.songs[key], "uses": self.uses[key]} for key in ranked[:limit]]
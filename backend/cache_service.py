@@ -1,14 +1,38 @@
 import json
 import hashlib
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
 from motor.motor_asyncio import AsyncIOMotorDatabase
 import logging
+import time
 from datetime import datetime, timezone, timedelta
+import bson
+from metrics import registry
+from semantic_index import SemanticIndex, normalize_text
+from tracing import traced
+
+# Every lookup today is served by the Mongo collection; the label leaves room for more tiers
+CACHE_TIER = "mongo"
+
+cache_lookups = registry.counter("cache_lookups_total", "Cache lookups by type, tier and result (hit/similar/miss/stale/error)", ("cache_type", "tier", "result"))
+cache_lookup_latency = registry.histogram("cache_lookup_duration_seconds", "Cache lookup latency", ("cache_type", "tier"))
+cache_expirations = registry.counter("cache_expirations_total", "Cache entries removed because they expired", ("cache_type", "tier"))
+cache_writes = registry.counter("cache_writes_total", "Cache entries written", ("cache_type", "tier"))
+cache_write_bytes = registry.counter("cache_write_bytes_total", "BSON bytes written to the cache", ("cache_type", "tier"))
 
 class CacheService:
-    def __init__(self, db: AsyncIOMotorDatabase):
+    def __init__(self, db: AsyncIOMotorDatabase, similarity_threshold: float = 0.85):
         self.db = db
         self.cache_collection = db.ai_cache
+        # Earlier AI prompts, so near-duplicates ("Rock", "rock ", "róck") reuse their results
+        self.semantic_index = SemanticIndex(threshold=similarity_threshold)
+    
+    def _record_lookup(self, cache_type: str, result: str, start: float) -> None:
+        cache_lookups.inc(cache_type=cache_type, tier=CACHE_TIER, result=result)
+        cache_lookup_latency.observe(time.perf_counter() - start, cache_type=cache_type, tier=CACHE_TIER)
+    
+    def _record_write(self, cache_type: str, cache_item: Dict[str, Any]) -> None:
+        cache_writes.inc(cache_type=cache_type, tier=CACHE_TIER)
+        cache_write_bytes.inc(len(bson.encode(cache_item)), cache_type=cache_type, tier=CACHE_TIER)
         
     def _generate_cache_key(self, cache_type: str, data: Dict[str, Any]) -> str:
         """Generate a consistent cache key"""
@@ -19,63 +43,159 @@ class CacheService:
         cache_string = json.dumps(cache_data, sort_keys=True)
         return hashlib.md5(cache_string.encode()).hexdigest()
     
+    async def _fetch(self, cache_type: str, data: Dict[str, Any], max_age_hours: int) -> Tuple[Optional[Any], str]:
+        """(result, "hit"/"miss"/"stale") for the entry keyed on ``data``; expired entries are removed"""
+        cache_key = self._generate_cache_key(cache_type, data)
+        
+        cached_item = await self.cache_collection.find_one({"cache_key": cache_key})
+        
+        if cached_item:
+            # Check if cache is still valid
+            created_at = cached_item["created_at"]
+            if created_at.tzinfo is None:
+                # Mongo hands back naive UTC datetimes
+                created_at = created_at.replace(tzinfo=timezone.utc)
+            expiry_time = created_at + timedelta(hours=max_age_hours)
+            
+            if datetime.now(timezone.utc) < expiry_time:
+                logging.info(f"Cache HIT for {cache_type}: {cache_key[:10]}")
+                return cached_item["result"], "hit"
+            else:
+                # Cache expired, delete it
+                await self.cache_collection.delete_one({"cache_key": cache_key})
+                logging.info(f"Cache EXPIRED for {cache_type}: {cache_key[:10]}")
+                cache_expirations.inc(cache_type=cache_type, tier=CACHE_TIER)
+                return None, "stale"
+        
+        logging.info(f"Cache MISS for {cache_type}: {cache_key[:10]}")
+        return None, "miss"
+    
+    async def _store(self, cache_type: str, data: Dict[str, Any], result: Any, **extra: Any) -> None:
+        cache_key = self._generate_cache_key(cache_type, data)
+        
+        cache_item = {
+            "cache_key": cache_key,
+            "cache_type": cache_type,
+            "input_data": data,
+            "result": result,
+            "created_at": datetime.now(timezone.utc),
+            **extra
+        }
+        
+        # Upsert (update or insert)
+        await self.cache_collection.replace_one(
+            {"cache_key": cache_key},
+            cache_item,
+            upsert=True
+        )
+        
+        logging.info(f"Cache STORED for {cache_type}: {cache_key[:10]}")
+        self._record_write(cache_type, cache_item)
+    
+    @traced("cache.get", "cache", argument="cache_type")
     async def get_cached_result(self, cache_type: str, data: Dict[str, Any], max_age_hours: int = 24) -> Optional[Dict[str, Any]]:
         """Get cached result if exists and not expired"""
+        start = time.perf_counter()
         try:
-            cache_key = self._generate_cache_key(cache_type, data)
-            
-            cached_item = await self.cache_collection.find_one({"cache_key": cache_key})
-            
-            if cached_item:
-                # Check if cache is still valid
-                created_at = cached_item["created_at"]
-                expiry_time = created_at + timedelta(hours=max_age_hours)
-                
-                if datetime.now(timezone.utc) < expiry_time:
-                    logging.info(f"Cache HIT for {cache_type}: {cache_key[:10]}")
-                    return cached_item["result"]
-                else:
-                    # Cache expired, delete it
-                    await self.cache_collection.delete_one({"cache_key": cache_key})
-                    logging.info(f"Cache EXPIRED for {cache_type}: {cache_key[:10]}")
-            
-            logging.info(f"Cache MISS for {cache_type}: {cache_key[:10]}")
-            return None
+            result, outcome = await self._fetch(cache_type, data, max_age_hours)
+            self._record_lookup(cache_type, outcome, start)
+            return result
             
         except Exception as e:
             logging.error(f"Cache get error: {e}")
+            self._record_lookup(cache_type, "error", start)
             return None
     
+    @traced("cache.set", "cache", argument="cache_type")
     async def set_cached_result(self, cache_type: str, data: Dict[str, Any], result: Dict[str, Any]) -> None:
         """Store result in cache"""
         try:
-            cache_key = self._generate_cache_key(cache_type, data)
-            
-            cache_item = {
-                "cache_key": cache_key,
-                "cache_type": cache_type,
-                "input_data": data,
-                "result": result,
-                "created_at": datetime.now(timezone.utc)
-            }
-            
-            # Upsert (update or insert)
-            await self.cache_collection.replace_one(
-                {"cache_key": cache_key},
-                cache_item,
-                upsert=True
-            )
-            
-            logging.info(f"Cache STORED for {cache_type}: {cache_key[:10]}")
+            await self._store(cache_type, data, result)
+        except Exception as e:
+            logging.error(f"Cache set error: {e}")
+    
+    def _similar_key(self, cache_type: str, data: Dict[str, Any], text_field: str) -> Tuple[Dict[str, Any], Tuple]:
+        """Normalized cache data and the index namespace of the fields that must match exactly"""
+        canonical = {field: normalize_text(value) if isinstance(value, str) else value for field, value in data.items()}
+        exact = tuple(sorted((field, json.dumps(value, sort_keys=True)) for field, value in canonical.items() if field != text_field))
+        return canonical, (cache_type, text_field, exact)
+    
+    @traced("cache.get_similar", "cache", argument="cache_type")
+    async def get_similar_result(
+        self, cache_type: str, data: Dict[str, Any], text_field: str, max_age_hours: int = 24, threshold: Optional[float] = None
+    ) -> Optional[Any]:
+        """Cached result for ``data`` or for the closest earlier prompt.
+        
+        String fields are normalized (case, accents, punctuation, spacing)
+        before the exact lookup. On a miss, ``data[text_field]`` is matched
+        against earlier prompts with the same other fields, and a close
+        enough one answers instead.
+        """
+        start = time.perf_counter()
+        try:
+            canonical, namespace = self._similar_key(cache_type, data, text_field)
+            text = canonical[text_field]
+            result, outcome = await self._fetch(cache_type, canonical, max_age_hours)
+            if result is not None:
+                self.semantic_index.add(namespace, text, canonical)
+            else:
+                self.semantic_index.discard(namespace, text)
+                match = self.semantic_index.nearest(namespace, text, threshold)
+                if match is not None:
+                    similar_text, similar_data, score = match
+                    result, similar_outcome = await self._fetch(cache_type, similar_data, max_age_hours)
+                    if result is None:
+                        self.semantic_index.discard(namespace, similar_text)
+                    else:
+                        logging.info(f"Cache SIMILAR for {cache_type}: '{text}' ~ '{similar_text}' ({score:.2f})")
+                        outcome = "similar"
+            self._record_lookup(cache_type, outcome, start)
+            return result
             
+        except Exception as e:
+            logging.error(f"Cache get error: {e}")
+            self._record_lookup(cache_type, "error", start)
+            return None
+    
+    @traced("cache.set", "cache", argument="cache_type")
+    async def set_similar_result(self, cache_type: str, data: Dict[str, Any], text_field: str, result: Any) -> None:
+        """Store result under normalized ``data`` and index it for get_similar_result"""
+        try:
+            canonical, namespace = self._similar_key(cache_type, data, text_field)
+            await self._store(cache_type, canonical, result, similar_on=text_field)
+            self.semantic_index.add(namespace, canonical[text_field], canonical)
         except Exception as e:
             logging.error(f"Cache set error: {e}")
     
+    async def warm_semantic_index(self) -> int:
+        """Index the prompts of entries written by set_similar_result, e.g. after a restart"""
+        count = 0
+        try:
+            cursor = self.cache_collection.find(
+                {"similar_on": {"$exists": True}},
+                {"cache_type": 1, "input_data": 1, "similar_on": 1}
+            )
+            async for item in cursor:
+                _, namespace = self._similar_key(item["cache_type"], item["input_data"], item["similar_on"])
+                self.semantic_index.add(namespace, item["input_data"][item["similar_on"]], item["input_data"])
+                count += 1
+            logging.info(f"Semantic cache index warmed with {count} prompts")
+        except Exception as e:
+            logging.error(f"Semantic cache warm-up error: {e}")
+        return count
+    
     async def clear_expired_cache(self, max_age_hours: int = 72) -> int:
         """Clean up expired cache entries"""
         try:
             expiry_time = datetime.now(timezone.utc) - timedelta(hours=max_age_hours)
             
+            expired_counts = self.cache_collection.aggregate([
+                {"$match": {"created_at": {"$lt": expiry_time}}},
+                {"$group": {"_id": "$cache_type", "count": {"$sum": 1}}}
+            ])
+            async for expired in expired_counts:
+                cache_expirations.inc(expired["count"], cache_type=expired["_id"], tier=CACHE_TIER)
+            
             result = await self.cache_collection.delete_many({
                 "created_at": {"$lt": expiry_time}
             })
@@ -87,35 +207,115 @@ class CacheService:
             logging.error(f"Cache cleanup error: {e}")
             return 0
     
+    @traced("cache.get", "cache", argument="key")
+    async def get(self, key: str) -> Optional[str]:
+        """Key/value lookup used by ImprovedMusicService (values expire after their TTL)"""
+        cache_type = self._key_type(key)
+        start = time.perf_counter()
+        try:
+            cached_item = await self.cache_collection.find_one({"cache_key": key})
+            if not cached_item:
+                self._record_lookup(cache_type, "miss", start)
+                return None
+            
+            expires_at = cached_item.get("expires_at")
+            if expires_at is not None and expires_at.replace(tzinfo=timezone.utc) <= datetime.now(timezone.utc):
+                await self.cache_collection.delete_one({"cache_key": key})
+                cache_expirations.inc(cache_type=cache_type, tier=CACHE_TIER)
+                self._record_lookup(cache_type, "stale", start)
+                return None
+            
+            self._record_lookup(cache_type, "hit", start)
+            return cached_item["result"]
+        except Exception:
+            self._record_lookup(cache_type, "error", start)
+            raise
+    
+    @traced("cache.set", "cache", argument="key")
+    async def set(self, key: str, value: str, ttl: int) -> None:
+        """Store a key/value entry for ttl seconds"""
+        cache_type = self._key_type(key)
+        now = datetime.now(timezone.utc)
+        cache_item = {
+            "cache_key": key,
+            "cache_type": cache_type,
+            "result": value,
+            "created_at": now,
+            "expires_at": now + timedelta(seconds=ttl)
+        }
+        await self.cache_collection.replace_one({"cache_key": key}, cache_item, upsert=True)
+        self._record_write(cache_type, cache_item)
+    
+    @staticmethod
+    def _key_type(key: str) -> str:
+        # Keys look like "<type>_<md5>"
+        return key.rsplit("_", 1)[0] if "_" in key else key
+    
+    def get_live_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Hit/miss/stale counters, expirations, write bytes and lookup latency since startup"""
+        stats: Dict[str, Dict[str, Any]] = {}
+        
+        def entry(cache_type: str, tier: str) -> Dict[str, Any]:
+            return stats.setdefault(cache_type, {}).setdefault(tier, {
+                "hits": 0, "similar_hits": 0, "misses": 0, "stale_hits": 0, "errors": 0,
+                "expirations": 0, "writes": 0, "write_bytes": 0
+            })
+        
+        result_fields = {"hit": "hits", "similar": "similar_hits", "miss": "misses", "stale": "stale_hits", "error": "errors"}
+        for (cache_type, tier, result), count in list(cache_lookups.values.items()):
+            entry(cache_type, tier)[result_fields[result]] += int(count)
+        for (cache_type, tier), count in list(cache_expirations.values.items()):
+            entry(cache_type, tier)["expirations"] += int(count)
+        for (cache_type, tier), count in list(cache_writes.values.items()):
+            entry(cache_type, tier)["writes"] += int(count)
+        for (cache_type, tier), count in list(cache_write_bytes.values.items()):
+            entry(cache_type, tier)["write_bytes"] += int(count)
+        
+        for cache_type, tiers in stats.items():
+            for tier, values in tiers.items():
+                served = values["hits"] + values["similar_hits"]
+                lookups = served + values["misses"] + values["stale_hits"]
+                values["hit_ratio"] = round(served / lookups, 4) if lookups else None
+                for name, q in (("lookup_p50_seconds", 0.5), ("lookup_p95_seconds", 0.95)):
+                    bound = cache_lookup_latency.quantile(q, cache_type=cache_type, tier=tier)
+                    values[name] = None if bound == float("inf") else bound
+        return stats
+    
     async def get_cache_stats(self) -> Dict[str, Any]:
-        """Get cache statistics"""
+        """Get cache statistics with exact storage sizes"""
         try:
-            total_entries = await self.cache_collection.count_documents({})
+            coll_stats = await self.db.command("collStats", self.cache_collection.name)
             
-            # Count by type
+            # Exact BSON size per type
             pipeline = [
-                {"$group": {"_id": "$cache_type", "count": {"$sum": 1}}},
-                {"$sort": {"count": -1}}
+                {"$group": {
+                    "_id": "$cache_type",
+                    "count": {"$sum": 1},
+                    "bytes": {"$sum": {"$bsonSize": "$$ROOT"}}
+                }},
+                {"$sort": {"bytes": -1}}
             ]
             
             type_counts = {}
+            type_bytes = {}
             async for result in self.cache_collection.aggregate(pipeline):
                 type_counts[result["_id"]] = result["count"]
-            
-            # Calculate cache size (approximate)
-            sample = await self.cache_collection.find_one()
-            avg_size = len(json.dumps(sample).encode()) if sample else 0
-            estimated_size_mb = (total_entries * avg_size) / (1024 * 1024)
+                type_bytes[result["_id"]] = result["bytes"]
             
             return {
-                "total_entries": total_entries,
+                "total_entries": coll_stats.get("count", 0),
                 "type_counts": type_counts,
-                "estimated_size_mb": round(estimated_size_mb, 2)
+                "type_bytes": type_bytes,
+                "data_size_bytes": coll_stats.get("size", 0),
+                "storage_size_bytes": coll_stats.get("storageSize", 0),
+                "index_size_bytes": coll_stats.get("totalIndexSize", 0),
+                "avg_entry_bytes": coll_stats.get("avgObjSize", 0),
+                "live": self.get_live_stats()
             }
             
         except Exception as e:
             logging.error(f"Cache stats error: {e}")
-            return {"error": str(e)}
+            return {"error": str(e), "live": self.get_live_stats()}
 
 # Common cache types
 CACHE_TYPES = {
@@ -4,109 +4,41 @@ import hashlib
 import json
 import os
 from typing import Dict, List, Optional, Any, Tuple
-from emergentintegrations.llm.chat import LlmChat, UserMessage
 from datetime import datetime, timezone
+from pydantic import BaseModel, ConfigDict
+from llm_gateway import LLMGateway
+from song_catalog import SongCatalog
+from structured_output import StructuredOutputError, parse_structured
+
+
+class GeneratedSong(BaseModel):
+    """Song the model writes when no provider has it"""
+    model_config = ConfigDict(coerce_numbers_to_str=True)
+
+    title: str
+    artist: str
+    lyrics: str
+    chords: str = "C F G Am Dm"
+    genre: str = "Criação IA"
+    key: str = "C"
+    bpm: int = 120
+    duration: int = 240
 
 class ImprovedMusicService:
     """
     Serviço aprimorado de música com fallback por IA e cache inteligente
     """
     
-    def __init__(self, cache_service=None):
+    def __init__(self, cache_service=None, llm_gateway=None, catalog=None):
         self.cache_service = cache_service
         self.llm_key = os.getenv('EMERGENT_LLM_KEY')
+        self.llm_gateway = llm_gateway or LLMGateway(self.llm_key)
         
-        # Cache de letras conhecidas com cifras integradas (fallback quando APIs falham)
-        self.lyrics_database = {
-            "imagine": """
-            [C]Imagine there's no [Cmaj7]heaven
-            [F]It's easy if you [C]try
-            [C]No hell be[Cmaj7]low us
-            [F]Above us only [C]sky
-            [Am]Imagine [Dm]all the [G]people living for to[C]day
-            
-            [C]Imagine there's no [Cmaj7]countries
-            [F]It isn't hard to [C]do
-            [C]Nothing to kill or [Cmaj7]die for
-            [F]And no religion [C]too
-            [Am]Imagine [Dm]all the [G]people living life in [C]peace
-            
-            [F]You may say I'm a [G]dreamer
-            [C]But I'm not the [E7]only one
-            [F]I hope someday you'll [G]join us
-            [C]And the world will be as [G]one
-            
-            [C]Imagine no pos[Cmaj7]sessions
-            [F]I wonder if you [C]can
-            [C]No need for greed or [Cmaj7]hunger
-            [F]A brotherhood of [C]man
-            [Am]Imagine [Dm]all the [G]people sharing all the [C]world
-            
-            [F]You may say I'm a [G]dreamer
-            [C]But I'm not the [E7]only one
-            [F]I hope someday you'll [G]join us
-            [C]And the world will be as [G]one
-            """,
-            "yesterday": """
-            [F]Yesterday, all my [Em]troubles seemed so [A]far a[Dm]way
-            [Bb]Now it looks as [C]though they're here to [F]stay
-            Oh, [Dm]I be[G]lieve in [Bb]yester[F]day
-            
-            [F]Suddenly, [Em]I'm not [A]half the man I [Dm]used to be
-            [Bb]There's a shadow [C]hanging over [F]me
-            Oh, [Dm]yester[G]day came [Bb]sudden[F]ly
-            
-            [Em]Why she [A]had to [Dm]go I don't know, she [C]wouldn't [Dm]say
-            [Em]I said [A]something [Dm]wrong, now I [Bb]long for [F]yesterday
-            
-            [F]Yesterday, [Em]love was such an [A]easy game to [Dm]play
-            [Bb]Now I need a [C]place to hide a[F]way
-            Oh, [Dm]I be[G]lieve in [Bb]yester[F]day
-            
-            [Em]Why she [A]had to [Dm]go I don't know, she [C]wouldn't [Dm]say
-            [Em]I said [A]something [Dm]wrong, now I [Bb]long for [F]yesterday
-            
-            [F]Yesterday, [Em]love was such an [A]easy game to [Dm]play
-            [Bb]Now I need a [C]place to hide a[F]way
-            Oh, [Dm]I be[G]lieve in [Bb]yester[F]day
-            """,
-            "let_it_be": """
-            [C]When I find myself in [G]times of trouble
-            [Am]Mother Mary [F]comes to me
-            [C]Speaking words of [G]wisdom, let it [F]be [C]
-            
-            [C]And in my hour of [G]darkness
-            [Am]She is standing [F]right in front of me
-            [C]Speaking words of [G]wisdom, let it [F]be [C]
-            
-            [Am]Let it be, [G]let it be
-            [F]Let it be, [C]let it be
-            [G]Whisper words of [F]wisdom, let it [C]be
-            
-            [C]And when the broken-[G]hearted people
-            [Am]Living in the [F]world agree
-            [C]There will be an [G]answer, let it [F]be [C]
-            
-            [C]For though they may be [G]parted
-            [Am]There is still a [F]chance that they will see
-            [C]There will be an [G]answer, let it [F]be [C]
-            
-            [Am]Let it be, [G]let it be
-            [F]Let it be, [C]let it be
-            [G]Yeah, there will be an [F]answer, let it [C]be
-            
-            [Am]Let it be, [G]let it be
-            [F]Let it be, [C]let it be
-            [G]Whisper words of [F]wisdom, let it [C]be
-            """
-        }
-        
-        # Base de dados de acordes conhecidos
-        self.chords_database = {
-            "imagine": "C Cmaj7 F Am Dm G C/E G7",
-            "yesterday": "F Em A Dm Bb C F G7 C7",
-            "let_it_be": "C G Am F C G F C/E Dm C"
-        }
+        # Catálogo local indexado (letras e cifras conhecidas + músicas já salvas)
+        if catalog is None:
+            catalog = SongCatalog()
+            catalog.load_file()
+        self.catalog = catalog
     
     async def search_song_enhanced(self, query: str, artist: str = "") -> Dict[str, Any]:
         """
@@ -124,11 +56,8 @@ class ImprovedMusicService:
             except Exception as e:
                 logging.warning(f"Cache error: {e}")
         
-        # Normalizar query para busca no banco local
-        normalized_query = query.lower().replace(" ", "_").replace("-", "_")
-        
-        # Buscar primeiro no banco local (mais rápido)
-        local_result = self._search_local_database(normalized_query, artist)
+        # Buscar primeiro no catálogo local (mais rápido)
+        local_result = self._search_local_database(query, artist)
         if local_result:
             await self._cache_result(cache_key, local_result)
             return local_result
@@ -144,26 +73,23 @@ class ImprovedMusicService:
     
     def _search_local_database(self, query: str, artist: str) -> Optional[Dict[str, Any]]:
         """
-        Busca na base local de letras e acordes
+        Busca no catálogo local (índice invertido com BM25 e correção de grafia)
         """
-        # Buscar letras conhecidas
-        for key, lyrics in self.lyrics_database.items():
-            if query in key or key in query:
-                chords = self.chords_database.get(key, "C F G Am")
-                
-                return {
-                    "title": query.replace("_", " ").title(),
-                    "artist": artist or "Artista Desconhecido",
-                    "lyrics": lyrics.strip(),
-                    "chords": chords,
-                    "genre": "Rock/Pop",
-                    "key": "C",
-                    "bpm": 120,
-                    "duration": 240,
-                    "source": "local_database"
-                }
+        song = self.catalog.best_match(query, artist)
+        if not song:
+            return None
         
-        return None
+        return {
+            "title": song["title"],
+            "artist": song.get("artist") or artist or "Artista Desconhecido",
+            "lyrics": song.get("lyrics") or "",
+            "chords": song.get("chords") or "C F G Am",
+            "genre": song.get("genre") or "Rock/Pop",
+            "key": song.get("key") or "C",
+            "bpm": song.get("tempo") or 120,
+            "duration": round(song["duration_ms"] / 1000) if song.get("duration_ms") else 240,
+            "source": "local_database"
+        }
     
     async def _generate_song_by_ai(self, title: str, artist: str) -> Optional[Dict[str, Any]]:
         """
@@ -173,14 +99,7 @@ class ImprovedMusicService:
             if not self.llm_key:
                 return None
                 
-            chat = LlmChat(
-                api_key=self.llm_key,
-                session_id=f"song_gen_{hashlib.md5(f'{title}_{artist}'.encode()).hexdigest()}",
-                system_message="""Você é um especialista em música. Forneça informações REAIS sobre músicas quando possível. 
-                Se a música não existir, seja criativo mas indique claramente que é uma criação."""
-            ).with_model("openai", "gpt-5")
-            
-            message = UserMessage(text=f"""
+            response = await self.llm_gateway.complete(f"""
             Crie uma letra ORIGINAL inspirada no título "{title}" e artista "{artist}".
             
             IMPORTANTE: 
@@ -208,20 +127,18 @@ class ImprovedMusicService:
             Verso 2 (4 linhas)  
             Refrão (4 linhas)
             Ponte (4 linhas)
-            """)
-            
-            response = await chat.send_message(message)
+            """,
+                system_message="""Você é um especialista em música. Forneça informações REAIS sobre músicas quando possível. 
+                Se a música não existir, seja criativo mas indique claramente que é uma criação.""",
+                operation="song_generation"
+            )
             
             # Tentar extrair JSON da resposta
             try:
-                # Buscar JSON na resposta
-                import re
-                json_match = re.search(r'\{.*\}', response, re.DOTALL)
-                if json_match:
-                    song_data = json.loads(json_match.group())
-                    song_data["source"] = "ai_generated"
-                    return song_data
-            except Exception as e:
+                song_data = parse_structured(response, GeneratedSong).model_dump()
+                song_data["source"] = "ai_generated"
+                return song_data
+            except StructuredOutputError as e:
                 logging.error(f"Error parsing AI JSON response: {e}")
             
             # Se não conseguiu extrair JSON, criar manualmente
@@ -371,14 +288,7 @@ Que mexe com o coração"""
             if not self.llm_key:
                 return self._create_default_repertoire(genre, song_count)
                 
-            chat = LlmChat(
-                api_key=self.llm_key,
-                session_id=f"repertoire_{hashlib.md5(f'{genre}_{song_count}'.encode()).hexdigest()}",
-                system_message="""Você é um especialista em música que cria repertórios para bandas. 
-                Sugira músicas REAIS e populares que são adequadas para apresentações ao vivo."""
-            ).with_model("openai", "gpt-5")
-            
-            message = UserMessage(text=f"""
+            response = await self.llm_gateway.complete(f"""
             Crie um repertório de {song_count} músicas do gênero {genre} para uma banda tocar.
             
             Para cada música, forneça:
@@ -391,9 +301,12 @@ Que mexe com o coração"""
             Priorize músicas conhecidas e populares que o público reconheça.
             Formato de resposta: uma música por linha, no formato:
             "Título - Artista | Tom: X | BPM: Y | Acordes: acordes"
-            """)
-            
-            response = await chat.send_message(message)
+            """,
+                system_message="""Você é um especialista em música que cria repertórios para bandas. 
+                Sugira músicas REAIS e populares que são adequadas para apresentações ao vivo.""",
+                operation="repertoire",
+                priority="background"
+            )
             return self._parse_ai_repertoire_response(response, genre)
             
         except Exception as e:
@@ -0,0 +1,114 @@
+import asyncio
+import json
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Dict, List, Optional
+
+from metrics import registry
+from tracing import tracer
+
+PAYLOAD_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+upstream_requests = registry.counter(
+    "upstream_requests_total", "Upstream calls by provider, operation and outcome", ("provider", "operation", "outcome")
+)
+upstream_latency = registry.histogram(
+    "upstream_request_duration_seconds", "Upstream call latency by provider and operation", ("provider", "operation")
+)
+upstream_payload = registry.histogram(
+    "upstream_response_bytes", "Upstream response payload size", ("provider", "operation"), buckets=PAYLOAD_BUCKETS
+)
+
+
+def payload_size(payload: Any) -> int:
+    """Approximate wire size of an upstream response"""
+    if payload is None:
+        return 0
+    if isinstance(payload, (bytes, bytearray)):
+        return len(payload)
+    if isinstance(payload, str):
+        return len(payload.encode("utf-8"))
+    try:
+        return len(json.dumps(payload, default=str))
+    except (TypeError, ValueError):
+        return 0
+
+
+class UpstreamCall:
+    """Handle yielded by track_upstream; set ``payload`` to record its size"""
+
+    def __init__(self, provider: str, operation: str):
+        self.provider = provider
+        self.operation = operation
+        self.payload: Any = None
+        self.outcome = "ok"
+
+
+@asynccontextmanager
+async def track_upstream(provider: str, operation: str):
+    """Record latency, outcome (ok/timeout/error/cancelled) and payload size of an upstream call.
+
+    Whoever cancels a call may set ``outcome`` first ("timeout", "hedge_lost")
+    to record why; otherwise a cancellation is recorded as "cancelled".
+    """
+    call = UpstreamCall(provider, operation)
+    start = time.perf_counter()
+    try:
+        with tracer.span(f"{provider}.{operation}", "client", provider=provider):
+            yield call
+    except asyncio.TimeoutError:
+        call.outcome = "timeout"
+        raise
+    except asyncio.CancelledError:
+        # Callers that wait_for() a whole task cancel it on their own timeout
+        if call.outcome == "ok":
+            call.outcome = "cancelled"
+        raise
+    except Exception:
+        call.outcome = "error"
+        raise
+    finally:
+        upstream_latency.observe(time.perf_counter() - start, provider=provider, operation=operation)
+        upstream_requests.inc(provider=provider, operation=operation, outcome=call.outcome)
+        if call.outcome == "ok":
+            upstream_payload.observe(payload_size(call.payload), provider=provider, operation=operation)
+
+
+async def call_upstream(provider: str, operation: str, awaitable: Awaitable, timeout: Optional[float] = None) -> Any:
+    """Await an upstream call under an optional timeout, recording its metrics"""
+    async with track_upstream(provider, operation) as call:
+        if timeout is None:
+            call.payload = await awaitable
+        else:
+            call.payload = await asyncio.wait_for(awaitable, timeout=timeout)
+        return call.payload
+
+
+def _finite(value: Optional[float]) -> Optional[float]:
+    return None if value is None or value == float("inf") else value
+
+
+def upstream_summary() -> List[Dict[str, Any]]:
+    """Per provider/operation call counts, rates and latency percentiles for tuning timeouts"""
+    totals: Dict[tuple, Dict[str, float]] = {}
+    for (provider, operation, outcome), count in list(upstream_requests.values.items()):
+        totals.setdefault((provider, operation), {})[outcome] = count
+
+    summary = []
+    for (provider, operation), outcomes in sorted(totals.items()):
+        calls = sum(outcomes.values())
+        labels = {"provider": provider, "operation": operation}
+        summary.append({
+            "provider": provider,
+            "operation": operation,
+            "calls": int(calls),
+            "timeout_rate": round(outcomes.get("timeout", 0) / calls, 4) if calls else 0.0,
+            "error_rate": round(outcomes.get("error", 0) / calls, 4) if calls else 0.0,
+            "cancelled_rate": round(outcomes.get("cancelled", 0) / calls, 4) if calls else 0.0,
+            "hedge_lost_rate": round(outcomes.get("hedge_lost", 0) / calls, 4) if calls else 0.0,
+            "p50_seconds": _finite(upstream_latency.quantile(0.5, **labels)),
+            "p95_seconds": _finite(upstream_latency.quantile(0.95, **labels)),
+            "p99_seconds": _finite(upstream_latency.quantile(0.99, **labels)),
+            "p95_response_bytes": _finite(upstream_payload.quantile(0.95, **labels))
+        })
+    return summary
@@ -0,0 +1,82 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Set, Tuple
+
+from metrics import registry
+
+batch_size = registry.histogram(
+    "llm_batch_size", "Requests answered by one batched LLM call", ("operation",), buckets=(1, 2, 3, 4, 6, 8, 12, 16)
+)
+batch_joined = registry.counter("llm_batch_joined_total", "Requests that joined an identical request already waiting in a batch", ("operation",))
+
+
+class MicroBatcher:
+    """Collect concurrent requests for a short window and answer them with one call.
+
+    ``run_batch`` receives the waiting items in arrival order and returns
+    one entry per item: the value for that caller, or an exception instance
+    to raise in it alone. A batch is sent when ``window`` seconds have
+    passed since its first item or when it holds ``max_batch`` items.
+    Requests with the same key share one slot in the batch.
+    """
+
+    def __init__(
+        self,
+        run_batch: Callable[[List[Any]], Awaitable[List[Any]]],
+        max_batch: int = 8,
+        window: float = 0.03,
+        operation: str = "batch"
+    ):
+        self.run_batch = run_batch
+        self.max_batch = max_batch
+        self.window = window
+        self.operation = operation
+        self._pending: Dict[Hashable, Tuple[Any, asyncio.Future]] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._running: Set[asyncio.Task] = set()
+
+    async def submit(self, key: Hashable, item: Any) -> Any:
+        """Queue ``item`` for the next batch and wait for its own result"""
+        if key in self._pending:
+            batch_joined.inc(operation=self.operation)
+            future = self._pending[key][1]
+        else:
+            future = asyncio.get_running_loop().create_future()
+            self._pending[key] = (item, future)
+            if len(self._pending) >= self.max_batch:
+                self.flush()
+            elif self._timer is None:
+                self._timer = asyncio.get_running_loop().call_later(self.window, self.flush)
+        # A caller that gives up must not cancel the result for the others
+        return await asyncio.shield(future)
+
+    def flush(self) -> None:
+        """Send whatever is waiting now"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        batch = list(self._pending.values())
+        self._pending = {}
+        task = asyncio.create_task(self._run(batch))
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+
+    async def _run(self, batch: List[Tuple[Any, asyncio.Future]]) -> None:
+        batch_size.observe(len(batch), operation=self.operation)
+        try:
+            results = await self.run_batch([item for item, _ in batch])
+            if len(results) != len(batch):
+                raise RuntimeError(f"{self.operation} batch returned {len(results)} results for {len(batch)} items")
+        except Exception as e:
+            logging.warning(f"Batched {self.operation} failed for {len(batch)} items: {e!r}")
+            results = [e] * len(batch)
+
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
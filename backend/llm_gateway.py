@@ -0,0 +1,341 @@
+import asyncio
+import hashlib
+import heapq
+import itertools
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from instrumentation import call_upstream, track_upstream
+from metrics import registry
+from structured_output import parse_structured
+
+llm_in_flight = registry.gauge("llm_gateway_in_flight", "LLM completions currently running through the gateway")
+llm_queued = registry.gauge("llm_gateway_queued", "LLM completions waiting for a slot or a rate-limit token", ("priority",))
+llm_queue_wait = registry.histogram("llm_gateway_queue_seconds", "Time spent waiting for an LLM concurrency slot", ("operation",))
+llm_shed = registry.counter("llm_gateway_shed_total", "LLM completions rejected before reaching the provider", ("priority", "reason"))
+
+# Lower runs first: interactive work (the current song, live search) jumps
+# ahead of user-triggered generation, which jumps ahead of background work
+PRIORITIES = {"interactive": 0, "normal": 1, "background": 2}
+
+
+class LLMOverloaded(Exception):
+    """Shed by the gateway: the call could not start in time, so fall back now"""
+
+
+class TokenBucket:
+    """``rate`` tokens per second up to ``burst``"""
+
+    def __init__(self, rate: float, burst: float, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.tokens = burst
+        self.updated = clock()
+
+    def _refill(self) -> None:
+        now = self.clock()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self) -> float:
+        """Take a token and return 0, or return the seconds until one is available"""
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def wait_for(self, count: int) -> float:
+        """Seconds until ``count`` more tokens than now will have been available"""
+        self._refill()
+        return max(0.0, (count - self.tokens) / self.rate)
+
+
+def _default_chat_factory(api_key: str, session_id: str, system_message: str, provider: str, model: str):
+    from emergentintegrations.llm.chat import LlmChat
+    return LlmChat(api_key=api_key, session_id=session_id, system_message=system_message).with_model(provider, model)
+
+
+def _default_message_factory(text: str):
+    from emergentintegrations.llm.chat import UserMessage
+    return UserMessage(text=text)
+
+
+class LLMGateway:
+    """Single entry point for LLM completions.
+
+    Chat clients are pooled per (provider, model, system prompt) and reused
+    instead of being built per request; each one serves a single completion
+    at a time. Completions in flight are capped across the process, and an
+    optional token bucket limits how fast new ones start. Waiting calls are
+    started by priority, and calls that would wait past their timeout are
+    shed immediately so callers can use their fallback.
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str],
+        provider: str = "openai",
+        model: str = "gpt-5",
+        max_concurrency: int = 8,
+        pool_size: int = 4,
+        rate_per_second: Optional[float] = None,
+        burst: int = 10,
+        max_queue: int = 50,
+        background_slots: Optional[int] = None,
+        chat_factory: Callable[..., Any] = _default_chat_factory,
+        message_factory: Callable[[str], Any] = _default_message_factory
+    ):
+        self.api_key = api_key
+        self.provider = provider
+        self.model = model
+        self.max_concurrency = max_concurrency
+        self.pool_size = pool_size
+        self.chat_factory = chat_factory
+        self.message_factory = message_factory
+        self.bucket = TokenBucket(rate_per_second, burst) if rate_per_second else None
+        self.max_queue = max_queue
+        # Background work never takes the last slots, so interactive calls find one free
+        self.background_slots = background_slots if background_slots is not None else max(1, max_concurrency - 2)
+        self._queue: List[Tuple[int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self._wakeup: Optional[asyncio.TimerHandle] = None
+        self._average_duration: Optional[float] = None
+        self._idle: Dict[Tuple[str, str, str], List[Any]] = {}
+        self._history: Dict[int, int] = {}
+        self._created = 0
+        self._in_flight = 0
+        # Whether the last streamed call was read incrementally; None before any
+        self._provider_streaming: Optional[bool] = None
+
+    def _pool_key(self, system_message: str, model: Optional[str]) -> Tuple[str, str, str]:
+        return (self.provider, model or self.model, system_message)
+
+    def _checkout(self, key: Tuple[str, str, str]) -> Any:
+        idle = self._idle.get(key)
+        if idle:
+            return idle.pop()
+        provider, model, system_message = key
+        self._created += 1
+        digest = hashlib.md5(f"{provider}:{model}:{system_message}".encode()).hexdigest()[:8]
+        chat = self.chat_factory(self.api_key, f"gateway_{digest}_{self._created}", system_message, provider, model)
+        # LlmChat keeps the conversation on the instance; remember where it starts
+        messages = getattr(chat, "messages", None)
+        self._history[id(chat)] = len(messages) if isinstance(messages, list) else -1
+        return chat
+
+    def _checkin(self, key: Tuple[str, str, str], chat: Any) -> None:
+        baseline = self._history.get(id(chat), -1)
+        if baseline >= 0:
+            # Rewind so the next prompt does not carry this one's history
+            del chat.messages[baseline:]
+        idle = self._idle.setdefault(key, [])
+        if len(idle) < self.pool_size:
+            idle.append(chat)
+        else:
+            self._history.pop(id(chat), None)
+
+    def _can_start(self, rank: int) -> bool:
+        if self._in_flight >= self.max_concurrency:
+            return False
+        return rank < PRIORITIES["background"] or self._in_flight < self.background_slots
+
+    def _live_queue(self) -> List[Tuple[int, int, asyncio.Future]]:
+        return [entry for entry in self._queue if not entry[2].done()]
+
+    def _estimated_wait(self, rank: int) -> Optional[float]:
+        """Rough seconds before a new call of ``rank`` would start"""
+        ahead = sum(1 for entry_rank, _, future in self._queue if entry_rank <= rank and not future.done())
+        wait = 0.0
+        if self._average_duration is not None:
+            busy = ahead + self._in_flight - self.max_concurrency + 1
+            if busy > 0:
+                # Calls in flight are on average half done
+                rounds = (busy + self.max_concurrency - 1) // self.max_concurrency
+                wait = (rounds - 0.5) * self._average_duration
+        if self.bucket is not None:
+            wait = max(wait, self.bucket.wait_for(ahead + 1))
+        return wait
+
+    def _admit(self, priority: str, timeout: Optional[float]) -> None:
+        """Shed a call that cannot start in time, or evict queued lower-priority work for it"""
+        rank = PRIORITIES[priority]
+        if timeout is not None and self._estimated_wait(rank) > timeout:
+            llm_shed.inc(priority=priority, reason="deadline")
+            raise LLMOverloaded(f"LLM queue cannot start a {priority} call within {timeout}s")
+
+        live = self._live_queue()
+        if len(live) < self.max_queue:
+            return
+        worst = max(live, key=lambda entry: (entry[0], entry[1]))
+        if worst[0] <= rank:
+            llm_shed.inc(priority=priority, reason="queue_full")
+            raise LLMOverloaded("LLM queue is full")
+        evicted = next(name for name, value in PRIORITIES.items() if value == worst[0])
+        llm_shed.inc(priority=evicted, reason="preempted")
+        worst[2].set_exception(LLMOverloaded("Preempted by higher-priority LLM work"))
+
+    def _dispatch(self) -> None:
+        """Start queued calls, best priority first, while slots and tokens allow"""
+        self._wakeup = None
+        while self._queue:
+            rank, _, future = self._queue[0]
+            if future.done():
+                heapq.heappop(self._queue)
+                continue
+            if not self._can_start(rank):
+                return
+            if self.bucket is not None:
+                wait = self.bucket.take()
+                if wait > 0:
+                    self._wakeup = asyncio.get_running_loop().call_later(wait, self._dispatch)
+                    return
+            heapq.heappop(self._queue)
+            self._in_flight += 1
+            future.set_result(None)
+
+    def _update_queued_gauge(self) -> None:
+        for name, rank in PRIORITIES.items():
+            llm_queued.set(sum(1 for entry in self._queue if entry[0] == rank and not entry[2].done()), priority=name)
+
+    async def _acquire(self, priority: str, timeout: Optional[float]) -> None:
+        rank = PRIORITIES[priority]
+        self._admit(priority, timeout)
+        if not self._live_queue() and self._can_start(rank) and (self.bucket is None or self.bucket.take() == 0):
+            self._in_flight += 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (rank, next(self._sequence), future))
+        self._update_queued_gauge()
+        if self._wakeup is None:
+            self._dispatch()
+        try:
+            if timeout is None:
+                await asyncio.shield(future)
+            else:
+                await asyncio.wait_for(asyncio.shield(future), timeout=timeout)
+        except BaseException:
+            if future.done() and not future.cancelled() and future.exception() is None:
+                # Granted just as we gave up: hand the slot on
+                self._release()
+            else:
+                future.cancel()
+            raise
+        finally:
+            self._update_queued_gauge()
+
+    def _release(self) -> None:
+        self._in_flight -= 1
+        if self._wakeup is None:
+            self._dispatch()
+
+    @asynccontextmanager
+    async def _slot(self, operation: str, priority: str, timeout: Optional[float]):
+        start = time.perf_counter()
+        await self._acquire(priority, timeout)
+        waited = time.perf_counter() - start
+        llm_queue_wait.observe(waited, operation=operation)
+        llm_in_flight.inc()
+        try:
+            yield waited
+        finally:
+            duration = time.perf_counter() - start - waited
+            self._average_duration = duration if self._average_duration is None else 0.8 * self._average_duration + 0.2 * duration
+            llm_in_flight.dec()
+            self._release()
+
+    async def complete(
+        self,
+        prompt: str,
+        schema: Any = None,
+        timeout: Optional[float] = None,
+        *,
+        system_message: str,
+        operation: str = "completion",
+        model: Optional[str] = None,
+        priority: str = "normal"
+    ) -> Any:
+        """Send ``prompt`` and return the reply text.
+
+        With ``schema`` set (``dict``, ``list``, a Pydantic model or a type
+        such as ``List[Model]``) the JSON in the reply is extracted, repaired
+        and validated by ``parse_structured``, raising
+        ``StructuredOutputError`` when it cannot be. ``timeout`` covers waiting for a slot as well as the call;
+        ``LLMOverloaded`` is raised at once when the call would not start
+        in time or the queue is full.
+        """
+        key = self._pool_key(system_message, model)
+        async with self._slot(operation, priority, timeout) as waited:
+            chat = self._checkout(key)
+            try:
+                remaining = None if timeout is None else max(timeout - waited, 0.001)
+                text = await call_upstream(self.provider, operation, chat.send_message(self.message_factory(prompt)), timeout=remaining)
+            finally:
+                self._checkin(key, chat)
+
+        if schema is None:
+            return text
+        return parse_structured(text, schema)
+
+    async def stream(
+        self,
+        prompt: str,
+        timeout: Optional[float] = None,
+        *,
+        system_message: str,
+        operation: str = "completion",
+        model: Optional[str] = None,
+        priority: str = "normal"
+    ) -> AsyncIterator[str]:
+        """Yield the reply to ``prompt`` in pieces as the provider produces them.
+
+        Only clients with a ``stream_message`` method are read incrementally.
+        ``LlmChat`` has no streaming API, so with the default client the whole
+        reply arrives as a single piece once the completion is done and the
+        first piece comes no sooner than with ``complete``; ``stats`` reports
+        which case applies. ``timeout`` bounds the full reply, including
+        waiting for a slot.
+        """
+        key = self._pool_key(system_message, model)
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        async with self._slot(operation, priority, timeout):
+            chat = self._checkout(key)
+            try:
+                async with track_upstream(self.provider, operation) as call:
+                    message = self.message_factory(prompt)
+                    self._provider_streaming = hasattr(chat, "stream_message")
+                    if not self._provider_streaming:
+                        remaining = None if deadline is None else max(deadline - loop.time(), 0.001)
+                        call.payload = await asyncio.wait_for(chat.send_message(message), timeout=remaining)
+                        yield call.payload
+                        return
+
+                    pieces = []
+                    iterator = chat.stream_message(message).__aiter__()
+                    while True:
+                        remaining = None if deadline is None else max(deadline - loop.time(), 0.001)
+                        try:
+                            piece = await asyncio.wait_for(iterator.__anext__(), timeout=remaining)
+                        except StopAsyncIteration:
+                            break
+                        pieces.append(piece)
+                        yield piece
+                    call.payload = "".join(pieces)
+            finally:
+                self._checkin(key, chat)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self._in_flight,
+            "queued": len(self._live_queue()),
+            "average_duration_s": round(self._average_duration, 3) if self._average_duration is not None else None,
+            "tokens": round(self.bucket.tokens, 2) if self.bucket is not None else None,
+            "clients_created": self._created,
+            "idle_clients": sum(len(idle) for idle in self._idle.values()),
+            "provider_streaming": self._provider_streaming
+        }
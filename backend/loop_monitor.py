@@ -0,0 +1,130 @@
+import asyncio
+import collections
+import logging
+import sys
+import threading
+import time
+import traceback
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, List, Optional
+
+from metrics import registry, task_labels
+
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+loop_lag = registry.histogram("event_loop_lag_seconds", "Event loop scheduling delay", buckets=LAG_BUCKETS)
+loop_blocked = registry.counter("event_loop_blocked_total", "Stalls longer than the blocking threshold", ("label",))
+
+
+def _percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(q * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+class LoopMonitor:
+    """Samples event loop lag and reports what was running when the loop stalled.
+
+    A coroutine sleeps for ``interval`` and records how late it woke up. A
+    watchdog thread notices when that coroutine has not ticked for longer
+    than ``interval + threshold`` and grabs the loop thread's stack, so the
+    blocking call is logged while it is still blocking.
+    """
+
+    def __init__(self, interval: float = 0.25, threshold: float = 0.1, history: int = 1200, max_events: int = 50):
+        self.interval = interval
+        self.threshold = threshold
+        self.samples: Deque[float] = collections.deque(maxlen=history)
+        self.events: Deque[Dict[str, Any]] = collections.deque(maxlen=max_events)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._sampler: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop: Optional[threading.Event] = None
+        self._last_tick = 0.0
+        self._reported_tick = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self._sampler is not None and not self._sampler.done()
+
+    def start(self) -> None:
+        """Start sampling on the running loop (no-op when already running)"""
+        if self.enabled:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._last_tick = time.monotonic()
+        self._stop = threading.Event()
+        self._sampler = self._loop.create_task(self._sample())
+        self._watchdog = threading.Thread(target=self._watch, args=(self._stop,), name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+        logging.info(f"Loop monitor started (threshold {self.threshold * 1000:.0f}ms)")
+
+    def stop(self) -> None:
+        if self._stop is not None:
+            self._stop.set()
+        self._watchdog = None
+        if self._sampler is not None:
+            self._sampler.cancel()
+            self._sampler = None
+            logging.info("Loop monitor stopped")
+
+    async def _sample(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            self._last_tick = time.monotonic()
+            scheduled = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - scheduled - self.interval)
+            self.samples.append(lag)
+            loop_lag.observe(lag)
+
+    def _watch(self, stop: threading.Event) -> None:
+        while not stop.wait(min(self.interval, self.threshold) / 2):
+            last_tick = self._last_tick
+            stalled_for = time.monotonic() - last_tick - self.interval
+            if stalled_for > self.threshold and last_tick != self._reported_tick:
+                # Report each stall once, while it is still happening
+                self._reported_tick = last_tick
+                self._report(stalled_for)
+
+    def _report(self, stalled_for: float) -> None:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        stack = "".join(traceback.format_stack(frame)) if frame is not None else ""
+
+        task = asyncio.current_task(self._loop) if self._loop is not None else None
+        label = task_labels.get(task, "unlabelled") if task is not None else "loop callback"
+        coroutine = task.get_coro() if task is not None else None
+
+        event = {
+            "at": datetime.now(timezone.utc).isoformat(),
+            "stalled_ms": round(stalled_for * 1000, 1),
+            "label": label,
+            "coroutine": getattr(coroutine, "__qualname__", None),
+            "stack": stack
+        }
+        self.events.append(event)
+        loop_blocked.inc(label=label)
+        logging.warning(f"Event loop blocked for {event['stalled_ms']}ms+ in {label} ({event['coroutine']}):\n{stack}")
+
+    def stats(self) -> Dict[str, Any]:
+        samples = list(self.samples)
+        return {
+            "enabled": self.enabled,
+            "interval_ms": self.interval * 1000,
+            "threshold_ms": self.threshold * 1000,
+            "samples": len(samples),
+            "lag_ms": {
+                name: round(value * 1000, 2) if value is not None else None
+                for name, value in (
+                    ("p50", _percentile(samples, 0.5)),
+                    ("p95", _percentile(samples, 0.95)),
+                    ("p99", _percentile(samples, 0.99)),
+                    ("max", max(samples) if samples else None)
+                )
+            },
+            "blocking_events": list(self.events)
+        }
@@ -0,0 +1,246 @@
+import asyncio
+import bisect
+import threading
+import time
+import weakref
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{_escape(extra[1])}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0.0) + amount
+
+    def get(self, **labels) -> float:
+        return self.values.get(self._key(labels), 0.0)
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            items = sorted(self.values.items())
+        for key, value in items:
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self.values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key -> (per-bucket counts with a trailing +Inf slot, sum, count)
+        self.values: Dict[Tuple[str, ...], List] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self.values.get(key)
+            if entry is None:
+                entry = self.values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def count(self, **labels) -> int:
+        entry = self.values.get(self._key(labels))
+        return entry[2] if entry else 0
+
+    def quantile(self, q: float, **labels) -> Optional[float]:
+        """Upper bucket bound holding the q-th observation (None when empty)"""
+        entry = self.values.get(self._key(labels))
+        if not entry or not entry[2]:
+            return None
+        target = q * entry[2]
+        running = 0
+        for bound, bucket_count in zip(self.buckets + (float("inf"),), entry[0]):
+            running += bucket_count
+            if running >= target:
+                return bound
+        return float("inf")
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            items = sorted((key, [list(entry[0]), entry[1], entry[2]]) for key, entry in self.values.items())
+        for key, (counts, total, count) in items:
+            running = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                running += bucket_count
+                labels = _format_labels(self.labelnames, key, ("le", _format_value(bound)))
+                yield f"{self.name}_bucket{labels} {running}"
+            labels = _format_labels(self.labelnames, key)
+            yield f"{self.name}_sum{labels} {_format_value(total)}"
+            yield f"{self.name}_count{labels} {count}"
+
+
+class MetricsRegistry:
+    """Process-local metric registry rendered in the Prometheus text format"""
+
+    def __init__(self):
+        self.metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name: str, documentation: str, labelnames: Sequence[str], **kwargs) -> _Metric:
+        with self._lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = cls(name, documentation, labelnames, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} is already registered as a {metric.kind}")
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self.metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+# Shared by the server and the service modules
+registry = MetricsRegistry()
+
+http_requests = registry.counter("http_requests_total", "HTTP requests by route, method and status", ("method", "route", "status"))
+http_latency = registry.histogram("http_request_duration_seconds", "HTTP request latency by route", ("method", "route"))
+http_in_flight = registry.gauge("http_requests_in_flight", "HTTP requests currently being served", ("method",))
+socketio_events = registry.counter("socketio_events_total", "Socket.IO events handled by event and outcome", ("event", "outcome"))
+socketio_latency = registry.histogram("socketio_event_duration_seconds", "Socket.IO handler latency by event", ("event",))
+
+
+# What each task is serving (route or Socket.IO event), for tools that sample the loop
+task_labels: "weakref.WeakKeyDictionary[asyncio.Task, str]" = weakref.WeakKeyDictionary()
+
+
+def label_current_task(label: str) -> None:
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:
+        return
+    if task is not None:
+        task_labels[task] = label
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording per-route latency, status codes and in-flight requests.
+
+    Routes are labelled with their path template (``/api/rooms/{room_id}``)
+    so ids never explode the label set; unmatched paths share one label.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status_code[0] = message["status"]
+            await send(message)
+
+        label_current_task(f"{method} {scope['path']}")
+        http_in_flight.inc(method=method)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            http_in_flight.dec(method=method)
+            # The router stores the matched route in the (shared) scope
+            route = scope.get("route")
+            route_label = getattr(route, "path", None) or "unmatched"
+            http_requests.inc(method=method, route=route_label, status=str(status_code[0]))
+            http_latency.observe(elapsed, method=method, route=route_label)
+
+
+def instrument_socketio(sio) -> None:
+    """Count and time every Socket.IO event handled by ``sio``"""
+    trigger_event = sio._trigger_event
+
+    async def timed_trigger_event(event, namespace, *args):
+        label_current_task(f"socketio:{event}")
+        start = time.perf_counter()
+        outcome = "ok"
+        try:
+            return await trigger_event(event, namespace, *args)
+        except Exception:
+            outcome = "error"
+            raise
+        finally:
+            socketio_events.inc(event=event, outcome=outcome)
+            socketio_latency.observe(time.perf_counter() - start, event=event)
+
+    sio._trigger_event = timed_trigger_event
@@ -2,18 +2,61 @@ import spotipy
 import aiohttp
 import asyncio
 import lyricsgenius
-import json
 import os
 import logging
-import hashlib
 from spotipy.oauth2 import SpotifyClientCredentials
-from typing import Dict, List, Optional, Any
-from emergentintegrations.llm.chat import LlmChat, UserMessage
-import concurrent.futures
+from typing import AsyncIterator, Dict, List, Optional, Any, Tuple
 import threading
+from pydantic import BaseModel, ConfigDict, field_validator
+from instrumentation import track_upstream
+from llm_batcher import MicroBatcher
+from llm_gateway import LLMGateway, LLMOverloaded
+from resilience import Bulkhead, CircuitBreaker, CircuitOpen, ProviderGuard
+from search_orchestrator import SearchOrchestrator, SearchSource
+from structured_output import StructuredOutputError
+
+
+class ChordChart(BaseModel):
+    """Chord chart the model writes for a song no provider knows"""
+    lyrics_with_chords: Optional[str] = None
+    chords: Optional[str] = None
+    key: Optional[str] = None
+    genre: Optional[str] = None
+    tempo: Optional[int] = None
+    structure: Optional[str] = None
+
+    @field_validator("tempo", mode="before")
+    @classmethod
+    def round_tempo(cls, value):
+        # "120 BPM", 120.0 and "bpm_numerico" all show up in practice
+        if isinstance(value, str):
+            digits = "".join(char for char in value if char.isdigit())
+            return int(digits) if digits else None
+        return round(value) if isinstance(value, float) else value
+
+
+class NumberedChordChart(ChordChart):
+    """Chord chart for the ``n``-th song of a batched prompt"""
+    n: Optional[int] = None
+
+
+class SongSuggestion(BaseModel):
+    """One song returned by the AI search"""
+    model_config = ConfigDict(coerce_numbers_to_str=True)
+
+    title: str
+    artist: str
+    genre: str = "Popular"
+    year: str = ""
+    popularity: int = 5
+
+    @field_validator("popularity", mode="before")
+    @classmethod
+    def round_popularity(cls, value):
+        return round(value) if isinstance(value, float) else value
 
 class MusicAPIService:
-    def __init__(self, cache_service=None):
+    def __init__(self, cache_service=None, llm_gateway=None, catalog=None):
         # Spotify
         self.spotify_client_id = os.getenv('SPOTIFY_CLIENT_ID')
         self.spotify_client_secret = os.getenv('SPOTIFY_CLIENT_SECRET')
@@ -26,16 +69,61 @@ class MusicAPIService:
         
         # Emergency LLM
         self.llm_key = os.getenv('EMERGENT_LLM_KEY')
+        self.llm_gateway = llm_gateway or LLMGateway(self.llm_key)
         
         # Cache service
         self.cache_service = cache_service
         
-        # Thread pool for parallel processing
-        self.thread_pool = concurrent.futures.ThreadPoolExecutor(max_workers=3)
+        # Local song catalog, searched alongside Spotify
+        self.catalog = catalog
+        
+        # Concurrent AI fallbacks are answered by one prompt
+        self.fallback_batcher = MicroBatcher(
+            self._generate_ai_fallback_batch,
+            max_batch=int(os.getenv('AI_FALLBACK_BATCH_SIZE', '8')),
+            window=float(os.getenv('AI_FALLBACK_BATCH_WINDOW_MS', '30')) / 1000,
+            operation="song_fallback"
+        )
+        
+        # A failing or slow provider is skipped until a probe call succeeds again. Each blocking
+        # client gets its own bounded threads, so a hung Genius cannot starve Spotify
+        failure_threshold = int(os.getenv('PROVIDER_FAILURE_THRESHOLD', '5'))
+        reset_timeout = float(os.getenv('PROVIDER_RESET_SECONDS', '30'))
+        threads = int(os.getenv('UPSTREAM_THREADS', '4'))
+        self.spotify_guard = ProviderGuard(
+            "spotify", timeout=3.0,
+            breaker=CircuitBreaker("spotify", failure_threshold, reset_timeout),
+            bulkhead=Bulkhead("spotify", threads)
+        )
+        self.genius_guard = ProviderGuard(
+            "genius", timeout=5.0,
+            breaker=CircuitBreaker("genius", failure_threshold, reset_timeout),
+            bulkhead=Bulkhead("genius", threads)
+        )
         
         # Initialize services
         self._init_spotify()
         self._init_genius()
+        self.search_orchestrator = self._build_search_orchestrator()
+    
+    def provider_health(self) -> List[Dict[str, Any]]:
+        return [self.spotify_guard.health(), self.genius_guard.health()]
+    
+    def _build_search_orchestrator(self) -> SearchOrchestrator:
+        """Catalog and Spotify at once; AI joins if they are slow or come up short"""
+        # Source timeouts are backstops; each provider guard has its own
+        sources = []
+        if self.catalog is not None:
+            sources.append(SearchSource("catalog", self._catalog_intelligent_search, timeout=0.5))
+        sources.append(SearchSource("spotify", self._spotify_intelligent_search, timeout=3.5))
+        sources.append(SearchSource(
+            "ai",
+            self._ai_intelligent_search_fast,
+            timeout=5.5,
+            speculative=True,
+            delay=float(os.getenv('AI_SEARCH_SPECULATIVE_DELAY_MS', '800')) / 1000
+        ))
+        return SearchOrchestrator(sources, limit=8, enough=int(os.getenv('SEARCH_ENOUGH_RESULTS', '3')))
     
     def _init_spotify(self):
         """Initialize Spotify client"""
@@ -120,13 +208,10 @@ class MusicAPIService:
             if spotify_data:
                 result.update(spotify_data)
             
-            # Wait for Genius with timeout
-            try:
-                genius_data = await asyncio.wait_for(genius_task, timeout=5.0)
-                if genius_data:
-                    result.update(genius_data)
-            except asyncio.TimeoutError:
-                logging.warning(f"Genius API timeout for {title} by {artist}")
+            # Genius is bounded by its guard: 5s at most, nothing while its circuit is open
+            genius_data = await genius_task
+            if genius_data:
+                result.update(genius_data)
             
             # 3. Generate AI fallback if needed (only for missing chords)
             if not result.get("chords") or not result.get("lyrics"):
@@ -156,7 +241,9 @@ class MusicAPIService:
         try:
             # Search for the track
             query = f'track:"{title}" artist:"{artist}"'
-            results = self.spotify.search(q=query, type='track', limit=1)
+            results = await self.spotify_guard.call_blocking(
+                "search", lambda: self.spotify.search(q=query, type='track', limit=1)
+            )
             
             if results['tracks']['items']:
                 track = results['tracks']['items'][0]
@@ -164,8 +251,10 @@ class MusicAPIService:
                 # Get audio features
                 audio_features = None
                 try:
-                    audio_features = self.spotify.audio_features(track['id'])[0]
-                except:
+                    audio_features = (await self.spotify_guard.call_blocking(
+                        "audio_features", lambda: self.spotify.audio_features(track['id'])
+                    ))[0]
+                except Exception:
                     pass
                 
                 # Extract data
@@ -191,6 +280,10 @@ class MusicAPIService:
                 logging.info(f"Found Spotify data for {title} by {artist}")
                 return spotify_data
                 
+        except CircuitOpen:
+            logging.info(f"Spotify skipped for {title} by {artist}: circuit open")
+        except asyncio.TimeoutError:
+            logging.warning(f"Spotify API timeout for {title} by {artist}")
         except Exception as e:
             logging.error(f"Spotify search error: {e}")
         
@@ -203,7 +296,7 @@ class MusicAPIService:
         
         try:
             # Search for song
-            song = self.genius.search_song(title, artist)
+            song = await self.genius_guard.call_blocking("search_song", lambda: self.genius.search_song(title, artist))
             
             if song and song.lyrics:
                 # Clean up lyrics
@@ -218,6 +311,10 @@ class MusicAPIService:
                     "artist": song.artist
                 }
                 
+        except CircuitOpen:
+            logging.info(f"Genius skipped for {title} by {artist}: circuit open")
+        except asyncio.TimeoutError:
+            logging.warning(f"Genius API timeout for {title} by {artist}")
         except Exception as e:
             logging.error(f"Genius lyrics error: {e}")
         
@@ -236,15 +333,28 @@ class MusicAPIService:
                 return cached_ai
         
         try:
-            chat = LlmChat(
-                api_key=self.llm_key,
-                session_id=f"fast_music_{hashlib.md5(f'{title}{artist}'.encode()).hexdigest()[:8]}",
-                system_message="Você é um músico profissional. Responda de forma rápida e concisa."
-            ).with_model("openai", "gpt-5")
-            
-            # Shorter, more focused prompt for speed
-            message = UserMessage(
-                text=f"""Música: "{title}" de "{artist}"
+            # Songs looked up at the same time (a repertoire being added) share one prompt
+            return await self.fallback_batcher.submit((title.lower(), artist.lower()), (title, artist))
+                
+        except StructuredOutputError as e:
+            logging.warning(f"AI returned unusable JSON ({e}), using basic fallback")
+            return self._get_basic_structure(title, artist)
+        except LLMOverloaded:
+            logging.warning(f"LLM queue busy for {title} by {artist}, using basic fallback")
+            return self._get_basic_structure(title, artist)
+        except asyncio.TimeoutError:
+            logging.warning(f"AI timeout for {title} by {artist}, using basic fallback")
+            return self._get_basic_structure(title, artist)
+        except Exception as e:
+            logging.error(f"AI fallback error: {e}")
+            return self._get_basic_structure(title, artist)
+
+    async def _generate_ai_fallback_batch(self, songs: List[Tuple[str, str]]) -> List[Any]:
+        """Chord charts for several songs from one LLM call, cached per song"""
+        if len(songs) == 1:
+            title, artist = songs[0]
+            charts = [await self.llm_gateway.complete(
+                f"""Música: "{title}" de "{artist}"
                 
                 Responda APENAS JSON válido com cifras básicas:
                 {{
@@ -255,46 +365,69 @@ class MusicAPIService:
                     "tempo": 120
                 }}
                 
-                Seja RÁPIDO, use estrutura simples."""
-            )
-            
-            # Set timeout for AI call
-            response = await asyncio.wait_for(
-                chat.send_message(message), 
-                timeout=8.0  # 8 second timeout
-            )
-            
-            try:
-                ai_data = json.loads(response)
-                result = {
-                    "lyrics": ai_data.get("lyrics_with_chords", self._get_basic_structure(title, artist)),
-                    "chords": ai_data.get("chords", "C - G - Am - F"),
-                    "key": ai_data.get("key", "C"),
-                    "genre": ai_data.get("genre", "Popular"),
-                    "tempo": ai_data.get("tempo", 120),
-                    "structure": "Verso - Refrão"
-                }
-                
-                # Cache AI result
-                if self.cache_service:
-                    await self.cache_service.set_cached_result(
-                        "ai_fallback",
-                        {"title": title.lower(), "artist": artist.lower()},
-                        result
-                    )
-                
-                return result
+                Seja RÁPIDO, use estrutura simples.""",
+                schema=ChordChart,
+                timeout=8.0,  # 8 second timeout
+                system_message="Você é um músico profissional. Responda de forma rápida e concisa.",
+                operation="song_fallback_fast"
+            )]
+        else:
+            song_list = "\n".join(f'{n}. "{title}" de "{artist}"' for n, (title, artist) in enumerate(songs, 1))
+            batch = await self.llm_gateway.complete(
+                f"""Músicas:
+                {song_list}
                 
-            except json.JSONDecodeError:
-                logging.warning("AI returned invalid JSON, using basic fallback")
-                return self._get_basic_structure(title, artist)
+                Responda APENAS um array JSON válido, um objeto por música, na mesma ordem:
+                [
+                    {{
+                        "n": 1,
+                        "lyrics_with_chords": "[Verso 1]\\n     C              G              Am             F\\n(Letra básica com acordes posicionados)",
+                        "chords": "C - G - Am - F",
+                        "key": "C",
+                        "genre": "Popular", 
+                        "tempo": 120
+                    }}
+                ]
                 
-        except asyncio.TimeoutError:
-            logging.warning(f"AI timeout for {title} by {artist}, using basic fallback")
-            return self._get_basic_structure(title, artist)
-        except Exception as e:
-            logging.error(f"AI fallback error: {e}")
-            return self._get_basic_structure(title, artist)
+                Seja RÁPIDO, use estrutura simples.""",
+                schema=List[NumberedChordChart],
+                # Longer replies take longer; still well under a single call per song
+                timeout=min(8.0 + 1.5 * (len(songs) - 1), 20.0),
+                system_message="Você é um músico profissional. Responda de forma rápida e concisa.",
+                operation="song_fallback_batch"
+            )
+            by_number = {chart.n: chart for chart in batch if chart.n is not None}
+            charts = [by_number.get(n) for n in range(1, len(songs) + 1)]
+            if not by_number:
+                # No numbers at all: trust the order the prompt asked for
+                charts = (batch + [None] * len(songs))[:len(songs)]
+
+        results = []
+        for (title, artist), chart in zip(songs, charts):
+            if chart is None:
+                results.append(StructuredOutputError(f"No chord chart for {title} by {artist} in batched reply"))
+                continue
+            result = self._chord_chart_result(title, artist, chart)
+            # Cache each song on its own, so later lookups hit whatever batch filled it
+            if self.cache_service:
+                await self.cache_service.set_cached_result(
+                    "ai_fallback",
+                    {"title": title.lower(), "artist": artist.lower()},
+                    result
+                )
+            results.append(result)
+        return results
+
+    def _chord_chart_result(self, title: str, artist: str, chart: ChordChart) -> Dict[str, Any]:
+        ai_data = chart.model_dump(exclude_none=True)
+        return {
+            "lyrics": ai_data.get("lyrics_with_chords", self._get_basic_structure(title, artist)["lyrics"]),
+            "chords": ai_data.get("chords", "C - G - Am - F"),
+            "key": ai_data.get("key", "C"),
+            "genre": ai_data.get("genre", "Popular"),
+            "tempo": ai_data.get("tempo", 120),
+            "structure": "Verso - Refrão"
+        }
     
     def _get_basic_structure(self, title: str, artist: str) -> Dict[str, Any]:
         """Ultra-fast basic structure when all else fails"""
@@ -310,12 +443,6 @@ class MusicAPIService:
     async def _generate_ai_fallback(self, title: str, artist: str, existing_data: Dict) -> Dict[str, Any]:
         """Generate AI-powered chord charts and missing data"""
         try:
-            chat = LlmChat(
-                api_key=self.llm_key,
-                session_id=f"music_ai_{title}_{artist}",
-                system_message="Você é um músico profissional especializado em criar cifras e arranjos musicais precisos."
-            ).with_model("openai", "gpt-5")
-            
             # Build context from existing data
             context = f"""
             Música: "{title}" de "{artist}"
@@ -331,8 +458,8 @@ class MusicAPIService:
             else:
                 context += f"- Letra disponível: Não\n"
             
-            message = UserMessage(
-                text=f"""{context}
+            prompt = (
+                f"""{context}
 
                 Crie uma transcrição musical profissional com:
                 
@@ -365,10 +492,14 @@ class MusicAPIService:
                 }}"""
             )
             
-            response = await chat.send_message(message)
-            
             try:
-                ai_data = json.loads(response)
+                ai_data = await self.llm_gateway.complete(
+                    prompt,
+                    schema=ChordChart,
+                    system_message="Você é um músico profissional especializado em criar cifras e arranjos musicais precisos.",
+                    operation="song_fallback"
+                )
+                ai_data = ai_data.model_dump(exclude_none=True)
                 return {
                     "lyrics": ai_data.get("lyrics_with_chords", existing_data.get("lyrics", "Letra não disponível")),
                     "chords": ai_data.get("chords", "C - G - Am - F"),
@@ -377,8 +508,8 @@ class MusicAPIService:
                     "tempo": ai_data.get("tempo", existing_data.get("tempo", 120)),
                     "structure": ai_data.get("structure", "Verse - Chorus")
                 }
-            except json.JSONDecodeError:
-                logging.error("AI returned invalid JSON")
+            except StructuredOutputError as e:
+                logging.error(f"AI returned unusable JSON: {e}")
                 return self._default_fallback(title, artist)
                 
         except Exception as e:
@@ -403,67 +534,11 @@ class MusicAPIService:
 
     async def intelligent_search(self, query: str) -> List[Dict[str, Any]]:
         """Fast intelligent search with caching"""
-        # Check cache first
-        if self.cache_service:
-            cached_results = await self.cache_service.get_cached_result(
-                "intelligent_search",
-                {"query": query.lower()},
-                max_age_hours=24  # Cache searches for 24 hours
-            )
-            if cached_results:
-                logging.info(f"Cache hit for intelligent search: {query}")
-                return cached_results
-        
-        results = []
-        
         try:
-            # Spotify search is usually fast
-            if self.spotify:
-                try:
-                    spotify_results = await asyncio.wait_for(
-                        asyncio.get_event_loop().run_in_executor(
-                            self.thread_pool,
-                            lambda: self.spotify.search(q=query, type='track', limit=8)
-                        ),
-                        timeout=3.0  # 3 second timeout for Spotify
-                    )
-                    
-                    for track in spotify_results['tracks']['items']:
-                        results.append({
-                            "title": track['name'],
-                            "artist": track['artists'][0]['name'],
-                            "genre": "Popular",
-                            "year": track['album']['release_date'][:4] if track['album']['release_date'] else "Unknown",
-                            "popularity": min(10, max(1, track['popularity'] // 10)),  # 1-10 scale
-                            "album": track['album']['name'],
-                            "preview_url": track['preview_url']
-                        })
-                        
-                except asyncio.TimeoutError:
-                    logging.warning("Spotify search timeout")
-            
-            # Only use AI if Spotify failed or returned few results
-            if len(results) < 3:
-                try:
-                    ai_results = await asyncio.wait_for(
-                        self._ai_intelligent_search_fast(query),
-                        timeout=5.0  # 5 second timeout for AI
-                    )
-                    results.extend(ai_results)
-                except asyncio.TimeoutError:
-                    logging.warning("AI search timeout")
-            
-            # Limit and cache results
-            final_results = results[:8]
-            
-            if self.cache_service and final_results:
-                await self.cache_service.set_cached_result(
-                    "intelligent_search",
-                    {"query": query.lower()},
-                    final_results
-                )
-            
-            return final_results
+            results = []
+            async for batch in self.intelligent_search_stream(query):
+                results.extend(batch)
+            return self.search_orchestrator.ranked(results)
             
         except Exception as e:
             logging.error(f"Intelligent search error: {e}")
@@ -478,29 +553,89 @@ class MusicAPIService:
                 }
             ]
 
+    async def intelligent_search_stream(self, query: str) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Batches of results as each source answers; cached searches come in one batch"""
+        # Check cache first
+        if self.cache_service:
+            cached_results = await self.cache_service.get_similar_result(
+                "intelligent_search",
+                {"query": query},
+                text_field="query",
+                max_age_hours=24  # Cache searches for 24 hours
+            )
+            if cached_results:
+                logging.info(f"Cache hit for intelligent search: {query}")
+                yield cached_results
+                return
+        
+        results = []
+        async for batch in self.search_orchestrator.stream(query):
+            results.extend(batch)
+            yield batch
+        
+        if self.cache_service and results:
+            await self.cache_service.set_similar_result(
+                "intelligent_search",
+                {"query": query},
+                "query",
+                self.search_orchestrator.ranked(results)
+            )
+
+    async def _catalog_intelligent_search(self, query: str) -> List[Dict[str, Any]]:
+        """Known songs whose title and artist match the query"""
+        return [
+            {
+                "title": song["title"],
+                "artist": song.get("artist") or "",
+                "genre": song.get("genre") or "Popular",
+                "year": str(song.get("year") or ""),
+                "popularity": song.get("popularity") or 5
+            }
+            for song in self.catalog.covering(query, limit=8)
+        ]
+
+    async def _spotify_intelligent_search(self, query: str) -> List[Dict[str, Any]]:
+        """Spotify track search, popularity on a 1-10 scale"""
+        if not self.spotify:
+            return []
+        try:
+            spotify_results = await self.spotify_guard.call_blocking(
+                "search", lambda: self.spotify.search(q=query, type='track', limit=8)
+            )
+        except CircuitOpen:
+            return []
+        return [
+            {
+                "title": track['name'],
+                "artist": track['artists'][0]['name'],
+                "genre": "Popular",
+                "year": track['album']['release_date'][:4] if track['album']['release_date'] else "Unknown",
+                "popularity": min(10, max(1, track['popularity'] // 10)),  # 1-10 scale
+                "album": track['album']['name'],
+                "preview_url": track['preview_url']
+            }
+            for track in spotify_results['tracks']['items']
+        ]
+
     async def _ai_intelligent_search_fast(self, query: str) -> List[Dict[str, Any]]:
         """Fast AI-powered search with shorter prompts"""
         try:
-            chat = LlmChat(
-                api_key=self.llm_key,
-                session_id=f"search_{hashlib.md5(query.encode()).hexdigest()[:8]}",
-                system_message="Responda rapidamente com músicas reais."
-            ).with_model("openai", "gpt-5")
-            
-            message = UserMessage(
-                text=f"""Busca: "{query}"
+            songs = await self.llm_gateway.complete(
+                f"""Busca: "{query}"
                 
                 Liste 5 músicas reais em JSON:
                 [
                     {{"title": "Nome Real", "artist": "Artista Real", "genre": "Gênero", "year": "Ano", "popularity": 8}}
                 ]
                 
-                APENAS JSON, sem texto adicional."""
+                APENAS JSON, sem texto adicional.""",
+                schema=List[SongSuggestion],
+                timeout=5.0,  # Same budget as the caller, so the gateway can shed early
+                system_message="Responda rapidamente com músicas reais.",
+                operation="intelligent_search_fast",
+                priority="interactive"
             )
-            
-            response = await chat.send_message(message)
-            results = json.loads(response)
-            return results if isinstance(results, list) else []
+            return [song.model_dump() for song in songs]
             
         except Exception as e:
             logging.error(f"Fast AI search error: {e}")
@@ -509,14 +644,8 @@ class MusicAPIService:
     async def _ai_intelligent_search(self, query: str) -> List[Dict[str, Any]]:
         """AI-powered song search as fallback"""
         try:
-            chat = LlmChat(
-                api_key=self.llm_key,
-                session_id=f"search_{query}",
-                system_message="Você é um especialista musical que encontra músicas baseado em consultas."
-            ).with_model("openai", "gpt-5")
-            
-            message = UserMessage(
-                text=f"""Baseado na busca: "{query}"
+            songs = await self.llm_gateway.complete(
+                f"""Baseado na busca: "{query}"
                 
                 Encontre até 6 músicas reais que correspondem. Pode ser por nome, artista, gênero ou descrição.
                 
@@ -529,11 +658,13 @@ class MusicAPIService:
                         "year": "Ano",
                         "popularity": 8
                     }}
-                ]"""
+                ]""",
+                schema=List[SongSuggestion],
+                system_message="Você é um especialista musical que encontra músicas baseado em consultas.",
+                operation="intelligent_search",
+                priority="interactive"
             )
-            
-            response = await chat.send_message(message)
-            return json.loads(response)
+            return [song.model_dump() for song in songs]
             
         except Exception as e:
             logging.error(f"AI search error: {e}")
@@ -551,9 +682,11 @@ class MusicAPIService:
                     data.add_field('file', audio_file, filename='audio.mp3')
                     data.add_field('api_token', self.audd_token)
                     
-                    async with session.post('https://api.audd.io/', data=data) as response:
-                        if response.status == 200:
-                            result = await response.json()
+                    async with track_upstream("audd", "recognize") as call, session.post('https://api.audd.io/', data=data) as response:
+                        if response.status != 200:
+                            call.outcome = "error"
+                        else:
+                            result = call.payload = await response.json()
                             
                             if result['status'] == 'success' and result.get('result'):
                                 track = result['result']
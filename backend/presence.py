@@ -0,0 +1,148 @@
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from pymongo.errors import DuplicateKeyError
+
+
+@dataclass
+class Connection:
+    sid: str
+    user_id: str
+    user_name: str
+    rooms: Set[str] = field(default_factory=set)
+    last_seen: float = 0.0
+
+
+class PresenceRegistry:
+    """In-memory map of the Socket.IO connections this worker serves.
+
+    Tracks sid <-> user <-> rooms and heartbeats for local connections
+    only; who is online in a room across workers lives in ``RoomPresence``.
+    """
+
+    def __init__(self, heartbeat_timeout: float = 90.0):
+        self.heartbeat_timeout = heartbeat_timeout
+        self.connections: Dict[str, Connection] = {}
+        self.user_sids: Dict[str, Set[str]] = {}
+
+    def connect(self, sid: str, user_id: str, user_name: str) -> Connection:
+        connection = Connection(sid=sid, user_id=user_id, user_name=user_name, last_seen=time.monotonic())
+        self.connections[sid] = connection
+        self.user_sids.setdefault(user_id, set()).add(sid)
+        return connection
+
+    def get(self, sid: str) -> Optional[Connection]:
+        return self.connections.get(sid)
+
+    def heartbeat(self, sid: str) -> bool:
+        connection = self.connections.get(sid)
+        if connection is None:
+            return False
+        connection.last_seen = time.monotonic()
+        return True
+
+    def join(self, sid: str, room_id: str) -> bool:
+        """Add a connection to a room; False when it is unknown or already there"""
+        connection = self.connections.get(sid)
+        if connection is None or room_id in connection.rooms:
+            return False
+        connection.rooms.add(room_id)
+        connection.last_seen = time.monotonic()
+        return True
+
+    def leave(self, sid: str, room_id: str) -> bool:
+        """Remove a connection from a room; False when it was not there"""
+        connection = self.connections.get(sid)
+        if connection is None or room_id not in connection.rooms:
+            return False
+        connection.rooms.discard(room_id)
+        return True
+
+    def disconnect(self, sid: str) -> Tuple[Optional[Connection], List[str]]:
+        """Drop a connection, returning it and the rooms it was in"""
+        connection = self.connections.pop(sid, None)
+        if connection is None:
+            return None, []
+
+        sids = self.user_sids.get(connection.user_id)
+        if sids is not None:
+            sids.discard(sid)
+            if not sids:
+                del self.user_sids[connection.user_id]
+        return connection, sorted(connection.rooms)
+
+    def stale_sids(self) -> List[str]:
+        """Connections that missed their heartbeats"""
+        cutoff = time.monotonic() - self.heartbeat_timeout
+        return [sid for sid, connection in self.connections.items() if connection.last_seen < cutoff]
+
+
+class RoomPresence:
+    """Who is online in each room, shared by every worker through a collection.
+
+    One document per (room, user) holds that user's live connections as
+    ``{sid: last_seen}``, so a user on tablets served by different workers
+    is announced once and only goes offline when their last connection
+    leaves. Every transition is a single atomic update or delete, so two
+    workers never both announce it. Users of a worker that died without
+    cleaning up stop heartbeating and are expired by ``reap``.
+    """
+
+    def __init__(self, collection: Any, heartbeat_timeout: float = 90.0, clock: Callable[[], float] = time.time):
+        self.collection = collection
+        self.heartbeat_timeout = heartbeat_timeout
+        # Wall clock: timestamps are compared across processes
+        self.clock = clock
+
+    async def ensure_indexes(self) -> None:
+        await self.collection.create_index([("room_id", 1), ("user_id", 1)], unique=True)
+        await self.collection.create_index("heartbeat")
+
+    async def join(self, room_id: str, user_id: str, user_name: str, sid: str) -> bool:
+        """Add a connection to a room; True when the user just came online there"""
+        now = self.clock()
+        query = {"room_id": room_id, "user_id": user_id}
+        update = {"$set": {"user_name": user_name, f"connections.{sid}": now, "heartbeat": now}}
+        try:
+            result = await self.collection.update_one(query, update, upsert=True)
+        except DuplicateKeyError:
+            # Another worker created the document first and announced the user
+            await self.collection.update_one(query, update)
+            return False
+        return result.upserted_id is not None
+
+    async def leave(self, room_id: str, user_id: str, sid: str) -> bool:
+        """Remove a connection from a room; True when the user went offline there"""
+        await self.collection.update_one({"room_id": room_id, "user_id": user_id}, {"$unset": {f"connections.{sid}": ""}})
+        # Only matches while no other connection of the user joined meanwhile
+        result = await self.collection.delete_one({"room_id": room_id, "user_id": user_id, "connections": {}})
+        return result.deleted_count == 1
+
+    async def heartbeat(self, user_id: str, sid: str, rooms: List[str]) -> None:
+        if not rooms:
+            return
+        now = self.clock()
+        await self.collection.update_many(
+            {"room_id": {"$in": rooms}, "user_id": user_id},
+            {"$set": {f"connections.{sid}": now, "heartbeat": now}}
+        )
+
+    async def online_users(self, room_id: str) -> List[Dict]:
+        members = await self.collection.find(
+            {"room_id": room_id, "heartbeat": {"$gte": self.clock() - self.heartbeat_timeout}},
+            {"_id": 0, "user_id": 1, "user_name": 1}
+        ).to_list(None)
+        return [{"user_id": member["user_id"], "user_name": member["user_name"]} for member in members]
+
+    async def reap(self) -> List[Tuple[str, str]]:
+        """Expire users none of whose connections heartbeat in time; returns (room_id, user_id) pairs"""
+        cutoff = self.clock() - self.heartbeat_timeout
+        expired = await self.collection.find({"heartbeat": {"$lt": cutoff}}, {"room_id": 1, "user_id": 1}).to_list(None)
+        gone = []
+        for member in expired:
+            # Whichever worker deletes the document announces the user left
+            result = await self.collection.delete_one({"_id": member["_id"], "heartbeat": {"$lt": cutoff}})
+            if result.deleted_count:
+                gone.append((member["room_id"], member["user_id"]))
+        return gone
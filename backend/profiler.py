@@ -0,0 +1,85 @@
+import asyncio
+import collections
+import os
+import sys
+import threading
+import time
+from typing import Dict, Optional
+
+from metrics import task_labels
+
+MAX_DEPTH = 128
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _collapse(frame) -> str:
+    names = []
+    while frame is not None and len(names) < MAX_DEPTH:
+        names.append(_frame_name(frame))
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class ProfilerBusy(Exception):
+    pass
+
+
+class SamplingProfiler:
+    """Wall-clock sampling profiler producing flamegraph collapsed stacks.
+
+    A thread snapshots every thread's stack each ``interval`` seconds. With
+    a label filter only event loop samples taken while a task with a
+    matching route/event label was running are kept.
+    """
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._lock.locked()
+
+    async def profile(self, seconds: float, label_filter: Optional[str] = None, interval: Optional[float] = None) -> Dict[str, object]:
+        if not self._lock.acquire(blocking=False):
+            raise ProfilerBusy("A profile is already running")
+        try:
+            loop = asyncio.get_running_loop()
+            loop_thread_id = threading.get_ident()
+            return await asyncio.to_thread(self._sample, seconds, label_filter, interval or self.interval, loop, loop_thread_id)
+        finally:
+            self._lock.release()
+
+    def _sample(self, seconds: float, label_filter: Optional[str], interval: float, loop, loop_thread_id: int) -> Dict[str, object]:
+        own_id = threading.get_ident()
+        thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+        counts: Dict[str, int] = collections.Counter()
+        samples = 0
+        deadline = time.monotonic() + seconds
+
+        while time.monotonic() < deadline:
+            frames = sys._current_frames()
+            samples += 1
+            for thread_id, frame in frames.items():
+                if thread_id == own_id:
+                    continue
+
+                root = thread_names.get(thread_id) or str(thread_id)
+                if thread_id == loop_thread_id:
+                    task = asyncio.current_task(loop)
+                    label = task_labels.get(task) if task is not None else None
+                    if label_filter and (label is None or label_filter not in label):
+                        continue
+                    root = f"loop;{label or 'idle'}"
+                elif label_filter:
+                    continue
+
+                counts[f"{root};{_collapse(frame)}"] += 1
+            time.sleep(interval)
+
+        collapsed = "\n".join(f"{stack} {count}" for stack, count in sorted(counts.items()))
+        return {"samples": samples, "collapsed": collapsed + "\n" if collapsed else ""}
@@ -0,0 +1,366 @@
+import asyncio
+import base64
+import logging
+import os
+import socket
+import time
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, Optional, Union
+
+# When to force recording data to stable storage
+FSYNC_POLICIES = ("always", "interval", "finalize", "never")
+
+ChunkData = Union[bytes, bytearray, memoryview, str, list]
+
+
+class RecordingWriter:
+    """Ordered, buffered append-only writer for a single recording file"""
+
+    def __init__(
+        self,
+        path: Path,
+        flush_bytes: int,
+        flush_interval: float,
+        fsync_policy: str,
+        fsync_interval: float,
+        max_pending_chunks: int,
+        max_pending_bytes: int,
+        start_index: Optional[int] = 0
+    ):
+        self.path = path
+        self.flush_bytes = flush_bytes
+        self.flush_interval = flush_interval
+        self.fsync_policy = fsync_policy
+        self.fsync_interval = fsync_interval
+        self.max_pending_chunks = max_pending_chunks
+        self.max_pending_bytes = max_pending_bytes
+
+        # None: resuming an existing file, so the first chunk that arrives sets the position
+        self.next_index = start_index
+        self.next_arrival_index = start_index or 0
+        self.pending: Dict[int, bytes] = {}
+        self.pending_bytes = 0
+        self.buffer = bytearray()
+        self.bytes_written = 0
+        self.finalized = False
+
+        self._file = None
+        self._lock = asyncio.Lock()
+        self._last_flush = time.monotonic()
+        self._last_fsync = time.monotonic()
+
+    async def write_chunk(self, data: bytes, chunk_index: Optional[int] = None) -> str:
+        """Queue a chunk, appending every in-order chunk to the write buffer.
+
+        Returns "received", "duplicate" (index already seen) or "rejected"
+        (recording already finalized).
+        """
+        async with self._lock:
+            if self.finalized:
+                return "rejected"
+
+            if chunk_index is None:
+                chunk_index = self.next_arrival_index
+            if self.next_index is None:
+                self.next_index = chunk_index
+            self.next_arrival_index = max(self.next_arrival_index, chunk_index + 1)
+
+            if chunk_index < self.next_index or chunk_index in self.pending:
+                return "duplicate"
+
+            self.pending[chunk_index] = data
+            self.pending_bytes += len(data)
+            self._drain_pending()
+
+            # A chunk that never arrives must not stall (or bloat) the whole recording
+            while self.pending and (
+                len(self.pending) > self.max_pending_chunks or self.pending_bytes > self.max_pending_bytes
+            ):
+                missing = min(self.pending) - self.next_index
+                logging.warning(f"Recording {self.path.name}: skipping {missing} missing chunk(s) at {self.next_index}")
+                self.next_index = min(self.pending)
+                self._drain_pending()
+
+            now = time.monotonic()
+            if len(self.buffer) >= self.flush_bytes or (self.buffer and now - self._last_flush >= self.flush_interval):
+                await self._flush()
+
+            return "received"
+
+    async def flush(self) -> None:
+        """Write buffered in-order data without finalizing"""
+        async with self._lock:
+            await self._flush()
+
+    async def finalize(self) -> int:
+        """Flush everything that arrived (skipping gaps), sync and close the file"""
+        async with self._lock:
+            if self.finalized:
+                return self.bytes_written
+
+            for index in sorted(self.pending):
+                self.buffer += self.pending.pop(index)
+            self.pending_bytes = 0
+
+            await self._flush(force_fsync=self.fsync_policy != "never")
+            await asyncio.get_running_loop().run_in_executor(None, self._close_sync)
+            self.finalized = True
+            return self.bytes_written
+
+    def _drain_pending(self) -> None:
+        while self.next_index in self.pending:
+            data = self.pending.pop(self.next_index)
+            self.pending_bytes -= len(data)
+            self.buffer += data
+            self.next_index += 1
+
+    async def _flush(self, force_fsync: bool = False) -> None:
+        now = time.monotonic()
+        fsync = force_fsync or self.fsync_policy == "always" or (
+            self.fsync_policy == "interval" and now - self._last_fsync >= self.fsync_interval
+        )
+
+        if not self.buffer and not fsync:
+            return
+
+        data = bytes(self.buffer)
+        self.buffer.clear()
+
+        await asyncio.get_running_loop().run_in_executor(None, self._write_sync, data, fsync)
+
+        self.bytes_written += len(data)
+        self._last_flush = now
+        if fsync:
+            self._last_fsync = now
+
+    def _write_sync(self, data: bytes, fsync: bool) -> None:
+        if self._file is None:
+            self._file = open(self.path, "ab")
+        if data:
+            self._file.write(data)
+            self._file.flush()
+        if fsync:
+            os.fsync(self._file.fileno())
+
+    def _close_sync(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class RecordingStorage:
+    """Persists streamed recording chunks to per-recording files on disk.
+
+    With several workers (see SOCKETIO_MESSAGE_QUEUE) each recording has a
+    single owning worker: the first one to receive its chunks claims it with
+    an ``.owner`` file next to the recording, and other workers reject its
+    chunks. A stop or delete handled by a non-owning worker leaves a
+    ``.stop`` marker that the owner's reaper picks up to finalize (or
+    delete) the file. Both markers go away with the recording's writer or
+    file. Workers must share the recordings directory.
+    """
+
+    def __init__(
+        self,
+        base_dir: Union[str, Path],
+        flush_bytes: int = 256 * 1024,
+        flush_interval: float = 2.0,
+        fsync_policy: str = "interval",
+        fsync_interval: float = 5.0,
+        max_pending_chunks: int = 256,
+        max_pending_bytes: int = 8 * 1024 * 1024,
+        idle_timeout: float = 600.0
+    ):
+        if fsync_policy not in FSYNC_POLICIES:
+            raise ValueError(f"Invalid fsync policy: {fsync_policy}")
+
+        self.base_dir = Path(base_dir)
+        self.base_dir.mkdir(parents=True, exist_ok=True)
+        self.flush_bytes = flush_bytes
+        self.flush_interval = flush_interval
+        self.fsync_policy = fsync_policy
+        self.fsync_interval = fsync_interval
+        self.max_pending_chunks = max_pending_chunks
+        self.max_pending_bytes = max_pending_bytes
+        self.idle_timeout = idle_timeout
+
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.writers: Dict[str, RecordingWriter] = {}
+        self.filenames: Dict[str, str] = {}
+        self._last_activity: Dict[str, float] = {}
+
+    def path_for(self, filename: str) -> Path:
+        """Resolve a recording filename inside the storage directory"""
+        return self.base_dir / Path(filename).name
+
+    def _marker_path(self, filename: str, marker: str) -> Path:
+        path = self.path_for(filename)
+        return path.with_name(f"{path.name}.{marker}")
+
+    def claim(self, filename: str) -> bool:
+        """Take ownership of a recording for this worker, unless another live worker holds it"""
+        owner_path = self._marker_path(filename, "owner")
+        for _ in range(2):
+            try:
+                fd = os.open(owner_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                owner = self.owner_of(filename)
+                if owner == self.worker_id:
+                    return True
+                if owner is not None and not self._owner_is_dead(owner):
+                    return False
+                # Stale claim from a worker that no longer exists
+                owner_path.unlink(missing_ok=True)
+                continue
+            with os.fdopen(fd, "w") as owner_file:
+                owner_file.write(self.worker_id)
+            return True
+        return False
+
+    def owner_of(self, filename: str) -> Optional[str]:
+        try:
+            return self._marker_path(filename, "owner").read_text().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def _owner_is_dead(self, owner: str) -> bool:
+        host, _, pid = owner.rpartition(":")
+        if host != socket.gethostname() or not pid.isdigit():
+            return False
+        try:
+            os.kill(int(pid), 0)
+        except ProcessLookupError:
+            return True
+        except PermissionError:
+            return False
+        return False
+
+    def request_stop(self, filename: str, delete: bool = False) -> bool:
+        """Ask the live worker owning a recording to finalize it, and delete the file after.
+
+        Returns False, leaving no marker behind, when no live worker owns it.
+        """
+        owner = self.owner_of(filename)
+        if owner is None:
+            return False
+        if self._owner_is_dead(owner):
+            self._marker_path(filename, "owner").unlink(missing_ok=True)
+            return False
+        stop_path = self._marker_path(filename, "stop")
+        stop_path.write_text("delete" if delete else "")
+        # The owner may have finalized between the check and the write
+        if self.owner_of(filename) is None:
+            stop_path.unlink(missing_ok=True)
+            return False
+        return True
+
+    def open(self, recording_id: str, filename: str) -> RecordingWriter:
+        """Get or create the writer for a recording"""
+        writer = self.writers.get(recording_id)
+        if writer is None:
+            path = self.path_for(filename)
+            # Reopened after a restart: chunk numbering continues, not from 0
+            resuming = path.exists() and path.stat().st_size > 0
+            writer = RecordingWriter(
+                path,
+                flush_bytes=self.flush_bytes,
+                flush_interval=self.flush_interval,
+                fsync_policy=self.fsync_policy,
+                fsync_interval=self.fsync_interval,
+                max_pending_chunks=self.max_pending_chunks,
+                max_pending_bytes=self.max_pending_bytes,
+                start_index=None if resuming else 0
+            )
+            self.writers[recording_id] = writer
+            self.filenames[recording_id] = filename
+            self._last_activity[recording_id] = time.monotonic()
+        return writer
+
+    def get_writer(self, recording_id: str) -> Optional[RecordingWriter]:
+        return self.writers.get(recording_id)
+
+    def is_live(self, recording_id: str, filename: Optional[str] = None) -> bool:
+        """Whether a recording is still receiving chunks, here or on its owning worker"""
+        writer = self.writers.get(recording_id)
+        if writer is not None:
+            return not writer.finalized
+        return filename is not None and self.owner_of(filename) is not None
+
+    async def append_chunk(self, recording_id: str, chunk_data: ChunkData, chunk_index: Optional[int] = None) -> str:
+        """Append a chunk to an open recording, returning the writer's status"""
+        writer = self.writers.get(recording_id)
+        if writer is None:
+            raise KeyError(recording_id)
+        self._last_activity[recording_id] = time.monotonic()
+        return await writer.write_chunk(self.decode_chunk(chunk_data), chunk_index)
+
+    async def finalize(self, recording_id: str) -> Optional[int]:
+        """Finish a recording and return its final size in bytes"""
+        writer = self.writers.get(recording_id)
+        if writer is None:
+            return None
+
+        # Keep the writer registered until the final flush lands so live readers see it
+        size = await writer.finalize()
+        self.writers.pop(recording_id, None)
+        self._last_activity.pop(recording_id, None)
+        filename = self.filenames.pop(recording_id)
+        self._marker_path(filename, "stop").unlink(missing_ok=True)
+        self._marker_path(filename, "owner").unlink(missing_ok=True)
+        logging.info(f"Recording {recording_id} finalized: {size} bytes")
+        return size
+
+    async def close_all(self) -> None:
+        """Finalize every open recording (used on shutdown)"""
+        for recording_id in list(self.writers):
+            try:
+                await self.finalize(recording_id)
+            except Exception as e:
+                logging.error(f"Error finalizing recording {recording_id}: {e}")
+
+    async def reap(self, on_finalized: Callable[[str, int], Awaitable[None]]) -> None:
+        """Finalize owned recordings that were stopped on another worker or went idle"""
+        now = time.monotonic()
+        for recording_id, filename in list(self.filenames.items()):
+            try:
+                request = self._marker_path(filename, "stop").read_text()
+            except FileNotFoundError:
+                request = None
+            idle = now - self._last_activity.get(recording_id, now) > self.idle_timeout
+            if request is None and not idle:
+                continue
+            try:
+                size = await self.finalize(recording_id)
+                if request == "delete":
+                    self.delete(filename)
+                elif size is not None:
+                    await on_finalized(recording_id, size)
+            except Exception as e:
+                logging.error(f"Error reaping recording {recording_id}: {e}")
+
+    async def run_reaper(self, on_finalized: Callable[[str, int], Awaitable[None]], interval: float = 1.0) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            await self.reap(on_finalized)
+
+    def delete(self, filename: str) -> None:
+        """Remove a recording file and its markers if they exist"""
+        try:
+            self.path_for(filename).unlink(missing_ok=True)
+            self._marker_path(filename, "owner").unlink(missing_ok=True)
+            self._marker_path(filename, "stop").unlink(missing_ok=True)
+        except Exception as e:
+            logging.error(f"Error deleting recording file {filename}: {e}")
+
+    @staticmethod
+    def decode_chunk(chunk_data: ChunkData) -> bytes:
+        """Accept binary Socket.IO attachments, base64/data-URL strings or byte lists"""
+        if isinstance(chunk_data, (bytes, bytearray, memoryview)):
+            return bytes(chunk_data)
+        if isinstance(chunk_data, str):
+            if chunk_data.startswith("data:") and "," in chunk_data:
+                chunk_data = chunk_data.split(",", 1)[1]
+            return base64.b64decode(chunk_data)
+        if isinstance(chunk_data, list):
+            return bytes(chunk_data)
+        raise ValueError(f"Unsupported chunk type: {type(chunk_data).__name__}")
@@ -0,0 +1,216 @@
+import asyncio
+import logging
+import mimetypes
+import os
+from pathlib import Path
+from typing import Callable, Optional, Tuple
+
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+READ_CHUNK_SIZE = 64 * 1024
+LIVE_POLL_INTERVAL = 0.25
+MAX_FOLLOW_TIME = 30 * 60
+ZEROCOPY_EXTENSION = "http.response.zerocopysend"
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range_header(range_header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Parse a single "bytes=" range into an inclusive (start, end) pair.
+
+    Returns None when the header is missing, malformed or asks for several
+    ranges (the full body is served instead) and raises RangeNotSatisfiable
+    when the range lies outside the file.
+    """
+    if not range_header:
+        return None
+
+    unit, _, spec = range_header.strip().partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+
+    start_text, sep, end_text = spec.strip().partition("-")
+    if not sep:
+        return None
+
+    try:
+        if not start_text:
+            # Suffix range: last N bytes
+            suffix = int(end_text)
+            if suffix <= 0:
+                raise RangeNotSatisfiable()
+            return max(0, size - suffix), size - 1
+
+        start = int(start_text)
+        end = int(end_text) if end_text else size - 1
+    except ValueError:
+        return None
+
+    if start >= size or start > end:
+        raise RangeNotSatisfiable()
+    return start, min(end, size - 1)
+
+
+def make_etag(stat: os.stat_result) -> str:
+    return f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+
+
+def guess_media_type(path: Path) -> str:
+    if path.suffix == ".webm":
+        return "audio/webm"
+    return mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+
+
+class RangeFileResponse(Response):
+    """File response with Range, ETag and zero-copy support.
+
+    ``is_live`` reports whether the file is still being written. Live files
+    have no stable ETag, report an unknown complete length in Content-Range
+    and, for full-body requests, keep streaming as new data is flushed until
+    the writer finishes, the client disconnects or ``max_follow_time``
+    seconds pass.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        range_header: Optional[str] = None,
+        if_range: Optional[str] = None,
+        if_none_match: Optional[str] = None,
+        is_live: Callable[[], bool] = lambda: False,
+        media_type: Optional[str] = None,
+        max_follow_time: float = MAX_FOLLOW_TIME
+    ):
+        self.path = Path(path)
+        self.is_live = is_live
+        self.max_follow_time = max_follow_time
+        self.media_type = media_type or guess_media_type(self.path)
+        self.background = None
+        # No buffered body: content-length is set explicitly (or omitted for live files)
+        self.body = None
+
+        stat = os.stat(self.path)
+        size = stat.st_size
+        live = is_live()
+        etag = None if live else make_etag(stat)
+
+        self.status_code = 200
+        self.offset = 0
+        self.count: Optional[int] = size
+        self.follow = live
+        headers = {"accept-ranges": "bytes", "cache-control": "no-cache" if live else "private, max-age=0"}
+        if etag:
+            headers["etag"] = etag
+
+        if etag and if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+            self.status_code = 304
+            self.count = 0
+            self.follow = False
+            self.init_headers(headers)
+            return
+
+        # If-Range only honours a range while the validator still matches
+        if if_range and if_range.strip() != etag:
+            range_header = None
+
+        try:
+            byte_range = parse_range_header(range_header, size)
+        except RangeNotSatisfiable:
+            self.status_code = 416
+            self.count = 0
+            self.follow = False
+            headers["content-range"] = f"bytes */{size}"
+            headers["content-length"] = "0"
+            self.init_headers(headers)
+            return
+
+        if byte_range is not None:
+            start, end = byte_range
+            self.status_code = 206
+            self.offset = start
+            self.count = end - start + 1
+            self.follow = False
+            headers["content-range"] = f"bytes {start}-{end}/{'*' if live else size}"
+
+        if self.follow:
+            # Length unknown until the recording is finalized
+            self.count = None
+        else:
+            headers["content-length"] = str(self.count)
+
+        self.init_headers(headers)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({
+            "type": "http.response.start",
+            "status": self.status_code,
+            "headers": self.raw_headers
+        })
+
+        if scope.get("method") == "HEAD" or self.count == 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        loop = asyncio.get_running_loop()
+        disconnected = asyncio.Event()
+        watcher = asyncio.create_task(self._watch_disconnect(receive, disconnected)) if self.follow else None
+        deadline = loop.time() + self.max_follow_time
+        file = await loop.run_in_executor(None, open, self.path, "rb")
+        try:
+            if ZEROCOPY_EXTENSION in scope.get("extensions", {}) and self.count is not None:
+                await send({
+                    "type": ZEROCOPY_EXTENSION,
+                    "file": file,
+                    "offset": self.offset,
+                    "count": self.count,
+                    "more_body": False
+                })
+                return
+
+            await loop.run_in_executor(None, file.seek, self.offset)
+            remaining = self.count
+            while not disconnected.is_set():
+                read_size = READ_CHUNK_SIZE if remaining is None else min(READ_CHUNK_SIZE, remaining)
+                chunk = await loop.run_in_executor(None, file.read, read_size) if read_size else b""
+
+                if chunk:
+                    if remaining is not None:
+                        remaining -= len(chunk)
+                    await send({"type": "http.response.body", "body": chunk, "more_body": True})
+                    continue
+
+                if remaining is None and self.is_live() and loop.time() < deadline:
+                    # Tail the file while the recording is still being written
+                    try:
+                        await asyncio.wait_for(disconnected.wait(), LIVE_POLL_INTERVAL)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+
+                if remaining is None:
+                    # Writer finished: pick up the final flush before closing
+                    tail = await loop.run_in_executor(None, file.read)
+                    if tail:
+                        await send({"type": "http.response.body", "body": tail, "more_body": True})
+                break
+        except OSError as e:
+            logging.error(f"Error streaming {self.path.name}: {e}")
+        finally:
+            if watcher is not None:
+                watcher.cancel()
+            await loop.run_in_executor(None, file.close)
+
+        if disconnected.is_set():
+            return
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+    @staticmethod
+    async def _watch_disconnect(receive: Receive, disconnected: asyncio.Event) -> None:
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                disconnected.set()
+                return
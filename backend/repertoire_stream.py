@@ -0,0 +1,39 @@
+import json
+from typing import Any, AsyncIterator, Dict, Optional
+
+
+def parse_repertoire_line(line: str) -> Optional[Dict[str, Any]]:
+    """Parse one "Título - Artista - 3min" line of a model reply"""
+    line = line.strip()
+    if ' - ' not in line:
+        return None
+    parts = line.split(' - ')
+    title = parts[0].strip(' "')
+    artist = parts[1].strip()
+    duration = parts[2].strip() if len(parts) > 2 else "3min"
+    return {
+        "title": title,
+        "artist": artist,
+        "duration": duration,
+        "original_line": line
+    }
+
+
+async def stream_repertoire_songs(pieces: AsyncIterator[str]) -> AsyncIterator[Dict[str, Any]]:
+    """Yield each song as soon as the line describing it is complete"""
+    buffer = ""
+    async for piece in pieces:
+        buffer += piece
+        *lines, buffer = buffer.split('\n')
+        for line in lines:
+            song = parse_repertoire_line(line)
+            if song:
+                yield song
+    song = parse_repertoire_line(buffer)
+    if song:
+        yield song
+
+
+def sse_event(event: str, data: Any) -> str:
+    """Format one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
@@ -0,0 +1,256 @@
+import asyncio
+import concurrent.futures
+import logging
+import math
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+from instrumentation import UpstreamCall, track_upstream
+from metrics import registry
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+circuit_state = registry.gauge("provider_circuit_state", "Provider circuit breaker state (0 closed, 1 half-open, 2 open)", ("provider",))
+provider_calls = registry.counter(
+    "provider_calls_total", "Guarded provider calls by outcome (ok/error/timeout/short_circuited)", ("provider", "operation", "outcome")
+)
+provider_hedges = registry.counter(
+    "provider_hedged_requests_total", "Duplicate requests sent after the hedge delay, by which attempt answered first", ("provider", "winner")
+)
+bulkhead_busy = registry.gauge("provider_threads_busy", "Provider client threads running a call, abandoned ones included", ("provider",))
+bulkhead_rejections = registry.counter("provider_bulkhead_rejections_total", "Calls refused because every provider thread was busy", ("provider",))
+
+
+class CircuitOpen(Exception):
+    """The provider is being skipped until a probe succeeds"""
+
+
+class BulkheadFull(Exception):
+    """Every thread of the provider is still busy, possibly with calls nobody waits for anymore"""
+
+
+class Bulkhead:
+    """A bounded thread pool for one blocking provider client.
+
+    Cancelling the asyncio side of ``run_in_executor`` does not stop the
+    thread, so a hung provider keeps its threads after our timeouts fire.
+    Threads are counted until the blocking call really returns, and once
+    all ``threads`` are taken further calls fail at once with
+    ``BulkheadFull`` instead of queueing behind the hung ones.
+    """
+
+    def __init__(self, provider: str, threads: int = 4):
+        self.provider = provider
+        self.threads = threads
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=threads, thread_name_prefix=provider)
+        self._slots = threading.BoundedSemaphore(threads)
+        self._busy = 0
+        self._lock = threading.Lock()
+
+    @property
+    def busy(self) -> int:
+        return self._busy
+
+    def _release(self, _future) -> None:
+        with self._lock:
+            self._busy -= 1
+            bulkhead_busy.set(self._busy, provider=self.provider)
+        self._slots.release()
+
+    def run(self, blocking: Callable[[], Any]) -> Awaitable[Any]:
+        if not self._slots.acquire(blocking=False):
+            bulkhead_rejections.inc(provider=self.provider)
+            raise BulkheadFull(f"All {self.threads} {self.provider} threads are busy")
+        with self._lock:
+            self._busy += 1
+            bulkhead_busy.set(self._busy, provider=self.provider)
+        future = self._executor.submit(blocking)
+        future.add_done_callback(self._release)
+        return asyncio.wrap_future(future)
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker.
+
+    Opens after ``failure_threshold`` failures in a row. While open every
+    call is refused; after ``reset_timeout`` seconds one probe call is let
+    through (half-open) and its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(
+        self,
+        provider: str,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.provider = provider
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = 0.0
+        self.state = CLOSED
+        self._probing = False
+        circuit_state.set(_STATE_VALUES[CLOSED], provider=provider)
+
+    def _set_state(self, state: str) -> None:
+        if state != self.state:
+            logging.warning(f"Circuit for {self.provider} is now {state}")
+            self.state = state
+            circuit_state.set(_STATE_VALUES[state], provider=self.provider)
+
+    def allow(self) -> bool:
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN and self.clock() - self.opened_at >= self.reset_timeout:
+            self._set_state(HALF_OPEN)
+        if self.state == HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self._probing = False
+        self._set_state(CLOSED)
+
+    def release_probe(self) -> None:
+        """A probe that was cancelled lets the next call probe instead"""
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._probing = False
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            self.opened_at = self.clock()
+            self._set_state(OPEN)
+
+
+class ProviderGuard:
+    """Timeouts, hedging and a circuit breaker around one upstream provider.
+
+    ``call`` takes a factory so a slow attempt can be duplicated: once an
+    attempt has run longer than the recent p95 latency of that operation, a
+    second one is started and whichever answers first wins. Hedges are
+    capped at ``hedge_budget`` of all calls so a slow provider does not get
+    double the load. A failure or timeout of the whole call counts against
+    the breaker; while it is open calls raise ``CircuitOpen`` immediately.
+    Each attempt is recorded as an upstream call; the ones the guard cancels
+    are recorded as "timeout" or "hedge_lost".
+    """
+
+    def __init__(
+        self,
+        provider: str,
+        timeout: float,
+        breaker: Optional[CircuitBreaker] = None,
+        bulkhead: Optional[Bulkhead] = None,
+        hedge_quantile: float = 0.95,
+        hedge_budget: float = 0.1,
+        min_samples: int = 20,
+        window: int = 200
+    ):
+        self.provider = provider
+        self.timeout = timeout
+        self.breaker = breaker or CircuitBreaker(provider)
+        self.bulkhead = bulkhead or Bulkhead(provider)
+        self.hedge_quantile = hedge_quantile
+        self.hedge_budget = hedge_budget
+        self.min_samples = min_samples
+        self._latencies: Dict[str, Deque[float]] = {}
+        self._window = window
+        self._calls = 0
+        self._hedges = 0
+
+    def hedge_delay(self, operation: str) -> Optional[float]:
+        """Recent ``hedge_quantile`` latency of ``operation``, or None without enough samples"""
+        latencies = self._latencies.get(operation)
+        if not latencies or len(latencies) < self.min_samples:
+            return None
+        ordered = sorted(latencies)
+        return ordered[min(len(ordered) - 1, math.ceil(self.hedge_quantile * len(ordered)) - 1)]
+
+    def _record_latency(self, operation: str, seconds: float) -> None:
+        self._latencies.setdefault(operation, deque(maxlen=self._window)).append(seconds)
+
+    async def _attempt(self, operation: str, attempt: Callable[[], Awaitable[Any]], calls: Dict[asyncio.Future, UpstreamCall]) -> Any:
+        # A bulkhead refusal raises here, before anything is sent upstream
+        pending = attempt()
+        async with track_upstream(self.provider, operation) as call:
+            calls[asyncio.current_task()] = call
+            call.payload = await pending
+            return call.payload
+
+    async def call_blocking(self, operation: str, blocking: Callable[[], Any]) -> Any:
+        """``call`` for a blocking client function, run on the guard's bulkhead"""
+        return await self.call(operation, lambda: self.bulkhead.run(blocking))
+
+    async def call(self, operation: str, attempt: Callable[[], Awaitable[Any]]) -> Any:
+        if not self.breaker.allow():
+            provider_calls.inc(provider=self.provider, operation=operation, outcome="short_circuited")
+            raise CircuitOpen(f"{self.provider} circuit is open")
+
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        deadline = start + self.timeout
+        self._calls += 1
+        # The half-open probe is never duplicated
+        delay = self.hedge_delay(operation) if self.breaker.state == CLOSED else None
+        calls: Dict[asyncio.Future, UpstreamCall] = {}
+        first = asyncio.ensure_future(self._attempt(operation, attempt, calls))
+        attempts = [first]
+        hedged = False
+        # Why attempts still running at the end get cancelled; None when the caller cancels us
+        abandoned: Optional[str] = None
+        error: Optional[BaseException] = None
+        try:
+            while attempts and loop.time() < deadline:
+                hedge_at = start + delay if delay is not None and not hedged and self._hedges < self.hedge_budget * self._calls else None
+                wake = min(deadline, hedge_at) if hedge_at is not None else deadline
+                done, _ = await asyncio.wait(attempts, timeout=max(wake - loop.time(), 0), return_when=asyncio.FIRST_COMPLETED)
+                for finished in done:
+                    attempts.remove(finished)
+                    if finished.exception() is not None:
+                        error = finished.exception()
+                        continue
+                    abandoned = "hedge_lost"
+                    self._record_latency(operation, loop.time() - start)
+                    self.breaker.record_success()
+                    provider_calls.inc(provider=self.provider, operation=operation, outcome="ok")
+                    if hedged:
+                        provider_hedges.inc(provider=self.provider, winner="original" if finished is first else "hedge")
+                    return finished.result()
+                if attempts and hedge_at is not None and loop.time() >= hedge_at:
+                    hedged = True
+                    self._hedges += 1
+                    attempts.append(asyncio.ensure_future(self._attempt(operation, attempt, calls)))
+            abandoned = "timeout"
+        except asyncio.CancelledError:
+            self.breaker.release_probe()
+            raise
+        finally:
+            for pending in attempts:
+                if abandoned and pending in calls:
+                    calls[pending].outcome = abandoned
+                pending.cancel()
+
+        self.breaker.record_failure()
+        if attempts or error is None:
+            provider_calls.inc(provider=self.provider, operation=operation, outcome="timeout")
+            raise asyncio.TimeoutError(f"{self.provider} {operation} timed out after {self.timeout}s")
+        provider_calls.inc(provider=self.provider, operation=operation, outcome="error")
+        raise error
+
+    def health(self) -> Dict[str, Any]:
+        return {
+            "provider": self.provider,
+            "state": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+            "hedge_delays_s": {operation: round(self.hedge_delay(operation) or 0, 3) for operation in self._latencies},
+            "hedged_requests": self._hedges,
+            "threads_busy": self.bulkhead.busy
+        }
@@ -0,0 +1,123 @@
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Sequence
+
+from metrics import registry
+from song_catalog import song_identity
+
+source_outcomes = registry.counter(
+    "search_source_outcomes_total", "Search sources by outcome (ok/empty/timeout/error/cancelled/skipped)", ("source", "outcome")
+)
+search_latency = registry.histogram(
+    "search_orchestrator_seconds", "Multi-source search latency", buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+)
+
+
+@dataclass
+class SearchSource:
+    """One place search results come from"""
+    name: str
+    search: Callable[[str], Awaitable[List[Dict[str, Any]]]]
+    timeout: float
+    # Speculative sources start after ``delay`` seconds, or as soon as the
+    # other sources are done, and only while results are still short
+    speculative: bool = False
+    delay: float = 0.0
+
+
+class SearchOrchestrator:
+    """Query every source at once and merge results as they arrive.
+
+    Songs are deduped by normalized title and artist, first arrival wins.
+    The search stops, cancelling whatever is still running, once it holds
+    ``limit`` songs, or ``enough`` songs with only speculative sources left.
+    Worst-case latency is the slowest source still needed, not the sum of
+    all timeouts.
+    """
+
+    def __init__(self, sources: Sequence[SearchSource], limit: int = 8, enough: int = 3):
+        self.sources = list(sources)
+        self.limit = limit
+        self.enough = enough
+        self._order = {source.name: index for index, source in enumerate(self.sources)}
+
+    async def stream(self, query: str) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Yield each batch of new songs, tagged with their ``source``"""
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        seen = set()
+        count = 0
+        running: Dict[asyncio.Task, SearchSource] = {}
+        waiting = [source for source in self.sources if source.speculative]
+
+        def launch(source: SearchSource) -> None:
+            running[asyncio.create_task(asyncio.wait_for(source.search(query), source.timeout))] = source
+
+        for source in self.sources:
+            if not source.speculative:
+                launch(source)
+        try:
+            while running or waiting:
+                primary_pending = any(not source.speculative for source in running.values())
+                elapsed = loop.time() - started
+                if count < self.enough:
+                    for source in list(waiting):
+                        if not primary_pending or elapsed >= source.delay:
+                            waiting.remove(source)
+                            launch(source)
+                if not running:
+                    break
+
+                next_start = min((source.delay - elapsed for source in waiting), default=None) if count < self.enough else None
+                done, _ = await asyncio.wait(
+                    running, timeout=max(next_start, 0) if next_start is not None else None, return_when=asyncio.FIRST_COMPLETED
+                )
+                fresh = []
+                for task in done:
+                    source = running.pop(task)
+                    for song in self._results(source, task):
+                        key = song_identity(song)
+                        if count < self.limit and key not in seen:
+                            seen.add(key)
+                            fresh.append({**song, "source": source.name})
+                            count += 1
+                if fresh:
+                    yield fresh
+
+                if count >= self.limit:
+                    break
+                if count >= self.enough and all(source.speculative for source in running.values()):
+                    break
+        finally:
+            for task, source in running.items():
+                task.cancel()
+                source_outcomes.inc(source=source.name, outcome="cancelled")
+            for source in waiting:
+                source_outcomes.inc(source=source.name, outcome="skipped")
+            search_latency.observe(loop.time() - started)
+
+    async def search(self, query: str) -> List[Dict[str, Any]]:
+        results = []
+        async for batch in self.stream(query):
+            results.extend(batch)
+        return self.ranked(results)
+
+    def ranked(self, results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Results in source order (sources listed first win), arrival order within a source"""
+        return sorted(results, key=lambda song: self._order.get(song.get("source"), len(self._order)))
+
+    @staticmethod
+    def _results(source: SearchSource, task: asyncio.Task) -> List[Dict[str, Any]]:
+        try:
+            results = task.result()
+        except asyncio.TimeoutError:
+            logging.warning(f"Search source {source.name} timed out after {source.timeout}s")
+            source_outcomes.inc(source=source.name, outcome="timeout")
+            return []
+        except Exception as e:
+            logging.warning(f"Search source {source.name} failed: {e!r}")
+            source_outcomes.inc(source=source.name, outcome="error")
+            return []
+        source_outcomes.inc(source=source.name, outcome="ok" if results else "empty")
+        return results or []
@@ -0,0 +1,117 @@
+import math
+import re
+import unicodedata
+from collections import Counter, OrderedDict
+from typing import Any, Dict, Hashable, Optional, Set, Tuple
+
+_PUNCTUATION_RE = re.compile(r"[^\w\s]")
+
+
+def normalize_text(text: str) -> str:
+    """Case, accents, punctuation and spacing folded away: " Rock  Nacionál!" -> "rock nacional" """
+    text = unicodedata.normalize("NFKD", str(text))
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    text = _PUNCTUATION_RE.sub(" ", text.casefold())
+    return " ".join(text.split())
+
+
+def trigrams(text: str) -> Counter:
+    """Character trigrams of each word, padded so word boundaries count"""
+    grams: Counter = Counter()
+    for word in text.split():
+        padded = f" {word} "
+        for index in range(len(padded) - 2):
+            grams[padded[index:index + 3]] += 1
+    return grams
+
+
+class SemanticIndex:
+    """Nearest previous prompt by trigram cosine similarity, fully in memory.
+
+    Entries live in namespaces (a cache type plus the fields that must
+    match exactly). Numbers in the text must match exactly too, so "anos
+    80" never answers for "anos 90". Candidates are found through an
+    inverted index from trigram to entry, so a lookup only scores entries
+    sharing at least one trigram with the query. The least recently used
+    entries are dropped once a namespace holds ``max_entries``.
+    """
+
+    def __init__(self, threshold: float = 0.85, max_entries: int = 5000):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._entries: Dict[Hashable, "OrderedDict[str, Tuple[Counter, float, Any]]"] = {}
+        self._postings: Dict[Hashable, Dict[str, Set[str]]] = {}
+
+    @staticmethod
+    def _bucket(namespace: Hashable, text: str) -> Hashable:
+        return (namespace, tuple(sorted(word for word in text.split() if word.isdigit())))
+
+    def add(self, namespace: Hashable, text: str, value: Any) -> None:
+        text = normalize_text(text)
+        namespace = self._bucket(namespace, text)
+        entries = self._entries.setdefault(namespace, OrderedDict())
+        postings = self._postings.setdefault(namespace, {})
+        if text in entries:
+            entries.move_to_end(text)
+            vector, norm, _ = entries[text]
+            entries[text] = (vector, norm, value)
+            return
+
+        vector = trigrams(text)
+        entries[text] = (vector, math.sqrt(sum(count * count for count in vector.values())), value)
+        for gram in vector:
+            postings.setdefault(gram, set()).add(text)
+        if len(entries) > self.max_entries:
+            self._remove(namespace, next(iter(entries)))
+
+    def discard(self, namespace: Hashable, text: str) -> None:
+        text = normalize_text(text)
+        self._remove(self._bucket(namespace, text), text)
+
+    def _remove(self, namespace: Hashable, text: str) -> None:
+        entries = self._entries.get(namespace)
+        if not entries or text not in entries:
+            return
+        vector, _, _ = entries.pop(text)
+        postings = self._postings[namespace]
+        for gram in vector:
+            texts = postings.get(gram)
+            if texts is not None:
+                texts.discard(text)
+                if not texts:
+                    del postings[gram]
+
+    def nearest(self, namespace: Hashable, text: str, threshold: Optional[float] = None) -> Optional[Tuple[str, Any, float]]:
+        """(stored text, value, similarity) of the closest entry at or above the threshold"""
+        threshold = self.threshold if threshold is None else threshold
+        text = normalize_text(text)
+        namespace = self._bucket(namespace, text)
+        entries = self._entries.get(namespace)
+        if not entries:
+            return None
+        if text in entries:
+            entries.move_to_end(text)
+            return text, entries[text][2], 1.0
+
+        vector = trigrams(text)
+        norm = math.sqrt(sum(count * count for count in vector.values()))
+        if not norm:
+            return None
+        postings = self._postings[namespace]
+        shared: Counter = Counter()
+        for gram, count in vector.items():
+            for candidate in postings.get(gram, ()):
+                shared[candidate] += count * entries[candidate][0][gram]
+
+        best: Optional[Tuple[str, Any, float]] = None
+        for candidate, dot in shared.items():
+            _, candidate_norm, value = entries[candidate]
+            score = dot / (norm * candidate_norm)
+            if score >= threshold and (best is None or score > best[2]):
+                best = (candidate, value, score)
+        if best is not None:
+            entries.move_to_end(best[0])
+        return best
+
+    def __len__(self) -> int:
+        return sum(len(entries) for entries in self._entries.values())
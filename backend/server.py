@@ -1,5 +1,6 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status, Query, Query
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, status, Query, Query, Request, Response
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi.responses import StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
@@ -13,26 +14,88 @@ import uuid
 from datetime import datetime, timedelta, timezone
 import bcrypt
 from jose import JWTError, jwt
-from emergentintegrations.llm.chat import LlmChat, UserMessage
 import asyncio
 import json
 import re
 from music_services import MusicAPIService
 from improved_music_services import ImprovedMusicService
 from cache_service import CacheService
+from song_catalog import SongCatalog
+from autocomplete import SongAutocomplete
+from recording_storage import RecordingStorage
+from recording_streaming import RangeFileResponse
+from audio_mixdown import MixdownService
+from socket_manager import create_client_manager
+from presence import PresenceRegistry, RoomPresence
+from instrumentation import upstream_summary
+from llm_gateway import LLMGateway, LLMOverloaded
+from repertoire_stream import parse_repertoire_line, sse_event, stream_repertoire_songs
+from loop_monitor import LoopMonitor
+from profiler import ProfilerBusy, SamplingProfiler
+from slow_query_log import SlowQueryListener
+from tracing import TracedDatabase, TracingMiddleware
+from metrics import MetricsMiddleware, instrument_socketio, registry as metrics_registry, CONTENT_TYPE as METRICS_CONTENT_TYPE
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+# Commands slower than SLOW_QUERY_MS are logged; SLOW_QUERY_EXPLAIN explains each new shape once
+slow_query_listener = SlowQueryListener(
+    threshold_ms=float(os.environ.get('SLOW_QUERY_MS', '100')),
+    explain=os.environ.get('SLOW_QUERY_EXPLAIN', '').lower() in ('1', 'true', 'yes')
+)
+client = AsyncIOMotorClient(mongo_url, event_listeners=[slow_query_listener])
+slow_query_listener.attach(client)
+db = TracedDatabase(client[os.environ['DB_NAME']])
+
+# Shared LLM client pool; LLM_MAX_CONCURRENCY caps completions in flight,
+# LLM_RATE_PER_MINUTE (with LLM_BURST) how fast they start, LLM_MAX_QUEUE how many may wait
+llm_gateway = LLMGateway(
+    os.environ.get('EMERGENT_LLM_KEY'),
+    max_concurrency=int(os.environ.get('LLM_MAX_CONCURRENCY', '8')),
+    rate_per_second=float(os.environ.get('LLM_RATE_PER_MINUTE', '120')) / 60 or None,
+    burst=int(os.environ.get('LLM_BURST', '10')),
+    max_queue=int(os.environ.get('LLM_MAX_QUEUE', '50'))
+)
 
 # Initialize music API services
-cache_service = CacheService(db)
-music_service = MusicAPIService(cache_service)
-improved_music_service = ImprovedMusicService(cache_service)
+cache_service = CacheService(db, similarity_threshold=float(os.environ.get('SEMANTIC_CACHE_THRESHOLD', '0.85')))
+
+# Local song catalog: bundled songs now, the songs collection at startup, new songs as they are saved
+song_catalog = SongCatalog()
+song_catalog.load_file()
+music_service = MusicAPIService(cache_service, llm_gateway, catalog=song_catalog)
+improved_music_service = ImprovedMusicService(cache_service, llm_gateway, catalog=song_catalog)
+song_autocomplete = SongAutocomplete()
+song_autocomplete.add_many(song_catalog.songs.values())
+
+def index_song(song_doc: Dict[str, Any]) -> None:
+    """Make a newly saved song searchable and suggestible"""
+    song_catalog.add(song_doc)
+    song_autocomplete.add(song_doc)
+
+# Recording storage (chunks streamed over Socket.IO)
+recording_storage = RecordingStorage(
+    os.environ.get('RECORDINGS_DIR', str(ROOT_DIR / 'recordings')),
+    fsync_policy=os.environ.get('RECORDING_FSYNC_POLICY', 'interval')
+)
+mixdown_service = MixdownService()
+mixdown_tasks = set()
+
+# Socket.IO connections this worker serves, and who is online per room across all workers
+presence = PresenceRegistry()
+room_presence = RoomPresence(db.room_presence, heartbeat_timeout=presence.heartbeat_timeout)
+
+# Event loop lag sampler; toggled at runtime through /api/admin/loop-monitor
+loop_monitor = LoopMonitor(threshold=float(os.environ.get('LOOP_BLOCK_THRESHOLD_MS', '100')) / 1000)
+
+# On-demand sampling profiler for /api/admin/profile
+sampling_profiler = SamplingProfiler()
+
+# Operators allowed to use the diagnostics endpoints
+ADMIN_EMAILS = {email.strip().lower() for email in os.environ.get('ADMIN_EMAILS', '').split(',') if email.strip()}
 
 # JWT Configuration
 SECRET_KEY = "music_maestro_secret_key_2025"
@@ -40,22 +103,23 @@ ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
 # Create Socket.IO server
+# SOCKETIO_MESSAGE_QUEUE (redis://, amqp:// or local://) fans emits out across workers
 sio = socketio.AsyncServer(
     async_mode='asgi',
-    cors_allowed_origins="*"
+    cors_allowed_origins="*",
+    client_manager=create_client_manager(os.environ.get('SOCKETIO_MESSAGE_QUEUE'))
 )
+instrument_socketio(sio)
 
 # Create the main app
 app = FastAPI()
 api_router = APIRouter(prefix="/api")
 security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
 
 # Mount Socket.IO
 socket_app = socketio.ASGIApp(sio, app)
 
-# LLM Configuration
-EMERGENT_LLM_KEY = os.environ.get('EMERGENT_LLM_KEY')
-
 # Chord transposition mappings
 CHORD_MAPPINGS = {
     'C': 0, 'C#': 1, 'Db': 1, 'D': 2, 'D#': 3, 'Eb': 3, 'E': 4, 'F': 5,
@@ -179,6 +243,8 @@ class Recording(BaseModel):
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     is_playing: bool = False
     volume: float = 1.0
+    file_size: Optional[int] = None
+    is_mixdown: bool = False
 
 class StartRecordingRequest(BaseModel):
     recording_name: str
@@ -258,27 +324,50 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
+async def authenticate_token(token: str) -> Optional[User]:
     try:
-        token = credentials.credentials
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         user_email: str = payload.get("sub")
         if user_email is None:
-            raise credentials_exception
+            return None
     except JWTError:
-        raise credentials_exception
+        return None
     
     user = await db.users.find_one({"email": user_email})
     if user is None:
-        raise credentials_exception
+        return None
     
     return User(**user)
 
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    user = await authenticate_token(credentials.credentials)
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return user
+
+async def get_admin_user(current_user: User = Depends(get_current_user)):
+    if current_user.email.lower() not in ADMIN_EMAILS:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return current_user
+
+async def get_stream_user(
+    token: Optional[str] = Query(None, description="Access token for media elements that cannot send headers"),
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security)
+):
+    if credentials is None and token:
+        credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+    if credentials is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return await get_current_user(credentials)
+
 async def search_song_data(title: str, artist: str) -> Dict[str, Any]:
     """Search for song data using real APIs (Spotify + Genius) + AI fallback"""
     try:
@@ -315,7 +404,7 @@ async def search_song_data(title: str, artist: str) -> Dict[str, Any]:
         }
 
 async def intelligent_song_search(query: str) -> List[Dict[str, Any]]:
-    """Intelligent search using Spotify + AI fallback"""
+    """Intelligent search over the catalog, Spotify and AI at once"""
     try:
         # Use the music service for intelligent search
         results = await music_service.intelligent_search(query)
@@ -369,25 +458,59 @@ def transpose_chords_string(chords_text: str, from_key: str, to_key: str) -> str
 # Socket.IO Event Handlers
 @sio.event
 async def connect(sid, environ, auth):
-    print(f"Client connected: {sid}")
+    token = (auth or {}).get('token')
+    user = await authenticate_token(token) if token else None
+    if user is None:
+        raise socketio.exceptions.ConnectionRefusedError('Authentication failed')
+    
+    presence.connect(sid, user.id, user.name)
+    logging.info(f"Client connected: {sid} ({user.email})")
 
 @sio.event
 async def disconnect(sid):
-    print(f"Client disconnected: {sid}")
+    connection, rooms = presence.disconnect(sid)
+    if connection:
+        for room_id in rooms:
+            if await room_presence.leave(room_id, connection.user_id, sid):
+                await sio.emit('user_left', {'user_id': connection.user_id}, room=room_id)
+    logging.info(f"Client disconnected: {sid}")
 
 @sio.event
 async def join_room(sid, data):
     room_id = data.get('room_id')
-    if room_id:
+    connection = presence.get(sid)
+    if room_id and connection:
         await sio.enter_room(sid, room_id)
-        await sio.emit('user_joined', {'user_id': data.get('user_id'), 'user_name': data.get('user_name')}, room=room_id)
+        # Identity comes from the authenticated connection, not the payload
+        if presence.join(sid, room_id) and await room_presence.join(room_id, connection.user_id, connection.user_name, sid):
+            await sio.emit('user_joined', {'user_id': connection.user_id, 'user_name': connection.user_name}, room=room_id)
+        await sio.emit('room_presence', {'room_id': room_id, 'online': await room_presence.online_users(room_id)}, room=sid)
 
 @sio.event
 async def leave_room(sid, data):
     room_id = data.get('room_id')
-    if room_id:
+    connection = presence.get(sid)
+    if room_id and connection:
         await sio.leave_room(sid, room_id)
-        await sio.emit('user_left', {'user_id': data.get('user_id')}, room=room_id)
+        if presence.leave(sid, room_id) and await room_presence.leave(room_id, connection.user_id, sid):
+            await sio.emit('user_left', {'user_id': connection.user_id}, room=room_id)
+
+@sio.event
+async def heartbeat(sid, data=None):
+    if not presence.heartbeat(sid):
+        return {'ok': False}
+    connection = presence.get(sid)
+    await room_presence.heartbeat(connection.user_id, sid, list(connection.rooms))
+    return {'ok': True}
+
+async def reap_stale_connections(interval: float = 30.0):
+    while True:
+        await asyncio.sleep(interval)
+        for sid in presence.stale_sids():
+            await sio.disconnect(sid)
+        # Users whose worker went away without disconnecting them
+        for room_id, user_id in await room_presence.reap():
+            await sio.emit('user_left', {'user_id': user_id}, room=room_id)
 
 @sio.event
 async def song_changed(sid, data):
@@ -417,14 +540,39 @@ async def audio_stream(sid, data):
 
 @sio.event
 async def recording_chunk(sid, data):
-    room_id = data.get('room_id')
     recording_id = data.get('recording_id')
     chunk_data = data.get('chunk_data')
-    # In production, save chunk to file system or cloud storage
-    # For now, just acknowledge receipt
+    chunk_index = data.get('chunk_index')
+    if not recording_id or chunk_data is None:
+        return
+    
+    try:
+        if recording_storage.get_writer(recording_id) is None:
+            # First chunk seen by this worker (or chunks resuming after a restart)
+            recording = await db.recordings.find_one({"id": recording_id})
+            if (
+                not recording
+                or recording.get("duration") is not None
+                or not recording_storage.claim(recording["filename"])
+            ):
+                await sio.emit('chunk_received', {
+                    'recording_id': recording_id,
+                    'chunk_index': chunk_index,
+                    'status': 'rejected'
+                }, room=sid)
+                return
+            recording_storage.open(recording_id, recording["filename"])
+        
+        # 'duplicate' and 'rejected' tell the client not to resend
+        status_text = await recording_storage.append_chunk(recording_id, chunk_data, chunk_index)
+    except Exception as e:
+        logging.error(f"Error storing recording chunk for {recording_id}: {e}")
+        status_text = 'error'
+    
     await sio.emit('chunk_received', {
         'recording_id': recording_id,
-        'status': 'received'
+        'chunk_index': chunk_index,
+        'status': status_text
     }, room=sid)
 
 # Authentication Routes
@@ -492,6 +640,14 @@ async def login(user_credentials: UserLogin):
 # Song Routes
 @api_router.post("/songs/search", response_model=Song)
 async def search_song(song_data: SongCreate, current_user: User = Depends(get_current_user)):
+    # The local catalog resolves which saved song is meant, typos and spacing included;
+    # the document itself is read by id, since other copies may have been transposed since
+    known_song = song_catalog.best_match(song_data.title, song_data.artist)
+    if known_song and known_song.get("id"):
+        existing_song = await db.songs.find_one({"id": known_song["id"]})
+        if existing_song:
+            return Song(**existing_song)
+    
     # Check if song already exists
     existing_song = await db.songs.find_one({
         "title": {"$regex": f"^{song_data.title}$", "$options": "i"},
@@ -512,14 +668,47 @@ async def search_song(song_data: SongCreate, current_user: User = Depends(get_cu
     )
     
     await db.songs.insert_one(song.dict())
+    index_song(song.dict())
     return song
 
 @api_router.post("/songs/intelligent-search")
 async def intelligent_search(search_data: SongSearch, current_user: User = Depends(get_current_user)):
-    """Spotify + AI powered song search"""
+    """Catalog + Spotify + AI powered song search"""
     results = await intelligent_song_search(search_data.query)
     return {"results": results}
 
+@api_router.post("/songs/intelligent-search/stream")
+async def stream_intelligent_search(search_data: SongSearch, current_user: User = Depends(get_current_user)):
+    """
+    Server-sent events: a "results" event per source as it answers, then "done" with the ranked list (or "error")
+    """
+    async def events():
+        results = []
+        try:
+            async for batch in music_service.intelligent_search_stream(search_data.query):
+                results.extend(batch)
+                yield sse_event("results", {"songs": batch})
+        except Exception as e:
+            logging.error(f"Error streaming intelligent search: {e}")
+            yield sse_event("error", {"status": 500, "detail": "Erro na busca inteligente"})
+            return
+        yield sse_event("done", {"results": music_service.search_orchestrator.ranked(results)})
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@api_router.get("/songs/autocomplete")
+async def autocomplete_songs(
+    q: str = Query("", max_length=100),
+    limit: int = Query(8, ge=1, le=20),
+    current_user: User = Depends(get_current_user)
+):
+    """Typeahead suggestions from known songs, most used first"""
+    return {"suggestions": song_autocomplete.suggest(q, limit)}
+
 @api_router.post("/songs/recognize-audio")
 async def recognize_audio_endpoint(
     audio_file: bytes,
@@ -585,6 +774,7 @@ async def transpose_song(
         {"id": song_id},
         {"$set": {"key": transpose_data.to_key, "chords": new_chords}}
     )
+    song_catalog.update(song_id, {"key": transpose_data.to_key, "chords": new_chords})
     
     return {
         "message": "Song transposed successfully",
@@ -612,6 +802,7 @@ async def search_song_enhanced(
         song_data["id"] = str(uuid.uuid4())
         song = Song(**song_data)
         await db.songs.insert_one(song.dict())
+        index_song(song.dict())
         
         return song
         
@@ -879,6 +1070,7 @@ async def generate_repertoire_fast(
             song_data["id"] = str(uuid.uuid4())
             song = Song(**song_data)
             await db.songs.insert_one(song.dict())
+            index_song(song.dict())
             song_ids.append(song.id)
         
         return {
@@ -927,13 +1119,22 @@ async def join_room(join_data: JoinRoom, current_user: User = Depends(get_curren
 
 @api_router.get("/rooms/{room_id}")
 async def get_room(room_id: str, current_user: User = Depends(get_current_user)):
+    room_data = await load_room_state(room_id)
+    
+    # Who is connected right now, on any worker
+    room_data["online_members"] = await room_presence.online_users(room_id)
+    return room_data
+
+@api_router.get("/rooms/{room_id}/online")
+async def get_online_members(room_id: str, current_user: User = Depends(get_current_user)):
+    online = await room_presence.online_users(room_id)
+    return {"online": online, "count": len(online)}
+
+async def load_room_state(room_id: str) -> Dict[str, Any]:
     room = await db.rooms.find_one({"id": room_id})
     if not room:
         raise HTTPException(status_code=404, detail="Room not found")
     
-    # Get room members
-    members = await db.room_members.find({"room_id": room_id}).to_list(100)
-    
     # Get current and next songs
     current_song = None
     next_song = None
@@ -946,7 +1147,6 @@ async def get_room(room_id: str, current_user: User = Depends(get_current_user))
     
     return {
         "room": Room(**room),
-        "members": [RoomMember(**member) for member in members],
         "current_song": Song(**current_song) if current_song else None,
         "next_song": Song(**next_song) if next_song else None
     }
@@ -1013,6 +1213,7 @@ async def transpose_room_repertoire(
                 {"id": room["current_song_id"]},
                 {"$set": {"key": transpose_data.to_key, "chords": new_chords}}
             )
+            song_catalog.update(room["current_song_id"], {"key": transpose_data.to_key, "chords": new_chords})
     
     # Emit real-time update
     await sio.emit('transpose_changed', {
@@ -1025,14 +1226,14 @@ async def transpose_room_repertoire(
 
 @api_router.get("/rooms/{room_id}/sync")
 async def sync_room_state(room_id: str, current_user: User = Depends(get_current_user)):
-    room_data = await get_room(room_id, current_user)
+    room_data = await load_room_state(room_id)
     
     # Emit current state to all users in room
     await sio.emit('room_sync', {
         'room': room_data["room"].dict() if hasattr(room_data["room"], 'dict') else room_data["room"],
         'current_song': room_data["current_song"].dict() if room_data["current_song"] and hasattr(room_data["current_song"], 'dict') else room_data["current_song"],
         'next_song': room_data["next_song"].dict() if room_data["next_song"] and hasattr(room_data["next_song"], 'dict') else room_data["next_song"],
-        'members': [member.dict() if hasattr(member, 'dict') else member for member in room_data["members"]]
+        'members': await room_presence.online_users(room_id)
     }, room=room_id)
     
     return {"message": "Room state synchronized"}
@@ -1054,14 +1255,8 @@ async def get_recommendations(room_id: str, current_user: User = Depends(get_cur
         return {"recommendations": []}
     
     try:
-        chat = LlmChat(
-            api_key=EMERGENT_LLM_KEY,
-            session_id=f"recommendations_{uuid.uuid4()}",
-            system_message="Você é um especialista musical que recomenda músicas para shows ao vivo baseado no estilo e energia."
-        ).with_model("openai", "gpt-5")
-        
-        message = UserMessage(
-            text=f"""Baseado na música atual "{current_song["title"]}" de "{current_song["artist"]}" 
+        response = await llm_gateway.complete(
+            f"""Baseado na música atual "{current_song["title"]}" de "{current_song["artist"]}" 
             (gênero: {current_song["genre"]}, tom: {current_song["key"]}), 
             recomende 5 músicas que fluiriam bem em seguida para um show ao vivo.
             
@@ -1070,11 +1265,13 @@ async def get_recommendations(room_id: str, current_user: User = Depends(get_cur
             - Compatibilidade harmônica
             - Facilidade de transição para os músicos
             
-            Responda apenas com uma lista simples de "Título - Artista" para cada recomendação."""
+            Responda apenas com uma lista simples de "Título - Artista" para cada recomendação.""",
+            timeout=10.0,
+            system_message="Você é um especialista musical que recomenda músicas para shows ao vivo baseado no estilo e energia.",
+            operation="recommendations",
+            priority="interactive"
         )
         
-        response = await chat.send_message(message)
-        
         # Parse recommendations
         recommendations = []
         lines = response.strip().split('\n')
@@ -1089,30 +1286,51 @@ async def get_recommendations(room_id: str, current_user: User = Depends(get_cur
         return {"recommendations": []}
 
 # AI Repertoire Generation - OPTIMIZED
-@api_router.post("/rooms/{room_id}/generate-repertoire")
-async def generate_ai_repertoire(
-    room_id: str,
-    repertoire_request: AIRepertoireRequest,
-    current_user: User = Depends(get_current_user)
-):
+REPERTOIRE_SYSTEM_MESSAGE = "Curador musical rápido. Responda apenas com lista de músicas."
+
+def repertoire_prompt(repertoire_request: AIRepertoireRequest) -> str:
+    # Shorter, more focused prompt for speed
+    return f"""Repertório {repertoire_request.style} - {repertoire_request.duration_minutes}min
+            Energia: {repertoire_request.energy_level}
+            Público: {repertoire_request.audience_type}
+            
+            Liste 15 músicas conhecidas no formato exato:
+            "Título - Artista - 3min"
+            
+            APENAS a lista, sem texto adicional."""
+
+def repertoire_cache_key(repertoire_request: AIRepertoireRequest) -> Dict[str, Any]:
+    return {
+        "style": repertoire_request.style,
+        "duration": repertoire_request.duration_minutes,
+        "energy": repertoire_request.energy_level,
+        "audience": repertoire_request.audience_type
+    }
+
+async def get_admin_room(room_id: str, current_user: User) -> Dict[str, Any]:
     room = await db.rooms.find_one({"id": room_id})
     if not room:
         raise HTTPException(status_code=404, detail="Room not found")
     
     if room["admin_id"] != current_user.id:
         raise HTTPException(status_code=403, detail="Only admin can generate repertoire")
+    return room
+
+@api_router.post("/rooms/{room_id}/generate-repertoire")
+async def generate_ai_repertoire(
+    room_id: str,
+    repertoire_request: AIRepertoireRequest,
+    current_user: User = Depends(get_current_user)
+):
+    await get_admin_room(room_id, current_user)
     
     # Check cache first for repertoire generation
-    cache_key_data = {
-        "style": repertoire_request.style,
-        "duration": repertoire_request.duration_minutes,
-        "energy": repertoire_request.energy_level,
-        "audience": repertoire_request.audience_type
-    }
+    cache_key_data = repertoire_cache_key(repertoire_request)
     
-    cached_repertoire = await cache_service.get_cached_result(
+    cached_repertoire = await cache_service.get_similar_result(
         "ai_repertoire",
         cache_key_data,
+        text_field="style",
         max_age_hours=48  # Cache repertoires for 2 days
     )
     
@@ -1121,48 +1339,15 @@ async def generate_ai_repertoire(
         return cached_repertoire
     
     try:
-        chat = LlmChat(
-            api_key=EMERGENT_LLM_KEY,
-            session_id=f"repertoire_{repertoire_request.style}_{repertoire_request.duration_minutes}",
-            system_message="Curador musical rápido. Responda apenas com lista de músicas."
-        ).with_model("openai", "gpt-5")
-        
-        # Shorter, more focused prompt for speed
-        message = UserMessage(
-            text=f"""Repertório {repertoire_request.style} - {repertoire_request.duration_minutes}min
-            Energia: {repertoire_request.energy_level}
-            Público: {repertoire_request.audience_type}
-            
-            Liste 15 músicas conhecidas no formato exato:
-            "Título - Artista - 3min"
-            
-            APENAS a lista, sem texto adicional."""
-        )
-        
-        # Set timeout for AI call
-        response = await asyncio.wait_for(
-            chat.send_message(message),
-            timeout=12.0  # 12 second timeout
+        response = await llm_gateway.complete(
+            repertoire_prompt(repertoire_request),
+            timeout=12.0,  # 12 second timeout
+            system_message=REPERTOIRE_SYSTEM_MESSAGE,
+            operation="room_repertoire"
         )
         
         # Parse repertoire quickly
-        repertoire = []
-        lines = response.strip().split('\n')
-        for line in lines:
-            line = line.strip()
-            if ' - ' in line and len(line.split(' - ')) >= 2:
-                parts = line.split(' - ')
-                if len(parts) >= 2:
-                    title = parts[0].strip(' "')
-                    artist = parts[1].strip()
-                    duration = parts[2].strip() if len(parts) > 2 else "3min"
-                    
-                    repertoire.append({
-                        "title": title,
-                        "artist": artist,
-                        "duration": duration,
-                        "original_line": line
-                    })
+        repertoire = [song for song in map(parse_repertoire_line, response.strip().split('\n')) if song]
         
         result = {
             "repertoire": repertoire,
@@ -1172,14 +1357,18 @@ async def generate_ai_repertoire(
         }
         
         # Cache the result
-        await cache_service.set_cached_result(
+        await cache_service.set_similar_result(
             "ai_repertoire",
             cache_key_data,
+            "style",
             result
         )
         
         return result
         
+    except LLMOverloaded:
+        logging.warning("AI repertoire generation shed: LLM queue is busy")
+        raise HTTPException(status_code=503, detail="AI is busy right now. Try again shortly.", headers={"Retry-After": "10"})
     except asyncio.TimeoutError:
         logging.warning("AI repertoire generation timeout")
         raise HTTPException(status_code=408, detail="Timeout generating repertoire. Try again.")
@@ -1187,6 +1376,72 @@ async def generate_ai_repertoire(
         logging.error(f"Error generating repertoire: {e}")
         raise HTTPException(status_code=500, detail="Error generating repertoire")
 
+@api_router.post("/rooms/{room_id}/generate-repertoire/stream")
+async def stream_ai_repertoire(
+    room_id: str,
+    repertoire_request: AIRepertoireRequest,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Server-sent events: one "song" event per parsed line, then "done" (or "error").
+    Songs only arrive ahead of the full reply when the LLM client streams
+    (see LLMGateway.stream); with LlmChat they all arrive once it completes.
+    """
+    await get_admin_room(room_id, current_user)
+    cache_key_data = repertoire_cache_key(repertoire_request)
+    
+    async def events():
+        repertoire = []
+        partial = False
+        cached_repertoire = await cache_service.get_similar_result("ai_repertoire", cache_key_data, "style", max_age_hours=48)
+        try:
+            if cached_repertoire:
+                songs = cached_repertoire["repertoire"]
+                for song in songs:
+                    repertoire.append(song)
+                    yield sse_event("song", {"index": len(repertoire) - 1, "song": song})
+            else:
+                pieces = llm_gateway.stream(
+                    repertoire_prompt(repertoire_request),
+                    timeout=12.0,
+                    system_message=REPERTOIRE_SYSTEM_MESSAGE,
+                    operation="room_repertoire_stream"
+                )
+                async for song in stream_repertoire_songs(pieces):
+                    repertoire.append(song)
+                    yield sse_event("song", {"index": len(repertoire) - 1, "song": song})
+        except LLMOverloaded:
+            logging.warning("AI repertoire stream shed: LLM queue is busy")
+            yield sse_event("error", {"status": 503, "detail": "AI is busy right now. Try again shortly."})
+            return
+        except asyncio.TimeoutError:
+            logging.warning(f"AI repertoire stream timeout after {len(repertoire)} songs")
+            if not repertoire:
+                yield sse_event("error", {"status": 408, "detail": "Timeout generating repertoire. Try again."})
+                return
+            # Keep what arrived in time, but do not cache a truncated list
+            partial = True
+        except Exception as e:
+            logging.error(f"Error streaming repertoire: {e}")
+            yield sse_event("error", {"status": 500, "detail": "Error generating repertoire"})
+            return
+        
+        result = {
+            "repertoire": repertoire,
+            "style": repertoire_request.style,
+            "total_songs": len(repertoire),
+            "estimated_duration": repertoire_request.duration_minutes
+        }
+        if repertoire and not cached_repertoire and not partial:
+            await cache_service.set_similar_result("ai_repertoire", cache_key_data, "style", result)
+        yield sse_event("done", {**result, "partial": partial})
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 # Recording functionality
 @api_router.post("/rooms/{room_id}/start-recording")
 async def start_recording(
@@ -1219,6 +1474,12 @@ async def start_recording(
     
     return {"message": "Recording started", "recording_id": recording.id, "recording": recording.dict()}
 
+async def store_recording_size(recording_id: str, file_size: int):
+    await db.recordings.update_one(
+        {"id": recording_id},
+        {"$set": {"file_size": file_size}}
+    )
+
 @api_router.post("/rooms/{room_id}/stop-recording/{recording_id}")
 async def stop_recording(
     room_id: str, 
@@ -1235,8 +1496,15 @@ async def stop_recording(
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Recording not found or not owned by user")
     
-    # Get updated recording
+    # Flush and close the recording file; if another worker owns it, let its reaper finalize
+    file_size = await recording_storage.finalize(recording_id)
     recording = await db.recordings.find_one({"id": recording_id})
+    if file_size is not None:
+        await store_recording_size(recording_id, file_size)
+        recording["file_size"] = file_size
+    elif not recording_storage.request_stop(recording["filename"]):
+        # No worker is writing it (no chunks arrived, or its owner is gone)
+        logging.info(f"Recording {recording_id} stopped with no live writer")
     
     # Emit to all room members
     await sio.emit('recording_stopped', {
@@ -1253,6 +1521,63 @@ async def get_recordings(room_id: str, current_user: User = Depends(get_current_
     recordings = await db.recordings.find({"room_id": room_id}).sort("created_at", -1).to_list(100)
     return {"recordings": [Recording(**rec) for rec in recordings]}
 
+async def run_room_mixdown(room_id: str, mixdown: Recording, recordings: List[Dict[str, Any]]):
+    try:
+        result = await mixdown_service.mixdown(
+            recordings,
+            [recording_storage.path_for(rec["filename"]) for rec in recordings],
+            recording_storage.path_for(mixdown.filename)
+        )
+        mixdown.duration = result["duration"]
+        mixdown.file_size = result["file_size"]
+        await db.recordings.insert_one(mixdown.dict())
+        
+        await sio.emit('mixdown_ready', {
+            'recording_id': mixdown.id,
+            'track_count': result["track_count"],
+            'recording': mixdown.dict()
+        }, room=room_id)
+    except Exception as e:
+        logging.error(f"Mixdown error for room {room_id}: {e}")
+        await sio.emit('mixdown_failed', {
+            'recording_id': mixdown.id,
+            'error': str(e)
+        }, room=room_id)
+
+@api_router.post("/rooms/{room_id}/recordings/mixdown")
+async def create_mixdown(room_id: str, current_user: User = Depends(get_current_user)):
+    """Mix the room's finished recordings into a single track using their stored volumes"""
+    room = await db.rooms.find_one({"id": room_id})
+    if not room:
+        raise HTTPException(status_code=404, detail="Room not found")
+    
+    recordings = await db.recordings.find({
+        "room_id": room_id,
+        "is_mixdown": {"$ne": True},
+        "file_size": {"$gt": 0}
+    }).to_list(100)
+    
+    if not recordings:
+        raise HTTPException(status_code=400, detail="No finished recordings to mix")
+    
+    mixdown_id = str(uuid.uuid4())
+    mixdown = Recording(
+        id=mixdown_id,
+        room_id=room_id,
+        user_id=current_user.id,
+        user_name=current_user.name,
+        recording_name=f"Mixdown ({len(recordings)} faixas)",
+        filename=f"mixdown_{room_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{mixdown_id}.wav",
+        is_mixdown=True
+    )
+    
+    # Mixing happens in a process pool; members are notified when it is ready
+    task = asyncio.create_task(run_room_mixdown(room_id, mixdown, recordings))
+    mixdown_tasks.add(task)
+    task.add_done_callback(mixdown_tasks.discard)
+    
+    return {"message": "Mixdown started", "recording_id": mixdown.id, "track_count": len(recordings)}
+
 # New collaborative playback endpoints
 @api_router.post("/rooms/{room_id}/recordings/{recording_id}/play")
 async def play_recording(
@@ -1271,12 +1596,43 @@ async def play_recording(
     )
     
     # Emit to all room members
+    stream_url = f"/api/rooms/{room_id}/recordings/{recording_id}/stream"
     await sio.emit('recording_play', {
         'recording_id': recording_id,
+        'stream_url': stream_url,
         'triggered_by': current_user.name
     }, room=room_id)
     
-    return {"message": "Recording playing"}
+    return {"message": "Recording playing", "stream_url": stream_url}
+
+@api_router.api_route("/rooms/{room_id}/recordings/{recording_id}/stream", methods=["GET", "HEAD"])
+async def stream_recording(
+    room_id: str,
+    recording_id: str,
+    request: Request,
+    current_user: User = Depends(get_stream_user)
+):
+    """Serve recording audio with Range support, including takes still being recorded"""
+    recording = await db.recordings.find_one({"id": recording_id, "room_id": room_id})
+    if not recording:
+        raise HTTPException(status_code=404, detail="Recording not found")
+    
+    # Push buffered chunks to disk so near-live readers see the latest audio
+    writer = recording_storage.get_writer(recording_id)
+    if writer:
+        await writer.flush()
+    
+    path = recording_storage.path_for(recording["filename"])
+    if not path.exists():
+        raise HTTPException(status_code=404, detail="Recording audio not available")
+    
+    return RangeFileResponse(
+        path,
+        range_header=request.headers.get("range"),
+        if_range=request.headers.get("if-range"),
+        if_none_match=request.headers.get("if-none-match"),
+        is_live=lambda: recording_storage.is_live(recording_id, recording["filename"])
+    )
 
 @api_router.post("/rooms/{room_id}/recordings/{recording_id}/pause")
 async def pause_recording(
@@ -1349,6 +1705,10 @@ async def delete_recording(
     
     # Delete recording
     await db.recordings.delete_one({"id": recording_id})
+    await recording_storage.finalize(recording_id)
+    # Still being written on another worker: its owner deletes the file once finalized
+    if not recording_storage.request_stop(recording["filename"], delete=True):
+        recording_storage.delete(recording["filename"])
     
     # Emit to all room members
     await sio.emit('recording_deleted', {
@@ -1415,6 +1775,7 @@ async def update_room_settings(
                     {"id": room["current_song_id"]},
                     {"$set": {"key": settings.key, "chords": new_chords}}
                 )
+                song_catalog.update(room["current_song_id"], {"key": settings.key, "chords": new_chords})
     if settings.font_size is not None:
         update_data["font_size"] = settings.font_size
     
@@ -1464,6 +1825,7 @@ async def add_song_to_playlist(
     current_playlist = room.get("playlist", [])
     if song_id not in current_playlist:
         current_playlist.append(song_id)
+        song_autocomplete.record_use(song)
         await db.rooms.update_one(
             {"id": room_id},
             {"$set": {"playlist": current_playlist}}
@@ -1639,6 +2001,77 @@ async def next_song_in_playlist(
 async def root():
     return {"message": "Music Maestro API", "version": "1.0.0"}
 
+@api_router.get("/metrics")
+async def get_metrics(credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security)):
+    # Scrapers authenticate with METRICS_TOKEN when it is set
+    metrics_token = os.environ.get('METRICS_TOKEN')
+    if metrics_token and (credentials is None or credentials.credentials != metrics_token):
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return Response(content=metrics_registry.render(), media_type=METRICS_CONTENT_TYPE)
+
+@api_router.get("/cache/stats")
+async def get_cache_stats(current_user: User = Depends(get_current_user)):
+    return await cache_service.get_cache_stats()
+
+class LoopMonitorSettings(BaseModel):
+    enabled: bool
+    threshold_ms: Optional[float] = None
+
+@api_router.get("/admin/loop-monitor")
+async def get_loop_monitor(admin: User = Depends(get_admin_user)):
+    return loop_monitor.stats()
+
+@api_router.post("/admin/loop-monitor")
+async def set_loop_monitor(settings: LoopMonitorSettings, admin: User = Depends(get_admin_user)):
+    if settings.threshold_ms is not None:
+        loop_monitor.threshold = max(settings.threshold_ms, 1.0) / 1000
+    if settings.enabled:
+        loop_monitor.start()
+    else:
+        loop_monitor.stop()
+    return loop_monitor.stats()
+
+class SlowQuerySettings(BaseModel):
+    threshold_ms: Optional[float] = None
+    explain: Optional[bool] = None
+
+@api_router.get("/admin/slow-queries")
+async def get_slow_queries(admin: User = Depends(get_admin_user)):
+    return slow_query_listener.report()
+
+@api_router.post("/admin/slow-queries")
+async def set_slow_queries(settings: SlowQuerySettings, admin: User = Depends(get_admin_user)):
+    if settings.threshold_ms is not None:
+        slow_query_listener.threshold_ms = max(settings.threshold_ms, 0.0)
+    if settings.explain is not None:
+        slow_query_listener.explain = settings.explain
+    return slow_query_listener.report()
+
+@api_router.get("/admin/profile")
+async def run_profile(
+    seconds: float = Query(10.0, gt=0, le=60),
+    interval_ms: float = Query(10.0, ge=1, le=100),
+    filter: Optional[str] = Query(None, description="Only keep samples of this route or Socket.IO event (e.g. 'GET /api/songs' or 'socketio:join_room')"),
+    admin: User = Depends(get_admin_user)
+):
+    try:
+        result = await sampling_profiler.profile(seconds, filter, interval=interval_ms / 1000)
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    
+    return Response(
+        content=result["collapsed"],
+        media_type="text/plain",
+        headers={
+            "Content-Disposition": 'attachment; filename="profile.collapsed"',
+            "X-Profile-Samples": str(result["samples"])
+        }
+    )
+
+@api_router.get("/metrics/upstream")
+async def get_upstream_metrics(current_user: User = Depends(get_current_user)):
+    return {"upstream": upstream_summary(), "providers": music_service.provider_health(), "llm_gateway": llm_gateway.stats()}
+
 # Include router
 app.include_router(api_router)
 
@@ -1650,6 +2083,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(TracingMiddleware)
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -1657,8 +2093,42 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+async def load_song_usage():
+    """Rank suggestions by how many room playlists hold each song"""
+    usage: Dict[str, int] = {}
+    async for room in db.rooms.find({"playlist": {"$exists": True}}, {"_id": 0, "playlist": 1}):
+        for song_id in room.get("playlist") or []:
+            usage[song_id] = usage.get(song_id, 0) + 1
+    for song_id, count in usage.items():
+        song = song_catalog.same_song(song_id)
+        if song is not None:
+            song_autocomplete.record_use(song, count)
+
+@app.on_event("startup")
+async def start_recording_reaper():
+    app.state.recording_reaper = asyncio.create_task(recording_storage.run_reaper(store_recording_size))
+    app.state.presence_reaper = asyncio.create_task(reap_stale_connections())
+    try:
+        await room_presence.ensure_indexes()
+    except Exception as e:
+        logging.error(f"Room presence index error: {e}")
+    await cache_service.warm_semantic_index()
+    try:
+        await song_catalog.load_collection(db.songs)
+        song_autocomplete.add_many(song_catalog.songs.values())
+        await load_song_usage()
+    except Exception as e:
+        logging.error(f"Song catalog load error: {e}")
+    if os.environ.get('LOOP_MONITOR_ENABLED', '').lower() in ('1', 'true', 'yes'):
+        loop_monitor.start()
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    app.state.recording_reaper.cancel()
+    app.state.presence_reaper.cancel()
+    loop_monitor.stop()
+    await recording_storage.close_all()
+    mixdown_service.shutdown()
     client.close()
 
 # Return the socket app instead of regular app
@@ -0,0 +1,182 @@
+import collections
+import json
+import logging
+import queue
+import threading
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, Optional, Set, Tuple
+
+from pymongo import monitoring
+
+from metrics import registry
+
+slow_queries = registry.counter("mongo_slow_queries_total", "Mongo commands slower than the slow-query threshold", ("collection", "command"))
+collection_scans = registry.counter("mongo_collscan_queries_total", "Query shapes whose plan is a collection scan", ("collection",))
+
+# Commands that carry a filter worth logging (and that the server can explain)
+_FILTER_FIELDS = {
+    "find": "filter",
+    "count": "query",
+    "distinct": "query",
+    "findAndModify": "query",
+    "aggregate": "pipeline",
+    "update": "updates",
+    "delete": "deletes"
+}
+
+# Session and cluster bookkeeping that explain rejects or does not need
+_DROP_FIELDS = {"lsid", "$clusterTime", "txnNumber", "$readPreference", "$db", "readConcern", "writeConcern", "cursor"}
+
+
+def query_shape(value: Any) -> Any:
+    """Replace literal values with placeholders, keeping field names and operators"""
+    if isinstance(value, dict):
+        return {key: query_shape(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        shapes = []
+        for item in value:
+            shape = query_shape(item)
+            if shape not in shapes:
+                shapes.append(shape)
+        return shapes
+    if hasattr(value, "pattern"):
+        return "?regex"
+    return "?"
+
+
+def command_shape(command_name: str, command: Dict[str, Any]) -> Dict[str, Any]:
+    field = _FILTER_FIELDS.get(command_name)
+    shape: Dict[str, Any] = {}
+    if field == "updates":
+        shape["filter"] = query_shape([update.get("q", {}) for update in command.get("updates", [])])
+    elif field == "deletes":
+        shape["filter"] = query_shape([delete.get("q", {}) for delete in command.get("deletes", [])])
+    elif field == "pipeline":
+        shape["pipeline"] = [
+            {stage: query_shape(body) if stage == "$match" else "..."}
+            for step in command.get("pipeline", []) for stage, body in step.items()
+        ]
+    elif field:
+        shape["filter"] = query_shape(command.get(field, {}))
+    if "sort" in command:
+        shape["sort"] = dict(command["sort"])
+    return shape
+
+
+def _plan_stages(plan: Dict[str, Any]) -> Set[str]:
+    stages = set()
+    stack = [plan]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            if "stage" in node:
+                stages.add(node["stage"])
+            stack.extend(node.values())
+        elif isinstance(node, list):
+            stack.extend(node)
+    return stages
+
+
+class SlowQueryListener(monitoring.CommandListener):
+    """pymongo command listener logging operations above ``threshold_ms``.
+
+    With ``explain`` enabled, the first slow occurrence of each query shape
+    is explained on a background thread (through the synchronous client
+    set by ``attach``) and collection scans are logged as warnings.
+    """
+
+    def __init__(self, threshold_ms: float = 100.0, explain: bool = False, max_entries: int = 200):
+        self.threshold_ms = threshold_ms
+        self.explain = explain
+        self.entries: Deque[Dict[str, Any]] = collections.deque(maxlen=max_entries)
+        self.plans: Dict[str, Dict[str, Any]] = {}
+        self._pending: Dict[Tuple, Tuple[str, str, Dict[str, Any]]] = {}
+        self._explained: Set[str] = set()
+        self._client = None
+        self._explain_queue: "queue.Queue[Tuple[str, str, str, Dict[str, Any]]]" = queue.Queue(maxsize=100)
+        self._explain_worker: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def attach(self, client) -> None:
+        """Give the listener a synchronous pymongo client for explain()"""
+        self._client = getattr(client, "delegate", client)
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        if event.command_name not in _FILTER_FIELDS:
+            return
+        # Our own explain commands go through "explain", so they never get here
+        with self._lock:
+            self._pending[(event.connection_id, event.request_id)] = (event.database_name, event.command_name, event.command)
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        self._finish(event)
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        self._finish(event, failed=True)
+
+    def _finish(self, event, failed: bool = False) -> None:
+        with self._lock:
+            pending = self._pending.pop((event.connection_id, event.request_id), None)
+        if pending is None:
+            return
+
+        duration_ms = event.duration_micros / 1000
+        if duration_ms < self.threshold_ms:
+            return
+
+        database, command_name, command = pending
+        collection = str(command.get(command_name, ""))
+        shape = command_shape(command_name, command)
+        shape_key = json.dumps([collection, command_name, shape], sort_keys=True, default=str)
+
+        entry = {
+            "at": datetime.now(timezone.utc).isoformat(),
+            "collection": collection,
+            "command": command_name,
+            "duration_ms": round(duration_ms, 2),
+            "shape": shape,
+            "failed": failed
+        }
+        self.entries.append(entry)
+        slow_queries.inc(collection=collection, command=command_name)
+        logging.warning(f"Slow Mongo {command_name} on {collection}: {entry['duration_ms']}ms {json.dumps(shape, default=str)}")
+
+        if self.explain and self._client is not None and shape_key not in self._explained:
+            self._explained.add(shape_key)
+            self._queue_explain(shape_key, database, collection, command)
+
+    def _queue_explain(self, shape_key: str, database: str, collection: str, command: Dict[str, Any]) -> None:
+        if self._explain_worker is None:
+            self._explain_worker = threading.Thread(target=self._explain_loop, name="slow-query-explain", daemon=True)
+            self._explain_worker.start()
+        explainable = {key: value for key, value in command.items() if key not in _DROP_FIELDS}
+        try:
+            self._explain_queue.put_nowait((shape_key, database, collection, explainable))
+        except queue.Full:
+            self._explained.discard(shape_key)
+
+    def _explain_loop(self) -> None:
+        while True:
+            shape_key, database, collection, command = self._explain_queue.get()
+            try:
+                result = self._client[database].command({"explain": command, "verbosity": "queryPlanner"})
+            except Exception as e:
+                logging.warning(f"Explain failed for slow query on {collection}: {e}")
+                continue
+
+            stages = sorted(_plan_stages(result.get("queryPlanner", result)))
+            self.plans[shape_key] = {"collection": collection, "stages": stages, "explain": result}
+            if "COLLSCAN" in stages:
+                collection_scans.inc(collection=collection)
+                logging.warning(f"Slow query on {collection} is a COLLSCAN: {shape_key}")
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "threshold_ms": self.threshold_ms,
+            "explain": self.explain,
+            "slow_queries": list(self.entries),
+            "plans": [
+                {"shape": shape_key, "collection": plan["collection"], "stages": plan["stages"]}
+                for shape_key, plan in list(self.plans.items())
+            ]
+        }
@@ -0,0 +1,159 @@
+import argparse
+import asyncio
+import logging
+from typing import Dict, Optional, Set
+from urllib.parse import urlparse
+
+import socketio
+from socketio.async_pubsub_manager import AsyncPubSubManager
+from engineio import json
+
+DEFAULT_LOCAL_BROKER = "local://127.0.0.1:6390"
+
+
+class LocalPubSubBroker:
+    """Minimal fan-out broker over TCP for development and tests.
+
+    Speaks newline-delimited JSON: a connection sends
+    ``{"op": "subscribe", "channel": ...}`` to receive messages, and
+    ``{"op": "publish", "channel": ..., "data": ...}`` to fan a message
+    out to every subscriber of that channel.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 6390):
+        self.host = host
+        self.port = port
+        self.subscribers: Dict[str, Set[asyncio.StreamWriter]] = {}
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        # Resolve the real port when started with port 0
+        self.port = self._server.sockets[0].getsockname()[1]
+        logging.info(f"Local pub/sub broker listening on {self.host}:{self.port}")
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        for writers in self.subscribers.values():
+            for writer in writers:
+                writer.close()
+        self.subscribers.clear()
+
+    async def serve_forever(self) -> None:
+        await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        channels = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    message = json.loads(line)
+                except ValueError:
+                    continue
+
+                if message.get("op") == "subscribe":
+                    channels.add(message["channel"])
+                    self.subscribers.setdefault(message["channel"], set()).add(writer)
+                elif message.get("op") == "publish":
+                    for subscriber in list(self.subscribers.get(message.get("channel"), ())):
+                        try:
+                            subscriber.write(line)
+                        except Exception:
+                            self.subscribers[message["channel"]].discard(subscriber)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            for channel in channels:
+                self.subscribers.get(channel, set()).discard(writer)
+            writer.close()
+
+
+class AsyncLocalManager(AsyncPubSubManager):
+    """Socket.IO client manager backed by LocalPubSubBroker.
+
+    Stand-in for Redis/AMQP so several workers can share rooms without
+    external services (``local://host:port``).
+    """
+
+    name = "asynclocal"
+
+    def __init__(self, url: str = DEFAULT_LOCAL_BROKER, channel: str = "socketio", write_only: bool = False, logger=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "127.0.0.1"
+        self.port = parsed.port or 6390
+        self._publisher: Optional[asyncio.StreamWriter] = None
+        self._publish_lock = asyncio.Lock()
+
+    async def _publish(self, data):
+        line = json.dumps({"op": "publish", "channel": self.channel, "data": data}).encode() + b"\n"
+        async with self._publish_lock:
+            for attempt in range(2):
+                try:
+                    if self._publisher is None or self._publisher.is_closing():
+                        _, self._publisher = await asyncio.open_connection(self.host, self.port)
+                    self._publisher.write(line)
+                    await self._publisher.drain()
+                    return
+                except (ConnectionError, OSError) as e:
+                    self._publisher = None
+                    if attempt:
+                        self._get_logger().error(f"Cannot publish to local broker: {e}")
+
+    async def _listen(self):
+        retry_sleep = 1
+        while True:
+            try:
+                reader, writer = await asyncio.open_connection(self.host, self.port)
+                writer.write(json.dumps({"op": "subscribe", "channel": self.channel}).encode() + b"\n")
+                await writer.drain()
+                retry_sleep = 1
+
+                while True:
+                    line = await reader.readline()
+                    if not line:
+                        raise ConnectionError("broker closed the connection")
+                    message = json.loads(line)
+                    if message.get("channel") == self.channel:
+                        yield message["data"]
+            except (ConnectionError, OSError) as e:
+                self._get_logger().error(f"Cannot receive from local broker, retrying in {retry_sleep} secs: {e}")
+                await asyncio.sleep(retry_sleep)
+                retry_sleep = min(retry_sleep * 2, 60)
+
+
+def create_client_manager(url: Optional[str], channel: str = "socketio", write_only: bool = False):
+    """Build the Socket.IO client manager for a message queue URL.
+
+    Returns None (the default single-process manager) when no URL is set.
+    """
+    if not url:
+        return None
+
+    scheme = urlparse(url).scheme
+    if scheme in ("redis", "rediss", "unix"):
+        return socketio.AsyncRedisManager(url, channel=channel, write_only=write_only)
+    if scheme.startswith("amqp"):
+        return socketio.AsyncAioPikaManager(url, channel=channel, write_only=write_only)
+    if scheme == "local":
+        return AsyncLocalManager(url, channel=channel, write_only=write_only)
+
+    raise ValueError(f"Unsupported Socket.IO message queue: {url}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the local Socket.IO pub/sub broker")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6390)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(LocalPubSubBroker(args.host, args.port).serve_forever())
@@ -0,0 +1,275 @@
+import heapq
+import json
+import logging
+import math
+import re
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from metrics import registry
+from semantic_index import normalize_text
+
+SEED_PATH = Path(__file__).parent / "data" / "catalog_seed.json"
+
+# Title matches count most, then artist, then lyrics
+FIELD_WEIGHTS = {"title": 3.0, "artist": 2.0, "lyrics": 1.0}
+_CHORD_MARK_RE = re.compile(r"\[[^\]]*\]")
+
+catalog_size = registry.gauge("song_catalog_songs", "Songs in the in-memory catalog")
+catalog_lookups = registry.counter("song_catalog_lookups_total", "Local catalog lookups by result (hit/miss)", ("result",))
+catalog_lookup_latency = registry.histogram(
+    "song_catalog_lookup_seconds", "Local catalog lookup latency", buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.05)
+)
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Normalized words; underscores split words too ("let_it_be")"""
+    if not text:
+        return []
+    return normalize_text(text.replace("_", " ")).split()
+
+
+def _trigram_set(term: str) -> Set[str]:
+    padded = f" {term} "
+    return {padded[index:index + 3] for index in range(len(padded) - 2)}
+
+
+def song_identity(song: Dict[str, Any]) -> str:
+    return f"{' '.join(tokenize(song.get('title')))}|{' '.join(tokenize(song.get('artist')))}"
+
+
+class SongCatalog:
+    """In-memory full-text index over known songs.
+
+    Title, artist and lyrics (chord marks stripped) go into an inverted
+    index ranked with BM25 per field, weighted by ``FIELD_WEIGHTS``. Query
+    words missing from the title/artist vocabulary are expanded to close
+    spellings through a trigram index over that vocabulary. Songs are
+    keyed by normalized title and artist, so the many copies the search
+    endpoints write to ``songs`` collapse to the latest one; ``add`` and
+    ``update`` keep the index current without rebuilding it.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75, fuzzy_threshold: float = 0.6):
+        self.k1 = k1
+        self.b = b
+        self.fuzzy_threshold = fuzzy_threshold
+        self.songs: Dict[str, Dict[str, Any]] = {}
+        self._ids: Dict[str, str] = {}
+        self._postings: Dict[str, Dict[str, Dict[str, int]]] = {field: {} for field in FIELD_WEIGHTS}
+        self._lengths: Dict[str, Dict[str, int]] = {field: {} for field in FIELD_WEIGHTS}
+        self._total_length: Dict[str, int] = {field: 0 for field in FIELD_WEIGHTS}
+        # Trigram -> title/artist words, for fuzzy expansion
+        self._vocabulary: Dict[str, Set[str]] = {}
+        self._vocabulary_counts: Counter = Counter()
+
+    def __len__(self) -> int:
+        return len(self.songs)
+
+    def _field_terms(self, song: Dict[str, Any], field: str) -> List[str]:
+        text = song.get(field)
+        if field == "lyrics" and text:
+            # "be[Cmaj7]low" -> "below"
+            text = _CHORD_MARK_RE.sub("", text)
+        return tokenize(text)
+
+    def _index(self, key: str, song: Dict[str, Any], sign: int) -> None:
+        for field in FIELD_WEIGHTS:
+            terms = self._field_terms(song, field)
+            postings = self._postings[field]
+            if sign > 0:
+                for term, count in Counter(terms).items():
+                    postings.setdefault(term, {})[key] = count
+                self._lengths[field][key] = len(terms)
+            else:
+                for term in set(terms):
+                    documents = postings.get(term)
+                    if documents is not None:
+                        documents.pop(key, None)
+                        if not documents:
+                            del postings[term]
+                self._lengths[field].pop(key, None)
+            self._total_length[field] += sign * len(terms)
+
+            if field != "lyrics":
+                for term in set(terms):
+                    self._vocabulary_counts[term] += sign
+                    if sign > 0 and self._vocabulary_counts[term] == 1:
+                        for gram in _trigram_set(term):
+                            self._vocabulary.setdefault(gram, set()).add(term)
+                    elif sign < 0 and self._vocabulary_counts[term] <= 0:
+                        del self._vocabulary_counts[term]
+                        for gram in _trigram_set(term):
+                            words = self._vocabulary.get(gram)
+                            if words is not None:
+                                words.discard(term)
+                                if not words:
+                                    del self._vocabulary[gram]
+
+    def add(self, song: Dict[str, Any]) -> None:
+        """Insert or replace a song (same normalized title and artist)"""
+        if not song.get("title"):
+            return
+        key = song_identity(song)
+        previous = self.songs.get(key)
+        if previous is not None:
+            self._index(key, previous, -1)
+        song = {field: value for field, value in song.items() if field != "_id"}
+        self.songs[key] = song
+        self._index(key, song, 1)
+        if song.get("id"):
+            self._ids[song["id"]] = key
+        catalog_size.set(len(self.songs))
+
+    def add_many(self, songs: Iterable[Dict[str, Any]]) -> int:
+        count = 0
+        for song in songs:
+            self.add(song)
+            count += 1
+        return count
+
+    def update(self, song_id: str, fields: Dict[str, Any]) -> None:
+        """Apply a partial update written to the ``songs`` collection.
+
+        Only when ``song_id`` is the copy kept for its title and artist: the
+        other copies are separate documents the update did not touch.
+        """
+        song = self.get(song_id)
+        if song is not None:
+            self.add({**song, **fields})
+
+    def get(self, song_id: str) -> Optional[Dict[str, Any]]:
+        """The document with this id, if it is the copy the catalog keeps"""
+        song = self.same_song(song_id)
+        return song if song is not None and song.get("id") == song_id else None
+
+    def same_song(self, song_id: str) -> Optional[Dict[str, Any]]:
+        """The kept copy with the same title and artist as ``song_id``, which may be another document"""
+        key = self._ids.get(song_id)
+        return self.songs.get(key) if key is not None else None
+
+    def load_file(self, path: Path = SEED_PATH) -> int:
+        """Bundled songs from a JSON list"""
+        with open(path, encoding="utf-8") as seed_file:
+            count = self.add_many(json.load(seed_file))
+        logging.info(f"Song catalog loaded {count} songs from {path.name}")
+        return count
+
+    async def load_collection(self, collection) -> int:
+        """Every song in a Motor collection"""
+        count = 0
+        async for song in collection.find({}, {"_id": 0}):
+            self.add(song)
+            count += 1
+        logging.info(f"Song catalog loaded {count} songs from the database ({len(self.songs)} distinct)")
+        return count
+
+    def _expand(self, term: str) -> List[Tuple[str, float]]:
+        """``term`` itself if known, else close title/artist words with their similarity"""
+        if term in self._vocabulary_counts or any(term in self._postings[field] for field in FIELD_WEIGHTS):
+            return [(term, 1.0)]
+        if len(term) < 3:
+            return []
+        grams = _trigram_set(term)
+        shared: Counter = Counter()
+        for gram in grams:
+            for word in self._vocabulary.get(gram, ()):
+                shared[word] += 1
+        expansions = []
+        for word, overlap in shared.items():
+            # Dice coefficient over trigram sets
+            similarity = 2 * overlap / (len(grams) + len(_trigram_set(word)))
+            if similarity >= self.fuzzy_threshold:
+                expansions.append((word, similarity))
+        expansions.sort(key=lambda expansion: -expansion[1])
+        return expansions[:3]
+
+    def _idf(self, documents: Dict[str, int]) -> float:
+        count = len(self.songs)
+        return math.log(1 + (count - len(documents) + 0.5) / (len(documents) + 0.5))
+
+    def search(self, query: str, limit: int = 10) -> List[Tuple[float, Dict[str, Any]]]:
+        """(score, song) pairs, best first.
+
+        Postings are scored rarest first. A word far more common than the
+        candidates found so far ("da", "banda") only adds to their scores
+        instead of pulling in every song that contains it.
+        """
+        postings = []
+        for term in dict.fromkeys(tokenize(query)):
+            for expanded, similarity in self._expand(term):
+                for field, weight in FIELD_WEIGHTS.items():
+                    documents = self._postings[field].get(expanded)
+                    if documents:
+                        postings.append((field, weight * similarity, documents))
+        postings.sort(key=lambda posting: len(posting[2]))
+
+        count = len(self.songs)
+        scores: Dict[str, float] = {}
+        for field, weight, documents in postings:
+            idf = weight * self._idf(documents)
+            average = self._total_length[field] / count
+            lengths = self._lengths[field]
+            if scores and len(documents) > max(4 * len(scores), 256):
+                keys = [key for key in scores if key in documents]
+            else:
+                keys = documents
+            for key in keys:
+                frequency = documents[key]
+                norm = 1 - self.b + self.b * (lengths[key] / average if average else 0)
+                scores[key] = scores.get(key, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + self.k1 * norm)
+        best = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+        return [(score, self.songs[key]) for key, score in best]
+
+    def _covered(self, terms: List[str], targets: Set[str]) -> float:
+        """Share of ``terms`` found in ``targets``, allowing close spellings"""
+        if not terms:
+            return 1.0
+        matched = 0
+        for term in terms:
+            if term in targets or any(
+                2 * len(_trigram_set(term) & _trigram_set(target)) / (len(_trigram_set(term)) + len(_trigram_set(target))) >= self.fuzzy_threshold
+                for target in targets
+            ):
+                matched += 1
+        return matched / len(terms)
+
+    def covering(self, query: str, limit: int = 8, min_coverage: float = 0.75) -> List[Dict[str, Any]]:
+        """Songs whose title and artist cover most words of a free-text query"""
+        query_terms = tokenize(query)
+        songs = []
+        for _, song in self.search(query, limit=limit * 2):
+            targets = set(tokenize(song.get("title"))) | set(tokenize(song.get("artist")))
+            if self._covered(query_terms, targets) >= min_coverage:
+                songs.append(song)
+                if len(songs) == limit:
+                    break
+        return songs
+
+    def best_match(self, title: str, artist: str = "", min_coverage: float = 0.75) -> Optional[Dict[str, Any]]:
+        """The catalog song a title/artist lookup means, or None.
+
+        Ranking alone would let "let" resolve to "Let It Be", so the top
+        hits must also cover the query: most query words appear in the
+        song's title or artist, most title words appear in the query, and
+        a given artist matches the song's artist.
+        """
+        start = time.perf_counter()
+        query_terms = tokenize(title) + tokenize(artist)
+        match = None
+        for _, song in self.search(f"{title} {artist}", limit=5):
+            title_terms = tokenize(song.get("title"))
+            artist_terms = tokenize(song.get("artist"))
+            if self._covered(query_terms, set(title_terms) | set(artist_terms)) < min_coverage:
+                continue
+            if self._covered(title_terms, set(query_terms)) < min_coverage:
+                continue
+            if artist and artist_terms and self._covered(artist_terms, set(tokenize(artist))) < 0.5:
+                continue
+            match = song
+            break
+        catalog_lookups.inc(result="hit" if match else "miss")
+        catalog_lookup_latency.observe(time.perf_counter() - start)
+        return match
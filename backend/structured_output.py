@@ -0,0 +1,206 @@
+import json
+import re
+from typing import Any, Iterator, List, Optional, Tuple, get_origin
+
+from pydantic import TypeAdapter, ValidationError
+
+_CLOSERS = {"{": "}", "[": "]"}
+_FENCE_RE = re.compile(r"```[a-zA-Z]*[ \t]*\n?(.*?)(?:```|$)", re.DOTALL)
+
+
+class StructuredOutputError(ValueError):
+    """Model output that holds no usable JSON of the expected shape"""
+
+
+def strip_fences(text: str) -> str:
+    """Content of the first markdown code fence, or the text itself"""
+    match = _FENCE_RE.search(text)
+    if match and ("{" in match.group(1) or "[" in match.group(1)):
+        return match.group(1)
+    return text
+
+
+def _can_start(opener: str, char: str) -> bool:
+    """Whether ``char`` can follow ``opener`` in JSON: "[Verso 1]" and "{nota}" are prose"""
+    if opener == "{":
+        return char in '"}'
+    return char in '"{[]-tfn' or char.isdigit()
+
+
+class JSONScanner:
+    """Single-pass scanner over model output for bracketed JSON candidates.
+
+    ``candidates`` walks the text once. Each bracketed region is reported
+    with where it ends, the spans of the outermost complete objects/arrays
+    inside it, and for a region cut off by the end of the text the last
+    point where it can be closed without inventing a value. A rejected candidate is never
+    rescanned: the walk resumes after it, and values nested inside it are
+    tried through its child spans.
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+
+    def candidates(self) -> Iterator[Tuple[int, Optional[int], List[Tuple[int, int]], Optional[str]]]:
+        """(start, end, child spans, repaired text) per candidate.
+
+        ``end`` is None for a region that never closed; ``repaired`` is only
+        set for a region cut off by the end of the text.
+        """
+        text = self.text
+        length = len(text)
+        index = 0
+        while index < length:
+            opener = text[index]
+            if opener not in _CLOSERS:
+                index += 1
+                continue
+            ahead = index + 1
+            while ahead < length and text[ahead].isspace():
+                ahead += 1
+            if ahead < length and not _can_start(opener, text[ahead]):
+                index += 1
+                continue
+
+            start = index
+            stack = [opener]
+            # Outermost complete objects/arrays inside the candidate, and where open ones began
+            children: List[Tuple[int, int]] = []
+            opened: List[int] = []
+            # text[start:cut] + closers for the open brackets is JSON without partial values
+            cut = index + 1
+            in_string = escape = after_colon = value_string = False
+            end: Optional[int] = None
+            failed = False
+            index += 1
+            while index < length:
+                char = text[index]
+                index += 1
+                if in_string:
+                    if escape:
+                        escape = False
+                    elif char == "\\":
+                        escape = True
+                    elif char == '"':
+                        in_string = False
+                        if value_string:
+                            cut = index
+                    continue
+                if char == '"':
+                    in_string = True
+                    # Keys are not values; a string is complete only once its quote closes
+                    value_string = stack[-1] == "[" or after_colon
+                    after_colon = False
+                elif char in _CLOSERS:
+                    opened.append(index - 1)
+                    stack.append(char)
+                    after_colon = False
+                    cut = index
+                elif char in "}]":
+                    if _CLOSERS[stack[-1]] != char:
+                        failed = True
+                        break
+                    stack.pop()
+                    if not stack:
+                        end = index
+                        break
+                    child_start = opened.pop()
+                    while children and children[-1][0] > child_start:
+                        children.pop()
+                    children.append((child_start, index))
+                    after_colon = False
+                    cut = index
+                elif char == ",":
+                    after_colon = False
+                    cut = index - 1
+                elif char == ":":
+                    after_colon = True
+
+            repaired = None
+            if end is None and not failed:
+                repaired = text[start:cut].rstrip().rstrip(",") + "".join(_CLOSERS[bracket] for bracket in reversed(stack))
+            yield start, end, children, repaired
+
+
+def _strip_trailing_commas(text: str) -> str:
+    """Drop commas directly before a closing bracket, outside strings"""
+    out = []
+    in_string = escape = False
+    for char in text:
+        if in_string:
+            if escape:
+                escape = False
+            elif char == "\\":
+                escape = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "}]":
+            while out and out[-1].isspace():
+                out.pop()
+            if out and out[-1] == ",":
+                out.pop()
+        out.append(char)
+    return "".join(out)
+
+
+def _loads(candidate: str) -> Any:
+    try:
+        return json.loads(candidate)
+    except ValueError:
+        return json.loads(_strip_trailing_commas(candidate))
+
+
+def extract_json(text: str, repair: bool = True) -> Any:
+    """The outermost JSON object or array in model output.
+
+    Fences and surrounding prose are ignored. A bracket that turns out not
+    to start valid JSON (``[Verso 1]``) is skipped. A value cut off at the
+    end is closed when ``repair`` is set, dropping the partial key or
+    value it ends in rather than guessing it. The text is scanned once.
+    """
+    text = strip_fences(text)
+    for start, end, children, repaired in JSONScanner(text).candidates():
+        attempts = [text[start:end]] if end is not None else ([repaired] if repair and repaired is not None else [])
+        # Values nested in a false start ("[1 - intro {...}") are still found
+        attempts.extend(text[child_start:child_end] for child_start, child_end in children)
+        for attempt in attempts:
+            try:
+                return _loads(attempt)
+            except ValueError:
+                continue
+    raise StructuredOutputError("No JSON value in model output")
+
+
+def validate(value: Any, schema: Any) -> Any:
+    """Validate ``value`` against a Pydantic model or type.
+
+    For list schemas invalid items are dropped rather than failing the
+    whole reply, as long as at least one item survives.
+    """
+    adapter = TypeAdapter(schema)
+    try:
+        return adapter.validate_python(value)
+    except ValidationError as e:
+        if get_origin(schema) in (list, List) and isinstance(value, list):
+            item_adapter = TypeAdapter(schema.__args__[0])
+            items = []
+            for item in value:
+                try:
+                    items.append(item_adapter.validate_python(item))
+                except ValidationError:
+                    continue
+            if items:
+                return items
+        raise StructuredOutputError(f"Model output does not match {getattr(schema, '__name__', schema)}: {e.error_count()} errors") from e
+
+
+def parse_structured(text: str, schema: Any) -> Any:
+    """Extract, repair and validate the JSON in ``text``"""
+    value = extract_json(text)
+    if isinstance(schema, type) and schema in (dict, list):
+        if not isinstance(value, schema):
+            raise StructuredOutputError(f"Expected {schema.__name__}, got {type(value).__name__}")
+        return value
+    return validate(value, schema)
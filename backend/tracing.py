@@ -0,0 +1,300 @@
+import contextvars
+import functools
+import json
+import logging
+import os
+import queue
+import re
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+from motor.motor_asyncio import AsyncIOMotorCollection
+
+TRACE_HEADER = "x-trace-id"
+_TRACE_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "kind", "attributes", "start", "duration_ms", "status", "children")
+
+    def __init__(self, trace_id: str, name: str, kind: str, parent_id: Optional[str] = None, attributes: Optional[Dict[str, Any]] = None):
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.attributes = attributes or {}
+        self.start = time.time()
+        self.duration_ms: Optional[float] = None
+        self.status = "ok"
+        # Finished spans of the trace, collected on the root and exported together
+        self.children: Optional[List["Span"]] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start": self.start,
+            "duration_ms": self.duration_ms,
+            "status": self.status,
+            "attributes": self.attributes
+        }
+
+
+class JsonlExporter:
+    """Appends finished traces to a JSON-lines file, one span per line"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def export(self, spans: List[Dict[str, Any]]) -> None:
+        with open(self.path, "a", encoding="utf-8") as trace_file:
+            for span in spans:
+                trace_file.write(json.dumps(span, default=str) + "\n")
+
+
+class CollectorExporter:
+    """POSTs batches of spans as JSON to a trace collector"""
+
+    def __init__(self, url: str, timeout: float = 2.0):
+        self.url = url
+        self.timeout = timeout
+
+    def export(self, spans: List[Dict[str, Any]]) -> None:
+        body = json.dumps({"spans": spans}, default=str).encode()
+        request = urllib.request.Request(self.url, data=body, headers={"Content-Type": "application/json"}, method="POST")
+        with urllib.request.urlopen(request, timeout=self.timeout):
+            pass
+
+
+def exporter_from_url(url: Optional[str]):
+    """``file:/path/traces.jsonl`` or ``http(s)://collector/...``; None disables export"""
+    if not url:
+        return None
+    if url.startswith("file:"):
+        return JsonlExporter(url[len("file:"):])
+    if url.startswith(("http://", "https://")):
+        return CollectorExporter(url)
+    raise ValueError(f"Unsupported trace exporter: {url}")
+
+
+class Tracer:
+    """Request-scoped tracing with a context variable carrying the active span.
+
+    Spans only exist inside a trace (an HTTP request), so instrumented code
+    running in background tasks costs a context variable lookup. Finished
+    traces are handed to a background thread for export.
+    """
+
+    def __init__(self, exporter=None, max_queue: int = 1000, batch_size: int = 200):
+        self.exporter = exporter
+        self.batch_size = batch_size
+        self._queue: "queue.Queue[List[Dict[str, Any]]]" = queue.Queue(maxsize=max_queue)
+        self._worker: Optional[threading.Thread] = None
+
+    @contextmanager
+    def trace(self, name: str, trace_id: Optional[str] = None, **attributes):
+        """Open the root span of a trace"""
+        root = Span(trace_id or os.urandom(16).hex(), name, "server", attributes=attributes)
+        root.children = []
+        token = _current_span.set(root)
+        try:
+            yield root
+        except BaseException:
+            root.status = "error"
+            raise
+        finally:
+            _current_span.reset(token)
+            root.duration_ms = round((time.time() - root.start) * 1000, 3)
+            self._submit([root.to_dict()] + [child.to_dict() for child in root.children])
+
+    @contextmanager
+    def span(self, name: str, kind: str = "internal", **attributes):
+        """Child span of the active span (no-op outside a trace)"""
+        parent = _current_span.get()
+        if parent is None:
+            yield None
+            return
+
+        span = Span(parent.trace_id, name, kind, parent.span_id, attributes)
+        span.children = parent.children
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.status = "error"
+            span.attributes["error"] = type(e).__name__
+            raise
+        finally:
+            _current_span.reset(token)
+            span.duration_ms = round((time.time() - span.start) * 1000, 3)
+            parent.children.append(span)
+
+    def _submit(self, spans: List[Dict[str, Any]]) -> None:
+        if self.exporter is None:
+            return
+        if self._worker is None:
+            self._worker = threading.Thread(target=self._export_loop, name="trace-exporter", daemon=True)
+            self._worker.start()
+        try:
+            self._queue.put_nowait(spans)
+        except queue.Full:
+            # Never slow requests down for tracing
+            pass
+
+    def _export_loop(self) -> None:
+        while True:
+            batch = self._queue.get()
+            while len(batch) < self.batch_size:
+                try:
+                    batch.extend(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self.exporter.export(batch)
+            except Exception as e:
+                logging.warning(f"Trace export failed: {e}")
+
+
+def traced(name: str, kind: str = "internal", argument: Optional[str] = None):
+    """Decorate an async method with a span, recording its first argument as ``argument``"""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(self, *args, **kwargs):
+            attributes = {argument: args[0]} if argument and args else {}
+            with tracer.span(name, kind, **attributes):
+                return await func(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def current_trace_id() -> Optional[str]:
+    span = _current_span.get()
+    return span.trace_id if span else None
+
+
+tracer = Tracer(exporter_from_url(os.environ.get("TRACE_EXPORT")))
+
+
+class TracingMiddleware:
+    """ASGI middleware opening a trace per HTTP request and returning its id in X-Trace-Id"""
+
+    def __init__(self, app, tracer: Tracer = tracer):
+        self.app = app
+        self.tracer = tracer
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        incoming = dict(scope.get("headers") or []).get(TRACE_HEADER.encode(), b"").decode().lower()
+        trace_id = incoming if _TRACE_ID_RE.match(incoming) else None
+
+        with self.tracer.trace(f"{scope['method']} {scope['path']}", trace_id=trace_id, method=scope["method"]) as root:
+            async def send_wrapper(message):
+                if message["type"] == "http.response.start":
+                    message.setdefault("headers", [])
+                    message["headers"] = list(message["headers"]) + [(TRACE_HEADER.encode(), root.trace_id.encode())]
+                    root.attributes["status"] = message["status"]
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                route = scope.get("route")
+                if getattr(route, "path", None):
+                    root.name = f"{scope['method']} {route.path}"
+
+
+# Collection methods that run one database round trip
+_TRACED_METHODS = {
+    "find_one", "insert_one", "insert_many", "update_one", "update_many", "replace_one",
+    "delete_one", "delete_many", "count_documents", "find_one_and_update", "find_one_and_delete",
+    "distinct", "create_index"
+}
+
+
+class TracedCursor:
+    """Cursor proxy timing to_list(); chained modifiers keep the proxy"""
+
+    def __init__(self, cursor, collection: str, operation: str, tracer: Tracer):
+        self._cursor = cursor
+        self._collection = collection
+        self._operation = operation
+        self._tracer = tracer
+
+    def __getattr__(self, name):
+        attr = getattr(self._cursor, name)
+        if name in ("sort", "limit", "skip", "batch_size", "max_time_ms", "hint", "collation"):
+            @functools.wraps(attr)
+            def chained(*args, **kwargs):
+                attr(*args, **kwargs)
+                return self
+            return chained
+        return attr
+
+    async def to_list(self, *args, **kwargs):
+        with self._tracer.span(f"mongo.{self._operation}", "db", collection=self._collection):
+            return await self._cursor.to_list(*args, **kwargs)
+
+    def __aiter__(self):
+        return self._cursor.__aiter__()
+
+
+class TracedCollection:
+    """Motor collection proxy opening a span around each database operation"""
+
+    def __init__(self, collection: AsyncIOMotorCollection, tracer: Tracer):
+        self._collection = collection
+        self._tracer = tracer
+
+    def __getattr__(self, name):
+        attr = getattr(self._collection, name)
+        collection_name = self._collection.name
+
+        if name in _TRACED_METHODS:
+            @functools.wraps(attr)
+            async def traced(*args, **kwargs):
+                with self._tracer.span(f"mongo.{name}", "db", collection=collection_name):
+                    return await attr(*args, **kwargs)
+            return traced
+
+        if name in ("find", "aggregate"):
+            @functools.wraps(attr)
+            def cursor(*args, **kwargs):
+                return TracedCursor(attr(*args, **kwargs), collection_name, name, self._tracer)
+            return cursor
+
+        return attr
+
+
+class TracedDatabase:
+    """Motor database proxy handing out traced collections"""
+
+    def __init__(self, database, tracer: Tracer = tracer):
+        self._database = database
+        self._tracer = tracer
+
+    def __getattr__(self, name):
+        attr = getattr(self._database, name)
+        if isinstance(attr, AsyncIOMotorCollection):
+            return TracedCollection(attr, self._tracer)
+        if name == "command":
+            @functools.wraps(attr)
+            async def command(*args, **kwargs):
+                with self._tracer.span("mongo.command", "db", command=str(args[0]) if args else None):
+                    return await attr(*args, **kwargs)
+            return command
+        return attr
+
+    def __getitem__(self, name):
+        return TracedCollection(self._database[name], self._tracer)
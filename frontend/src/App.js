@@ -26,6 +26,44 @@ export const useAuth = () => {
   return context;
 };
 
+// POST and read server-sent events: onEvent(event, data) for each one until "done" (resolves) or "error" (throws)
+const postServerEvents = async (url, body, token, onEvent) => {
+  const response = await fetch(url, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json', Authorization: `Bearer ${token}` },
+    body: JSON.stringify(body)
+  });
+  const fail = (status, detail) => {
+    const error = new Error(detail || `HTTP ${status}`);
+    error.response = { status };
+    return error;
+  };
+  if (!response.ok) {
+    throw fail(response.status);
+  }
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    const events = buffer.split('\n\n');
+    buffer = events.pop();
+    for (const raw of events) {
+      const event = raw.match(/^event: (.*)$/m)?.[1];
+      const data = JSON.parse(raw.match(/^data: (.*)$/m)?.[1] || 'null');
+      if (event === 'done') {
+        return data;
+      } else if (event === 'error') {
+        throw fail(data.status, data.detail);
+      }
+      onEvent(event, data);
+    }
+  }
+  throw fail(502, 'Stream ended early');
+};
+
 // API Service
 export const api = {
   // Auth
@@ -51,6 +89,21 @@ export const api = {
     });
     return response.data;
   },
+  // Server-sent events: onResults(songs) runs as each source answers; resolves with the ranked results
+  streamIntelligentSearch: (query, token, onResults) =>
+    postServerEvents(`${API}/songs/intelligent-search/stream`, { query }, token, (event, data) => {
+      if (event === 'results') {
+        onResults(data.songs);
+      }
+    }),
+  autocompleteSongs: async (query, token, signal) => {
+    const response = await axios.get(`${API}/songs/autocomplete`, {
+      params: { q: query },
+      headers: { Authorization: `Bearer ${token}` },
+      signal
+    });
+    return response.data;
+  },
   
   // Audio Recognition
   recognizeAudio: async (audioBlob, token) => {
@@ -134,6 +187,13 @@ export const api = {
     });
     return response.data;
   },
+  // Server-sent events: onSong(song, index) runs as each song arrives; resolves with the full repertoire
+  streamAIRepertoire: (roomId, repertoireData, token, onSong) =>
+    postServerEvents(`${API}/rooms/${roomId}/generate-repertoire/stream`, repertoireData, token, (event, data) => {
+      if (event === 'song') {
+        onSong(data.song, data.index);
+      }
+    }),
   
   // Recording
   startRecording: async (roomId, token) => {
@@ -1,4 +1,4 @@
-import React, { useState } from 'react';
+import React, { useEffect, useState } from 'react';
 import { Button } from './ui/button';
 import { Input } from './ui/input';
 import { Card, CardContent } from './ui/card';
@@ -15,6 +15,31 @@ const IntelligentSearch = ({ onSongSelect, isOpen, onClose }) => {
   const [searchResults, setSearchResults] = useState([]);
   const [searching, setSearching] = useState(false);
   const [adding, setAdding] = useState(null);
+  const [suggestions, setSuggestions] = useState([]);
+
+  // Typeahead: ask for suggestions once typing pauses, dropping stale requests
+  useEffect(() => {
+    const text = query.trim();
+    if (text.length < 2 || searching) {
+      setSuggestions([]);
+      return;
+    }
+    const controller = new AbortController();
+    const timer = setTimeout(async () => {
+      try {
+        const response = await api.autocompleteSongs(text, token, controller.signal);
+        setSuggestions(response.suggestions);
+      } catch (error) {
+        if (error.name !== 'CanceledError') {
+          setSuggestions([]);
+        }
+      }
+    }, 150);
+    return () => {
+      clearTimeout(timer);
+      controller.abort();
+    };
+  }, [query, token, searching]);
 
   const handleIntelligentSearch = async (e) => {
     e.preventDefault();
@@ -24,19 +49,14 @@ const IntelligentSearch = ({ onSongSelect, isOpen, onClose }) => {
     }
 
     setSearching(true);
+    setSuggestions([]);
     setSearchResults([]); // Clear previous results
     
     try {
-      // Show optimistic loading
-      const startTime = Date.now();
-      
-      const response = await api.intelligentSearch(query, token);
-      
-      // Ensure minimum loading time for better UX (but max 3 seconds)
-      const elapsed = Date.now() - startTime;
-      if (elapsed < 1000) {
-        await new Promise(resolve => setTimeout(resolve, 1000 - elapsed));
-      }
+      // Show each source's songs as soon as it answers, then the final ranking
+      const response = await api.streamIntelligentSearch(query, token, (songs) => {
+        setSearchResults(previous => [...previous, ...songs]);
+      });
       
       setSearchResults(response.results);
       
@@ -120,6 +140,26 @@ const IntelligentSearch = ({ onSongSelect, isOpen, onClose }) => {
                 className="pl-12 border-purple-200 focus:border-purple-500 focus:ring-purple-500"
                 data-testid="intelligent-search-input"
               />
+              {suggestions.length > 0 && (
+                <div
+                  className="absolute z-10 mt-1 w-full bg-white border border-purple-200 rounded-lg shadow-lg overflow-hidden"
+                  data-testid="autocomplete-suggestions"
+                >
+                  {suggestions.map((song) => (
+                    <button
+                      key={`${song.title}|${song.artist}`}
+                      type="button"
+                      onClick={() => handleAddSong(song)}
+                      disabled={adding === song.title}
+                      className="w-full flex items-center px-4 py-2 text-left hover:bg-purple-50"
+                    >
+                      <Music className="w-4 h-4 mr-3 text-purple-600" />
+                      <span className="font-medium text-gray-900">{song.title}</span>
+                      <span className="ml-2 text-sm text-gray-500">{song.artist}</span>
+                    </button>
+                  ))}
+                </div>
+              )}
             </div>
             
             <Button 
@@ -143,7 +183,7 @@ const IntelligentSearch = ({ onSongSelect, isOpen, onClose }) => {
           </form>
 
           {/* Loading State */}
-          {searching && (
+          {searching && searchResults.length === 0 && (
             <SmartLoading 
               type="intelligent_search" 
               message="Buscando no Spotify e IA..."
@@ -151,7 +191,7 @@ const IntelligentSearch = ({ onSongSelect, isOpen, onClose }) => {
           )}
 
           {/* Search Results */}
-          {!searching && searchResults.length > 0 && (
+          {searchResults.length > 0 && (
             <div className="space-y-4">
               <h3 className="text-lg font-semibold text-gray-900">
                 🎵 Resultados Encontrados ({searchResults.length})
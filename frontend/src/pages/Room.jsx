@@ -247,13 +247,15 @@ const Room = () => {
   const handleAddRecommendationsToPlaylist = async (selectedSongs) => {
     setLoading(true);
     try {
-      for (const songText of selectedSongs) {
-        // Parse "Title - Artist" format
-        const [title, artist] = songText.split(' - ').map(s => s.trim());
-        if (title && artist) {
-          const song = await api.searchSong({ title, artist }, token);
-          await handleAddToPlaylist(song);
-        }
+      // Parse "Title - Artist" format
+      const parsed = selectedSongs
+        .map(songText => songText.split(' - ').map(s => s.trim()))
+        .filter(([title, artist]) => title && artist);
+      // Look the songs up together so the server can answer them with one AI prompt,
+      // then add them in the order they were picked
+      const songs = await Promise.all(parsed.map(([title, artist]) => api.searchSong({ title, artist }, token)));
+      for (const song of songs) {
+        await handleAddToPlaylist(song);
       }
       
       toast.success(`${selectedSongs.length} músicas adicionadas ao repertório!`);
@@ -308,13 +310,18 @@ const Room = () => {
       // Show immediate feedback
       toast.info('🤖 IA criando seu repertório personalizado...');
       
-      const repertoire = await api.generateAIRepertoire(roomId, aiRepertoireForm, token);
+      // Songs appear in the recommendations dialog as the server parses them
+      setRecommendations([]);
+      const repertoire = await api.streamAIRepertoire(roomId, aiRepertoireForm, token, (song, index) => {
+        if (index === 0) {
+          setShowAIRepertoire(false);
+          setShowRecommendations(true);
+        }
+        setRecommendations(previous => [...previous, `${song.title} - ${song.artist}`]);
+      });
       
       toast.success(`🎵 Repertório de ${repertoire.total_songs} músicas criado em segundos!`);
       setShowAIRepertoire(false);
-      
-      // Show repertoire in recommendations dialog
-      setRecommendations(repertoire.repertoire.map(song => `${song.title} - ${song.artist}`));
       setShowRecommendations(true);
       
     } catch (error) {
@@ -322,6 +329,8 @@ const Room = () => {
       
       if (error.response?.status === 408) {
         toast.error('⏰ Geração do repertório demorou muito. Tente um estilo mais específico.');
+      } else if (error.response?.status === 503) {
+        toast.error('🤖 IA ocupada no momento. Tente novamente em alguns segundos.');
       } else {
         toast.error('Erro ao gerar repertório pela IA');
       }
@@ -1114,14 +1123,14 @@ const Room = () => {
               <CardHeader className="pb-4">
                 <CardTitle className="flex items-center">
                   <Users className="w-5 h-5 mr-2 text-gray-600" />
-                  Integrantes ({roomData.members.length})
+                  Integrantes online ({roomData.online_members.length})
                 </CardTitle>
               </CardHeader>
               <CardContent>
                 <div className="space-y-3">
-                  {roomData.members.map((member) => (
+                  {roomData.online_members.map((member) => (
                     <div 
-                      key={member.id} 
+                      key={member.user_id} 
                       className="flex items-center justify-between p-3 bg-gray-50 rounded-lg"
                       data-testid={`member-${member.user_name}`}
                     >
@@ -1132,7 +1141,9 @@ const Room = () => {
                             <Badge variant="outline" className="ml-2 text-xs">Admin</Badge>
                           )}
                         </p>
-                        <p className="text-sm text-gray-600">Participante</p>
+                        <p className="text-sm text-gray-600">
+                          Online
+                        </p>
                       </div>
                     </div>
                   ))}
@@ -4,6 +4,8 @@ class SocketService {
   constructor() {
     this.socket = null;
     this.isConnected = false;
+    this.heartbeatTimer = null;
+    this.joinedRooms = new Map();
   }
 
   connect(token) {
@@ -24,11 +26,17 @@ class SocketService {
     this.socket.on('connect', () => {
       console.log('Connected to server');
       this.isConnected = true;
+      // Presence is per connection: rejoin rooms after a reconnect
+      this.joinedRooms.forEach((user, roomId) => {
+        this.socket.emit('join_room', { room_id: roomId, ...user });
+      });
+      this.startHeartbeat();
     });
 
     this.socket.on('disconnect', () => {
       console.log('Disconnected from server');
       this.isConnected = false;
+      this.stopHeartbeat();
     });
 
     this.socket.on('connect_error', (error) => {
@@ -40,14 +48,33 @@ class SocketService {
 
   disconnect() {
     if (this.socket) {
+      this.stopHeartbeat();
       this.socket.disconnect();
       this.socket = null;
       this.isConnected = false;
+      this.joinedRooms.clear();
+    }
+  }
+
+  startHeartbeat() {
+    this.stopHeartbeat();
+    this.heartbeatTimer = setInterval(() => {
+      if (this.socket && this.isConnected) {
+        this.socket.emit('heartbeat');
+      }
+    }, 30000);
+  }
+
+  stopHeartbeat() {
+    if (this.heartbeatTimer) {
+      clearInterval(this.heartbeatTimer);
+      this.heartbeatTimer = null;
     }
   }
 
   // Room management
   joinRoom(roomId, userId, userName) {
+    this.joinedRooms.set(roomId, { user_id: userId, user_name: userName });
     if (this.socket) {
       this.socket.emit('join_room', {
         room_id: roomId,
@@ -58,6 +85,7 @@ class SocketService {
   }
 
   leaveRoom(roomId, userId) {
+    this.joinedRooms.delete(roomId);
     if (this.socket) {
       this.socket.emit('leave_room', {
         room_id: roomId,
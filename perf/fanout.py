@@ -0,0 +1,287 @@
+"""Socket.IO fan-out benchmark: how much one process pays per room broadcast.
+
+    python -m perf.fanout --room-sizes 10,30,60 --payload-sizes 256,4096,65536 --broadcasts 50
+
+``server.socket_app`` is served by uvicorn on its own thread and event loop
+while N simulated tablets (``socketio.AsyncClient``) join one room from the
+main thread. For each room size, payload size and event, broadcasts are
+sent one at a time and every delivery is timed from emit to receive.
+
+``playlist_updated``, ``tempo_changed`` and ``room_sync`` are emitted by the
+server to the room, as the REST handlers do; ``audio_stream`` is sent by one
+client and relayed by the server to the other N-1 as ``audio_received``.
+Server CPU per broadcast is read from the server thread's CPU clock, so the
+clients' own work does not count. Delivery latency does include contention
+for the GIL with the clients, so treat it as an upper bound.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import threading
+import time
+import uuid
+from datetime import timedelta
+from typing import Any, Dict, List, Optional
+
+import socketio
+import uvicorn
+
+from perf.load_test import free_port, percentile
+from perf.stubs import import_server
+
+SERVER_EVENTS = ("playlist_updated", "tempo_changed", "room_sync")
+RELAY_EVENT = "audio_stream"
+DEFAULT_EVENTS = SERVER_EVENTS + (RELAY_EVENT,)
+
+
+class ServerThread:
+    """uvicorn serving an ASGI app on a dedicated thread and event loop"""
+
+    def __init__(self, app, port: int):
+        self.server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", ws_max_size=16 * 1024 * 1024))
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.thread = threading.Thread(target=self._run, name="fanout-server", daemon=True)
+
+    async def _serve(self) -> None:
+        self.loop = asyncio.get_running_loop()
+        await self.server.serve()
+
+    def _run(self) -> None:
+        # asyncio.run also cancels the per-socket ping tasks left at shutdown
+        asyncio.run(self._serve())
+
+    def start(self, timeout: float = 10.0) -> None:
+        self.thread.start()
+        deadline = time.monotonic() + timeout
+        while not self.server.started:
+            if time.monotonic() > deadline:
+                raise RuntimeError("Server did not start")
+            time.sleep(0.01)
+
+    def stop(self) -> None:
+        self.server.should_exit = True
+        self.thread.join(timeout=10)
+
+    def cpu_time(self) -> float:
+        """CPU seconds used by the server thread so far"""
+        return time.clock_gettime(time.pthread_getcpuclockid(self.thread.ident))
+
+    async def call(self, coroutine) -> Any:
+        """Run a coroutine on the server's loop and wait for it from ours"""
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coroutine, self.loop))
+
+
+class Tablet:
+    """One simulated room member recording when each broadcast reaches it"""
+
+    def __init__(self, index: int, deliveries: Dict[int, List[float]], on_delivery):
+        self.index = index
+        self.deliveries = deliveries
+        self.on_delivery = on_delivery
+        self.sio = socketio.AsyncClient(reconnection=False)
+        self.joined = asyncio.get_running_loop().create_future()
+        self.sio.on("room_presence", self._on_presence)
+        for event in SERVER_EVENTS:
+            self.sio.on(event, self._on_server_event)
+        self.sio.on("audio_received", self._on_audio)
+
+    async def _on_presence(self, data):
+        if not self.joined.done():
+            self.joined.set_result(None)
+
+    def _record(self, seq: int, sent_at: float) -> None:
+        self.deliveries.setdefault(seq, []).append(time.perf_counter() - sent_at)
+        self.on_delivery(seq)
+
+    async def _on_server_event(self, data):
+        self._record(data["seq"], data["sent_at"])
+
+    async def _on_audio(self, data):
+        # The relay forwards audio_data untouched; the header carries the timing
+        seq, sent_at, _ = data["audio_data"].split(":", 2)
+        self._record(int(seq), float(sent_at))
+
+
+def server_payload(event: str, seq: int, size: int, room_id: str) -> Dict[str, Any]:
+    return {"room_id": room_id, "event": event, "seq": seq, "sent_at": time.perf_counter(), "data": "x" * size}
+
+
+def audio_payload(seq: int, size: int, room_id: str, user_id: str) -> Dict[str, Any]:
+    return {"room_id": room_id, "user_id": user_id, "audio_data": f"{seq}:{time.perf_counter()!r}:" + "A" * size}
+
+
+async def create_room(server, server_thread: ServerThread, size: int) -> Dict[str, Any]:
+    """Users and a room written straight to the in-memory database (no bcrypt per tablet)"""
+    async def insert():
+        users = [server.User(email=f"fanout-{uuid.uuid4().hex[:10]}@example.com", name=f"Tablet {n}", password_hash="-") for n in range(size)]
+        for user in users:
+            await server.db.users.insert_one(user.dict())
+        room = server.Room(name="Fan-out", admin_id=users[0].id)
+        await server.db.rooms.insert_one(room.dict())
+        return room.id, users
+
+    room_id, users = await server_thread.call(insert())
+    tokens = [server.create_access_token({"sub": user.email}, timedelta(hours=1)) for user in users]
+    return {"room_id": room_id, "user_ids": [user.id for user in users], "tokens": tokens}
+
+
+async def run_scenario(
+    server, server_thread: ServerThread, tablets: List[Tablet], deliveries: Dict[int, List[float]], waiters: Dict[int, asyncio.Future],
+    room: Dict[str, Any], event: str, payload_size: int, broadcasts: int, timeout: float
+) -> Dict[str, Any]:
+    receivers = len(tablets) - 1 if event == RELAY_EVENT else len(tablets)
+    deliveries.clear()
+    last_receiver: List[float] = []
+    lost = 0
+    loop = asyncio.get_running_loop()
+    cpu_start = server_thread.cpu_time()
+    wall_start = time.perf_counter()
+
+    for seq in range(broadcasts):
+        waiter = loop.create_future()
+        waiters[seq] = waiter
+        if event == RELAY_EVENT:
+            await tablets[0].sio.emit(RELAY_EVENT, audio_payload(seq, payload_size, room["room_id"], room["user_ids"][0]))
+        else:
+            await server_thread.call(server.sio.emit(event, server_payload(event, seq, payload_size, room["room_id"]), room=room["room_id"]))
+        try:
+            await asyncio.wait_for(waiter, timeout)
+        except asyncio.TimeoutError:
+            pass
+        received = deliveries.get(seq, [])
+        lost += receivers - len(received)
+        if received:
+            last_receiver.append(max(received))
+        waiters.pop(seq, None)
+
+    wall = time.perf_counter() - wall_start
+    cpu_per_broadcast = (server_thread.cpu_time() - cpu_start) / broadcasts
+    samples = [latency for seq_latencies in deliveries.values() for latency in seq_latencies]
+
+    def ms(value: Optional[float]) -> Optional[float]:
+        return round(value * 1000, 3) if value is not None else None
+
+    return {
+        "room_size": len(tablets),
+        "event": event,
+        "payload_bytes": payload_size,
+        "broadcasts": broadcasts,
+        "deliveries": len(samples),
+        "lost": lost,
+        "p50_ms": ms(percentile(samples, 0.5)),
+        "p95_ms": ms(percentile(samples, 0.95)),
+        "p99_ms": ms(percentile(samples, 0.99)),
+        "last_receiver_p50_ms": ms(percentile(last_receiver, 0.5)),
+        "server_cpu_ms_per_broadcast": ms(cpu_per_broadcast),
+        # Broadcasts per second that would saturate one core on fan-out alone
+        "max_broadcasts_per_s": round(1 / cpu_per_broadcast, 1) if cpu_per_broadcast > 0 else None,
+        "wall_s": round(wall, 3)
+    }
+
+
+async def benchmark_room(
+    server, server_thread: ServerThread, base_url: str, room_size: int, payload_sizes: List[int], events: List[str], broadcasts: int, timeout: float
+) -> List[Dict[str, Any]]:
+    room = await create_room(server, server_thread, room_size)
+    deliveries: Dict[int, List[float]] = {}
+    waiters: Dict[int, asyncio.Future] = {}
+    expected = {"count": room_size}
+
+    def on_delivery(seq: int) -> None:
+        waiter = waiters.get(seq)
+        if waiter is not None and not waiter.done() and len(deliveries.get(seq, [])) >= expected["count"]:
+            waiter.set_result(None)
+
+    tablets = [Tablet(n, deliveries, on_delivery) for n in range(room_size)]
+    try:
+        for tablet, token in zip(tablets, room["tokens"]):
+            await tablet.sio.connect(base_url, auth={"token": token}, transports=["websocket"])
+            await tablet.sio.emit("join_room", {"room_id": room["room_id"]})
+        await asyncio.wait_for(asyncio.gather(*(tablet.joined for tablet in tablets)), timeout)
+
+        rows = []
+        for event in events:
+            expected["count"] = room_size - 1 if event == RELAY_EVENT else room_size
+            for payload_size in payload_sizes:
+                rows.append(await run_scenario(server, server_thread, tablets, deliveries, waiters, room, event, payload_size, broadcasts, timeout))
+        return rows
+    finally:
+        await asyncio.gather(*(tablet.sio.disconnect() for tablet in tablets if tablet.sio.connected), return_exceptions=True)
+
+
+def run_fanout_benchmark(
+    room_sizes: List[int] = (10, 30),
+    payload_sizes: List[int] = (256, 4096),
+    events: List[str] = DEFAULT_EVENTS,
+    broadcasts: int = 30,
+    timeout: float = 10.0,
+    quiet: bool = True
+) -> List[Dict[str, Any]]:
+    server = import_server(db_latency=0)
+    if quiet:
+        logging.getLogger().setLevel(logging.WARNING)
+    port = free_port()
+    server_thread = ServerThread(server.socket_app, port)
+    server_thread.start()
+
+    async def run_all():
+        rows = []
+        for room_size in room_sizes:
+            rows.extend(await benchmark_room(
+                server, server_thread, f"http://127.0.0.1:{port}", room_size, list(payload_sizes), list(events), broadcasts, timeout
+            ))
+        return rows
+
+    try:
+        return asyncio.run(run_all())
+    finally:
+        server_thread.stop()
+
+
+def format_report(rows: List[Dict[str, Any]]) -> str:
+    header = (
+        f"{'room':>5} {'event':<17} {'bytes':>7} {'lost':>5} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+        f"{'last p50':>9} {'cpu ms/bc':>10} {'max bc/s':>9}"
+    )
+    lines = [header, "-" * len(header)]
+    for row in rows:
+        values = [row[key] if row[key] is not None else "-" for key in (
+            "p50_ms", "p95_ms", "p99_ms", "last_receiver_p50_ms", "server_cpu_ms_per_broadcast", "max_broadcasts_per_s"
+        )]
+        lines.append(
+            f"{row['room_size']:>5} {row['event']:<17} {row['payload_bytes']:>7} {row['lost']:>5} "
+            f"{values[0]:>8} {values[1]:>8} {values[2]:>8} {values[3]:>9} {values[4]:>10} {values[5]:>9}"
+        )
+    return "\n".join(lines)
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(item) for item in value.split(",") if item]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--room-sizes", type=_int_list, default=[10, 30, 60], help="comma-separated tablets per room")
+    parser.add_argument("--payload-sizes", type=_int_list, default=[256, 4096, 65536], help="comma-separated payload bytes")
+    parser.add_argument("--events", default=",".join(DEFAULT_EVENTS), help="comma-separated events to broadcast")
+    parser.add_argument("--broadcasts", type=int, default=50, help="broadcasts per scenario")
+    parser.add_argument("--timeout", type=float, default=10.0, help="seconds to wait for every tablet to receive a broadcast")
+    parser.add_argument("--json", help="also write the report to this file")
+    parser.add_argument("--verbose", action="store_true", help="keep the server's INFO logging")
+    args = parser.parse_args()
+
+    events = [event for event in args.events.split(",") if event]
+    unknown = set(events) - set(DEFAULT_EVENTS)
+    if unknown:
+        parser.error(f"unknown events: {', '.join(sorted(unknown))}")
+
+    rows = run_fanout_benchmark(args.room_sizes, args.payload_sizes, events, args.broadcasts, args.timeout, quiet=not args.verbose)
+    print(format_report(rows))
+    if args.json:
+        with open(args.json, "w") as report_file:
+            json.dump(rows, report_file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
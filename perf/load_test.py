@@ -0,0 +1,274 @@
+"""Offline load test: boots server.socket_app in-process and drives REST + Socket.IO traffic.
+
+    python -m perf.load_test --users 40 --room-size 10 --duration 30 --llm-latency 1.5
+
+Mongo is replaced by the in-memory stand-in and Spotify, Genius, AUdD and
+the LLM by stubs with configurable latency (see perf/stubs.py). The report
+lists count, errors, throughput and p50/p95/p99 latency per operation.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import random
+import socket
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+import socketio
+import uvicorn
+
+from perf.stubs import import_server
+
+SONG_TITLES = [
+    ("Garota de Ipanema", "Tom Jobim"), ("Evidências", "Chitãozinho & Xororó"), ("Wonderwall", "Oasis"),
+    ("Tempo Perdido", "Legião Urbana"), ("Let It Be", "The Beatles"), ("Aquarela", "Toquinho"),
+    ("Hotel California", "Eagles"), ("Pais e Filhos", "Legião Urbana")
+]
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(q * (len(ordered) - 1)))))]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class Recorder:
+    """Latency samples and error counts per operation"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.started = time.perf_counter()
+        self.finished: Optional[float] = None
+
+    async def measure(self, name: str, operation: Callable[[], Any]) -> Any:
+        start = time.perf_counter()
+        try:
+            result = await operation()
+        except Exception:
+            self.errors[name] = self.errors.get(name, 0) + 1
+            self.latencies.setdefault(name, [])
+            return None
+        self.latencies.setdefault(name, []).append(time.perf_counter() - start)
+        return result
+
+    def report(self) -> List[Dict[str, Any]]:
+        elapsed = (self.finished or time.perf_counter()) - self.started
+        rows = []
+        for name in sorted(self.latencies):
+            samples = self.latencies[name]
+            rows.append({
+                "operation": name,
+                "count": len(samples),
+                "errors": self.errors.get(name, 0),
+                "throughput_rps": round(len(samples) / elapsed, 2) if elapsed else 0.0,
+                "p50_ms": round(percentile(samples, 0.5) * 1000, 2) if samples else None,
+                "p95_ms": round(percentile(samples, 0.95) * 1000, 2) if samples else None,
+                "p99_ms": round(percentile(samples, 0.99) * 1000, 2) if samples else None
+            })
+        return rows
+
+
+def format_report(rows: List[Dict[str, Any]]) -> str:
+    header = f"{'operation':<48} {'count':>7} {'errors':>6} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"
+    lines = [header, "-" * len(header)]
+    for row in rows:
+        lines.append(
+            f"{row['operation']:<48} {row['count']:>7} {row['errors']:>6} {row['throughput_rps']:>8} "
+            f"{row['p50_ms'] if row['p50_ms'] is not None else '-':>9} "
+            f"{row['p95_ms'] if row['p95_ms'] is not None else '-':>9} "
+            f"{row['p99_ms'] if row['p99_ms'] is not None else '-':>9}"
+        )
+    return "\n".join(lines)
+
+
+class VirtualUser:
+    """One band member: a REST client plus a Socket.IO connection in a room"""
+
+    def __init__(self, base_url: str, recorder: Recorder, rng: random.Random):
+        self.base_url = base_url
+        self.recorder = recorder
+        self.rng = rng
+        self.http = httpx.AsyncClient(base_url=base_url, timeout=60)
+        self.sio = socketio.AsyncClient(reconnection=False)
+        self.token: Optional[str] = None
+        self.room_id: Optional[str] = None
+        self.echoes: Dict[str, asyncio.Future] = {}
+
+    async def request(self, name: str, method: str, path: str, **kwargs) -> Any:
+        async def send():
+            response = await self.http.request(method, path, headers={"Authorization": f"Bearer {self.token}"}, **kwargs)
+            response.raise_for_status()
+            return response.json()
+        return await self.recorder.measure(name, send)
+
+    async def setup(self, room_code: Optional[str]) -> Dict[str, Any]:
+        email = f"perf-{uuid.uuid4().hex[:10]}@example.com"
+        registered = await self.recorder.measure("POST /api/auth/register", lambda: self._post_json(
+            "/api/auth/register", {"email": email, "password": "perf-password", "name": email.split("@")[0]}
+        ))
+        self.token = registered["access_token"]
+
+        if room_code is None:
+            room = await self.request("POST /api/rooms/create", "POST", "/api/rooms/create", json={"name": "Perf room"})
+        else:
+            joined = await self.request("POST /api/rooms/join", "POST", "/api/rooms/join", json={"room_code": room_code})
+            room = joined["room"]
+        self.room_id = room["id"]
+
+        self.sio.on("transpose_changed", self._on_transpose_changed)
+        await self.recorder.measure("socketio connect", lambda: self.sio.connect(
+            self.base_url, auth={"token": self.token}, transports=["websocket"]
+        ))
+        await self.sio.emit("join_room", {"room_id": self.room_id})
+        return room
+
+    async def _post_json(self, path: str, payload: Dict[str, Any]) -> Any:
+        response = await self.http.post(path, json=payload)
+        response.raise_for_status()
+        return response.json()
+
+    async def _on_transpose_changed(self, data):
+        future = self.echoes.pop(data.get("new_key"), None)
+        if future is not None and not future.done():
+            future.set_result(None)
+
+    async def broadcast_round_trip(self) -> None:
+        # The sender is in the room too, so it receives its own broadcast
+        nonce = uuid.uuid4().hex
+        future = asyncio.get_running_loop().create_future()
+        self.echoes[nonce] = future
+        await self.sio.emit("transpose_changed", {"room_id": self.room_id, "new_key": nonce})
+        try:
+            await asyncio.wait_for(future, timeout=10)
+        finally:
+            self.echoes.pop(nonce, None)
+
+    def operations(self) -> List[tuple]:
+        room = self.room_id
+        title, artist = self.rng.choice(SONG_TITLES)
+        return [
+            (30, "GET /api/rooms/{room_id}", lambda: self.request("GET /api/rooms/{room_id}", "GET", f"/api/rooms/{room}")),
+            (15, "GET /api/rooms/{room_id}/playlist", lambda: self.request("GET /api/rooms/{room_id}/playlist", "GET", f"/api/rooms/{room}/playlist")),
+            (10, "POST /api/songs/search", lambda: self.request("POST /api/songs/search", "POST", "/api/songs/search", json={"title": title, "artist": artist})),
+            (5, "POST /api/songs/intelligent-search", lambda: self.request("POST /api/songs/intelligent-search", "POST", "/api/songs/intelligent-search", json={"query": title})),
+            (5, "POST /api/rooms/{room_id}/speed/adjust", lambda: self.request("POST /api/rooms/{room_id}/speed/adjust", "POST", f"/api/rooms/{room}/speed/adjust", json={"tempo_change": self.rng.choice((-2, 2))})),
+            (5, "GET /api/rooms/{room_id}/transition-chords", lambda: self.request("GET /api/rooms/{room_id}/transition-chords", "GET", f"/api/rooms/{room}/transition-chords")),
+            (20, "socketio heartbeat (ack)", lambda: self.recorder.measure("socketio heartbeat (ack)", lambda: self.sio.call("heartbeat", {}, timeout=10))),
+            (10, "socketio transpose_changed (broadcast echo)", lambda: self.recorder.measure("socketio transpose_changed (broadcast echo)", self.broadcast_round_trip))
+        ]
+
+    async def run(self, deadline: float, think_time: float) -> None:
+        while time.perf_counter() < deadline:
+            operations = self.operations()
+            weights = [weight for weight, _, _ in operations]
+            _, _, operation = self.rng.choices(operations, weights=weights)[0]
+            await operation()
+            if think_time:
+                await asyncio.sleep(self.rng.uniform(0, think_time * 2))
+
+    async def close(self) -> None:
+        if self.sio.connected:
+            await self.sio.disconnect()
+        await self.http.aclose()
+
+
+async def seed_songs(base_user: VirtualUser, room_id: str, count: int) -> None:
+    """Fill the first room's playlist so playlist and transition endpoints do real work"""
+    for title, artist in SONG_TITLES[:count]:
+        song = await base_user.request("POST /api/songs/search", "POST", "/api/songs/search", json={"title": title, "artist": artist})
+        if song:
+            await base_user.request("POST /api/rooms/{room_id}/playlist/add/{song_id}", "POST", f"/api/rooms/{room_id}/playlist/add/{song['id']}")
+
+
+async def run_load_test(
+    users: int = 20,
+    room_size: int = 10,
+    duration: float = 20.0,
+    think_time: float = 0.05,
+    seed: int = 1,
+    db_latency: float = 0.0005,
+    llm_latency: float = 1.5,
+    spotify_latency: float = 0.15,
+    genius_latency: float = 0.4,
+    quiet: bool = True
+) -> List[Dict[str, Any]]:
+    server = import_server(db_latency=db_latency, llm_latency=llm_latency, spotify_latency=spotify_latency, genius_latency=genius_latency)
+    if quiet:
+        # server.py configures INFO logging on import; keep the report readable
+        logging.getLogger().setLevel(logging.WARNING)
+    port = free_port()
+    uvicorn_server = uvicorn.Server(uvicorn.Config(server.socket_app, host="127.0.0.1", port=port, log_level="warning"))
+    serve_task = asyncio.create_task(uvicorn_server.serve())
+    while not uvicorn_server.started:
+        await asyncio.sleep(0.01)
+
+    base_url = f"http://127.0.0.1:{port}"
+    recorder = Recorder()
+    rng = random.Random(seed)
+    virtual_users = [VirtualUser(base_url, recorder, random.Random(rng.random())) for _ in range(users)]
+
+    try:
+        room_code = None
+        for index, user in enumerate(virtual_users):
+            if index % room_size == 0:
+                room = await user.setup(None)
+                room_code = room["code"]
+                await seed_songs(user, room["id"], 4)
+            else:
+                await user.setup(room_code)
+
+        # Measure steady state only
+        recorder.latencies.clear()
+        recorder.errors.clear()
+        recorder.started = time.perf_counter()
+        deadline = recorder.started + duration
+        await asyncio.gather(*(user.run(deadline, think_time) for user in virtual_users))
+        recorder.finished = time.perf_counter()
+    finally:
+        await asyncio.gather(*(user.close() for user in virtual_users), return_exceptions=True)
+        uvicorn_server.should_exit = True
+        await serve_task
+
+    return recorder.report()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20, help="concurrent virtual users")
+    parser.add_argument("--room-size", type=int, default=10, help="users per room")
+    parser.add_argument("--duration", type=float, default=20.0, help="steady-state seconds")
+    parser.add_argument("--think-time", type=float, default=0.05, help="mean pause between operations (s)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--db-latency", type=float, default=0.0005, help="in-memory Mongo latency per operation (s)")
+    parser.add_argument("--llm-latency", type=float, default=1.5, help="LLM stub latency (s)")
+    parser.add_argument("--spotify-latency", type=float, default=0.15, help="Spotify stub latency (s)")
+    parser.add_argument("--genius-latency", type=float, default=0.4, help="Genius stub latency (s)")
+    parser.add_argument("--json", help="also write the report to this file")
+    parser.add_argument("--verbose", action="store_true", help="keep the server's INFO logging")
+    args = parser.parse_args()
+
+    rows = asyncio.run(run_load_test(
+        users=args.users, room_size=args.room_size, duration=args.duration, think_time=args.think_time, seed=args.seed,
+        db_latency=args.db_latency, llm_latency=args.llm_latency, spotify_latency=args.spotify_latency,
+        genius_latency=args.genius_latency, quiet=not args.verbose
+    ))
+
+    print(format_report(rows))
+    if args.json:
+        with open(args.json, "w") as report_file:
+            json.dump(rows, report_file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
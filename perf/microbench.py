@@ -0,0 +1,259 @@
+"""Micro-benchmarks for the pure-Python functions on the request hot paths.
+
+    python -m perf.microbench                 # run and compare with perf/baselines.json
+    python -m perf.microbench --save          # run and record new baselines
+    python -m perf.microbench -k transpose    # only cases whose name contains "transpose"
+
+Each case is timed with ``timeit`` (auto-ranged loop count, median of
+several repeats) and reported in microseconds per call. A case slower
+than its baseline by more than ``--tolerance`` fails the run, so optimisation work (and regressions) show up as numbers.
+"""
+import argparse
+import copy
+import json
+import logging
+import platform
+import statistics
+import sys
+import timeit
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from perf.stubs import import_server
+
+BASELINES_PATH = Path(__file__).resolve().parent / "baselines.json"
+
+CHORD_CHART_SECTION = """[Intro]
+C  G/B  Am7  Fmaj7
+
+[Verso 1]
+     C              G              Am             F
+Quando a noite chega e a cidade adormece
+     C              G                  F          G7
+Eu fico na janela esperando você voltar
+     Am             Em             F              C
+Cada luz que apaga é um pedaço que esquece
+     Dm7            G7sus4         G7             C
+Do caminho de volta pro nosso lugar
+
+[Refrão]
+F                 C/E           Dm7          G
+Vem, que o tempo não espera ninguém
+F                 C/E           Am           Am/G
+Vem, que a saudade já chegou também
+Fmaj7             Em7           Dm7          Gsus4  G
+E a canção que eu fiz só termina com você
+"""
+
+# A complete song: four verse/chorus passes, a bridge and an outro
+FULL_CHORD_CHART = "\n".join([CHORD_CHART_SECTION] * 4) + """
+[Ponte]
+Bb                F/A           Gm7          C7
+Se eu pudesse voltar no tempo
+Bbmaj7            Am7           Dm           Dm/C
+Eu faria tudo outra vez
+Bbadd9            C             Dsus2        D
+
+[Final]
+C  G/B  Am7  Fmaj7  C
+"""
+
+CHORD_TOKENS = ["C", "G/B", "Am7", "Fmaj7", "Dm7", "G7sus4", "C#m", "Bb", "F#", "Ebmaj7", "Abdim", "Esus4"] * 10
+
+AI_REPERTOIRE_RESPONSE = "\n".join([
+    "# Repertório Rock Nacional",
+    "1. Tempo Perdido - Legião Urbana | Tom: C | BPM: 128 | Acordes: C G Am F",
+    "2. Pais e Filhos - Legião Urbana | Tom: G | BPM: 118 | Acordes: G D Em C",
+    "3. Exagerado - Cazuza | Tom: E | BPM: 132 | Acordes: E B C#m A",
+    "4. Como uma Onda - Lulu Santos | Tom: D | BPM: 104 | Acordes: D A Bm G",
+    "5. Primeiros Erros - Kiko Zambianchi | Tom: A | BPM: 96 | Acordes: A E F#m D",
+    "6. Lanterna dos Afogados - Paralamas do Sucesso | Tom: Em | BPM: 88 | Acordes: Em C G D",
+    "7. Meu Erro - Paralamas do Sucesso | Tom: F | BPM: 140 | Acordes: F C Dm Bb",
+    "8. Infinita Highway - Engenheiros do Hawaii | Tom: G | BPM: 150 | Acordes: G C D Em",
+    "9. Por Enquanto - Legião Urbana | Tom: C | BPM: 100 | Acordes: C Em F G",
+    "10. Ainda é Cedo - Legião Urbana | Tom: Am | BPM: 124 | Acordes: Am F C G",
+    "11. Vento no Litoral - Legião Urbana | Tom: D | BPM: 92 | Acordes: D G A Bm",
+    "12. Pro Dia Nascer Feliz - Barão Vermelho | Tom: E | BPM: 136 | Acordes: E A B C#m",
+    "13. Sonífera Ilha - Titãs | Tom: A | BPM: 120 | Acordes: A D E F#m",
+    "14. Óculos - Paralamas do Sucesso | Tom: G | BPM: 126 | Acordes: G Em C D",
+    "15. Tédio - Biquini Cavadão | Tom: Bb | BPM: 130 | Acordes: Bb F Gm Eb"
+])
+
+AI_LYRICS_TEXT = """Aqui está uma letra original inspirada no título:
+
+**Canção da Estrada**
+
+[Verso 1]
+Saí de casa cedo com a mochila nas costas
+O sol ainda tímido pintando as encostas
+Cada quilômetro um pedaço de mim
+Deixado na estrada que parece sem fim
+
+[Refrão]
+Vou seguindo o asfalto, vou cantando no caminho
+Quem tem uma canção nunca viaja sozinho
+Vou seguindo o asfalto, o horizonte é meu lar
+Enquanto houver estrada eu vou continuar
+
+[Verso 2]
+Parei numa cidade que não tinha nome
+Dividi um café e um pouco da minha fome
+Um velho tocador me ensinou um refrão
+Que hoje eu carrego dentro do coração
+
+[Ponte]
+E quando a noite cai e o frio aperta
+Eu lembro que a porta de casa está aberta
+
+```json
+{"genre": "MPB", "key": "G", "bpm": 96, "duration": 230}
+```
+"""
+
+CACHE_KEY_DATA = {
+    "title": "Garota de Ipanema",
+    "artist": "Tom Jobim",
+    "genre": "Bossa Nova",
+    "song_count": 15,
+    "room_id": "7f9c2ba4-e88f-4e2b-9a5d-1f1c6c3d2e10"
+}
+
+
+def large_local_database(service, size: int = 5000):
+    """A copy of the improved music service whose catalog has ``size`` extra songs"""
+    large = copy.copy(service)
+    large.catalog = type(service.catalog)()
+    large.catalog.load_file()
+    large.catalog.add_many(
+        {
+            "title": f"Canção número {n} da banda {n % 97}",
+            "artist": f"Banda {n % 97}",
+            "lyrics": "\n".join(f"Linha {line} da canção {n}" for line in range(12)),
+            "chords": "C G Am F"
+        }
+        for n in range(size)
+    )
+    return large
+
+
+def drive(coroutine) -> Any:
+    """Run a coroutine that never suspends without the cost of an event loop"""
+    try:
+        coroutine.send(None)
+    except StopIteration as stop:
+        return stop.value
+    raise RuntimeError("coroutine suspended")
+
+
+def build_cases() -> Dict[str, Callable[[], Any]]:
+    server = import_server(db_latency=0, llm_latency=0, spotify_latency=0, genius_latency=0, audd_latency=0)
+    improved = server.improved_music_service
+    large = large_local_database(improved)
+    cache_service = server.cache_service
+
+    return {
+        "transpose_chord x120": lambda: [server.transpose_chord(chord, 5) for chord in CHORD_TOKENS],
+        "transpose_chords_string full chart": lambda: server.transpose_chords_string(FULL_CHORD_CHART, "C", "E"),
+        "transpose_chords_string single line": lambda: server.transpose_chords_string("C G Am F Dm7 G7sus4", "C", "D"),
+        "calculate_transition_chords same key": lambda: drive(server.calculate_transition_chords("C", "C G Am F", "C", "C Em F G")),
+        "calculate_transition_chords key change": lambda: drive(server.calculate_transition_chords("C", "C G Am F", "F#", "F# B C#")),
+        "_parse_ai_repertoire_response 15 lines": lambda: improved._parse_ai_repertoire_response(AI_REPERTOIRE_RESPONSE, "Rock"),
+        "_extract_lyrics_from_text": lambda: improved._extract_lyrics_from_text(AI_LYRICS_TEXT),
+        "_search_local_database hit": lambda: improved._search_local_database("imagine", "John Lennon"),
+        "_search_local_database 5k miss": lambda: large._search_local_database("musica_que_nao_existe", ""),
+        "_search_local_database 5k late hit": lambda: large._search_local_database("cancao_numero_4990_da_banda_43", ""),
+        "_generate_cache_key": lambda: cache_service._generate_cache_key("song_search", CACHE_KEY_DATA)
+    }
+
+
+def measure(func: Callable[[], Any], repeat: int = 5, min_time: float = 0.2) -> float:
+    """Median microseconds per call over ``repeat`` runs of an auto-ranged loop"""
+    timer = timeit.Timer(func)
+    number, elapsed = timer.autorange()
+    if elapsed < min_time:
+        number = max(1, int(number * min_time / max(elapsed, 1e-9)))
+    runs = timer.repeat(repeat=repeat, number=number)
+    return statistics.median(runs) / number * 1e6
+
+
+def compare(results: Dict[str, float], baselines: Dict[str, float], tolerance: float) -> List[Dict[str, Any]]:
+    rows = []
+    for name, current in results.items():
+        baseline = baselines.get(name)
+        ratio = current / baseline if baseline else None
+        if ratio is None:
+            status = "new"
+        elif ratio > 1 + tolerance:
+            status = "REGRESSION"
+        elif ratio < 1 - tolerance:
+            status = "faster"
+        else:
+            status = "ok"
+        rows.append({"case": name, "us_per_call": round(current, 3), "baseline_us": baseline, "ratio": round(ratio, 3) if ratio else None, "status": status})
+    return rows
+
+
+def format_rows(rows: List[Dict[str, Any]]) -> str:
+    header = f"{'case':<42} {'us/call':>12} {'baseline':>12} {'ratio':>7}  status"
+    lines = [header, "-" * len(header)]
+    for row in rows:
+        baseline = row["baseline_us"] if row["baseline_us"] is not None else "-"
+        ratio = row["ratio"] if row["ratio"] is not None else "-"
+        lines.append(f"{row['case']:<42} {row['us_per_call']:>12} {baseline:>12} {ratio:>7}  {row['status']}")
+    return "\n".join(lines)
+
+
+def load_baselines(path: Path = BASELINES_PATH) -> Dict[str, float]:
+    if not path.exists():
+        return {}
+    with open(path) as baselines_file:
+        return json.load(baselines_file).get("cases", {})
+
+
+def save_baselines(results: Dict[str, float], path: Path = BASELINES_PATH) -> None:
+    payload = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cases": {name: round(value, 3) for name, value in sorted(results.items())}
+    }
+    with open(path, "w") as baselines_file:
+        json.dump(payload, baselines_file, indent=2)
+        baselines_file.write("\n")
+
+
+def run(select: Optional[str] = None, repeat: int = 5, min_time: float = 0.2) -> Dict[str, float]:
+    cases = build_cases()
+    return {
+        name: measure(func, repeat=repeat, min_time=min_time)
+        for name, func in cases.items()
+        if not select or select in name
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-k", dest="select", help="only run cases whose name contains this text")
+    parser.add_argument("--repeat", type=int, default=5, help="timing runs per case (median is reported)")
+    parser.add_argument("--min-time", type=float, default=0.2, help="minimum seconds per timing run")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown before a case fails (0.25 = 25%%)")
+    parser.add_argument("--baselines", type=Path, default=BASELINES_PATH)
+    parser.add_argument("--save", action="store_true", help="record the results as the new baselines")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+
+    results = run(args.select, repeat=args.repeat, min_time=args.min_time)
+    if args.save:
+        baselines = load_baselines(args.baselines)
+        baselines.update(results)
+        save_baselines(baselines, args.baselines)
+        print(f"Saved {len(results)} baselines to {args.baselines}")
+
+    rows = compare(results, load_baselines(args.baselines), args.tolerance)
+    print(format_rows(rows))
+    if not args.save and any(row["status"] == "REGRESSION" for row in rows):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,543 @@
+"""In-process stand-ins for Mongo and the upstream providers.
+
+The load test, micro-benchmarks and fan-out benchmark run the real
+``server`` module against these, so they work offline and every upstream
+has a known, configurable latency.
+"""
+import asyncio
+import copy
+import importlib
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+import types
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+import bson
+
+BACKEND_DIR = Path(__file__).resolve().parents[1] / "backend"
+
+
+def _get_path(document: Dict[str, Any], path: str) -> Any:
+    value: Any = document
+    for part in path.split("."):
+        if isinstance(value, dict):
+            value = value.get(part)
+        elif isinstance(value, list) and part.isdigit() and int(part) < len(value):
+            value = value[int(part)]
+        else:
+            return None
+    return value
+
+
+def _has_path(document: Dict[str, Any], path: str) -> bool:
+    value: Any = document
+    for part in path.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return False
+        value = value[part]
+    return True
+
+
+def _compare(value: Any, operator: str, operand: Any) -> bool:
+    try:
+        if operator == "$gt":
+            return value is not None and value > operand
+        if operator == "$gte":
+            return value is not None and value >= operand
+        if operator == "$lt":
+            return value is not None and value < operand
+        if operator == "$lte":
+            return value is not None and value <= operand
+    except TypeError:
+        return False
+    raise ValueError(f"Unsupported operator {operator}")
+
+
+def _match_value(value: Any, condition: Any, document: Dict[str, Any], path: str) -> bool:
+    if isinstance(condition, re.Pattern):
+        return isinstance(value, str) and bool(condition.search(value))
+
+    if isinstance(condition, dict) and any(key.startswith("$") for key in condition):
+        for operator, operand in condition.items():
+            if operator == "$eq":
+                if not _match_value(value, operand, document, path):
+                    return False
+            elif operator == "$ne":
+                if _match_value(value, operand, document, path):
+                    return False
+            elif operator == "$in":
+                if not any(_match_value(value, item, document, path) for item in operand):
+                    return False
+            elif operator == "$nin":
+                if any(_match_value(value, item, document, path) for item in operand):
+                    return False
+            elif operator == "$exists":
+                if _has_path(document, path) != bool(operand):
+                    return False
+            elif operator == "$regex":
+                flags = re.IGNORECASE if "i" in condition.get("$options", "") else 0
+                if not isinstance(value, str) or not re.search(operand, value, flags):
+                    return False
+            elif operator == "$options":
+                continue
+            elif operator in ("$gt", "$gte", "$lt", "$lte"):
+                if isinstance(value, list):
+                    if not any(_compare(item, operator, operand) for item in value):
+                        return False
+                elif not _compare(value, operator, operand):
+                    return False
+            else:
+                raise ValueError(f"Unsupported query operator {operator}")
+        return True
+
+    if isinstance(value, list) and not isinstance(condition, list):
+        return condition in value
+    return value == condition
+
+
+def match(document: Dict[str, Any], query: Optional[Dict[str, Any]]) -> bool:
+    for key, condition in (query or {}).items():
+        if key == "$or":
+            if not any(match(document, sub) for sub in condition):
+                return False
+        elif key == "$and":
+            if not all(match(document, sub) for sub in condition):
+                return False
+        elif not _match_value(_get_path(document, key), condition, document, key):
+            return False
+    return True
+
+
+def _set_path(document: Dict[str, Any], path: str, value: Any) -> None:
+    parts = path.split(".")
+    for part in parts[:-1]:
+        document = document.setdefault(part, {})
+    document[parts[-1]] = value
+
+
+def apply_update(document: Dict[str, Any], update: Dict[str, Any]) -> None:
+    for operator, fields in update.items():
+        for path, value in fields.items():
+            current = _get_path(document, path)
+            if operator == "$set":
+                _set_path(document, path, value)
+            elif operator == "$unset":
+                parts = path.split(".")
+                parent = _get_path(document, ".".join(parts[:-1])) if len(parts) > 1 else document
+                if isinstance(parent, dict):
+                    parent.pop(parts[-1], None)
+            elif operator == "$inc":
+                _set_path(document, path, (current or 0) + value)
+            elif operator in ("$push", "$addToSet"):
+                items = value["$each"] if isinstance(value, dict) and "$each" in value else [value]
+                target = list(current or [])
+                for item in items:
+                    if operator == "$push" or item not in target:
+                        target.append(item)
+                _set_path(document, path, target)
+            elif operator == "$pull":
+                target = [
+                    item for item in (current or [])
+                    if not (match(item, value) if isinstance(value, dict) and isinstance(item, dict) else _match_value(item, value, {}, path))
+                ]
+                _set_path(document, path, target)
+            else:
+                raise ValueError(f"Unsupported update operator {operator}")
+
+
+def _roundtrip(document: Dict[str, Any]) -> Dict[str, Any]:
+    # BSON round trip: same type checks and naive datetimes as a real server
+    return bson.decode(bson.encode(document))
+
+
+class InsertOneResult:
+    def __init__(self, inserted_id):
+        self.inserted_id = inserted_id
+
+
+class UpdateResult:
+    def __init__(self, matched_count: int, modified_count: int, upserted_id=None):
+        self.matched_count = matched_count
+        self.modified_count = modified_count
+        self.upserted_id = upserted_id
+
+
+class DeleteResult:
+    def __init__(self, deleted_count: int):
+        self.deleted_count = deleted_count
+
+
+class InMemoryCursor:
+    def __init__(self, collection: "InMemoryCollection", documents: List[Dict[str, Any]]):
+        self._collection = collection
+        self._documents = documents
+        self._sort: List = []
+        self._skip = 0
+        self._limit = 0
+
+    def sort(self, key_or_list, direction: int = 1) -> "InMemoryCursor":
+        self._sort = list(key_or_list) if isinstance(key_or_list, list) else [(key_or_list, direction)]
+        return self
+
+    def skip(self, count: int) -> "InMemoryCursor":
+        self._skip = count
+        return self
+
+    def limit(self, count: int) -> "InMemoryCursor":
+        self._limit = count
+        return self
+
+    def _results(self) -> List[Dict[str, Any]]:
+        documents = self._documents
+        for key, direction in reversed(self._sort):
+            documents = sorted(documents, key=lambda doc: (_get_path(doc, key) is not None, _get_path(doc, key)), reverse=direction < 0)
+        documents = documents[self._skip:]
+        if self._limit:
+            documents = documents[:self._limit]
+        return documents
+
+    async def to_list(self, length: Optional[int] = None) -> List[Dict[str, Any]]:
+        await self._collection.database.round_trip()
+        documents = self._results()
+        return [copy.deepcopy(doc) for doc in (documents[:length] if length else documents)]
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for document in await self.to_list(None):
+            yield document
+
+
+class InMemoryCollection:
+    """The subset of AsyncIOMotorCollection that the server uses"""
+
+    def __init__(self, database: "InMemoryDatabase", name: str):
+        self.database = database
+        self.name = name
+        self.documents: List[Dict[str, Any]] = []
+
+    async def find_one(self, query: Optional[Dict[str, Any]] = None, *args, **kwargs) -> Optional[Dict[str, Any]]:
+        await self.database.round_trip()
+        for document in self.documents:
+            if match(document, query):
+                return copy.deepcopy(document)
+        return None
+
+    def find(self, query: Optional[Dict[str, Any]] = None, *args, **kwargs) -> InMemoryCursor:
+        return InMemoryCursor(self, [doc for doc in self.documents if match(doc, query)])
+
+    async def count_documents(self, query: Dict[str, Any], **kwargs) -> int:
+        await self.database.round_trip()
+        return sum(1 for doc in self.documents if match(doc, query))
+
+    async def insert_one(self, document: Dict[str, Any], **kwargs) -> InsertOneResult:
+        await self.database.round_trip()
+        document.setdefault("_id", bson.ObjectId())
+        self.documents.append(_roundtrip(document))
+        return InsertOneResult(document["_id"])
+
+    async def insert_many(self, documents: Iterable[Dict[str, Any]], **kwargs):
+        for document in documents:
+            await self.insert_one(document)
+
+    async def _update(self, query, update, upsert: bool, many: bool, replace: bool = False) -> UpdateResult:
+        await self.database.round_trip()
+        matched = 0
+        for index, document in enumerate(self.documents):
+            if not match(document, query):
+                continue
+            matched += 1
+            if replace:
+                self.documents[index] = _roundtrip({"_id": document["_id"], **update})
+            else:
+                apply_update(document, update)
+                self.documents[index] = _roundtrip(document)
+            if not many:
+                break
+
+        if matched or not upsert:
+            return UpdateResult(matched, matched)
+
+        new_document = {key: value for key, value in query.items() if not key.startswith("$") and not isinstance(value, dict)}
+        if replace:
+            new_document.update(update)
+        else:
+            apply_update(new_document, update)
+        new_document["_id"] = bson.ObjectId()
+        self.documents.append(_roundtrip(new_document))
+        return UpdateResult(0, 0, new_document["_id"])
+
+    async def update_one(self, query, update, upsert: bool = False, **kwargs) -> UpdateResult:
+        return await self._update(query, update, upsert, many=False)
+
+    async def update_many(self, query, update, upsert: bool = False, **kwargs) -> UpdateResult:
+        return await self._update(query, update, upsert, many=True)
+
+    async def replace_one(self, query, document, upsert: bool = False, **kwargs) -> UpdateResult:
+        return await self._update(query, document, upsert, many=False, replace=True)
+
+    async def delete_one(self, query, **kwargs) -> DeleteResult:
+        await self.database.round_trip()
+        for index, document in enumerate(self.documents):
+            if match(document, query):
+                del self.documents[index]
+                return DeleteResult(1)
+        return DeleteResult(0)
+
+    async def delete_many(self, query, **kwargs) -> DeleteResult:
+        await self.database.round_trip()
+        kept = [doc for doc in self.documents if not match(doc, query)]
+        deleted = len(self.documents) - len(kept)
+        self.documents = kept
+        return DeleteResult(deleted)
+
+    async def create_index(self, *args, **kwargs) -> str:
+        return "stub_index"
+
+    def aggregate(self, pipeline: List[Dict[str, Any]], **kwargs) -> InMemoryCursor:
+        documents = [copy.deepcopy(doc) for doc in self.documents]
+        for stage in pipeline:
+            (name, spec), = stage.items()
+            if name == "$match":
+                documents = [doc for doc in documents if match(doc, spec)]
+            elif name == "$group":
+                documents = _group(documents, spec)
+            elif name == "$sort":
+                for key, direction in reversed(list(spec.items())):
+                    documents.sort(key=lambda doc: (_get_path(doc, key) is not None, _get_path(doc, key)), reverse=direction < 0)
+            elif name == "$limit":
+                documents = documents[:spec]
+            elif name == "$skip":
+                documents = documents[spec:]
+            else:
+                raise ValueError(f"Unsupported aggregation stage {name}")
+        return InMemoryCursor(self, documents)
+
+
+def _expression(document: Dict[str, Any], expression: Any) -> Any:
+    if isinstance(expression, str) and expression == "$$ROOT":
+        return document
+    if isinstance(expression, str) and expression.startswith("$"):
+        return _get_path(document, expression[1:])
+    if isinstance(expression, dict) and "$bsonSize" in expression:
+        return len(bson.encode(_expression(document, expression["$bsonSize"])))
+    return expression
+
+
+def _group(documents: List[Dict[str, Any]], spec: Dict[str, Any]) -> List[Dict[str, Any]]:
+    groups: Dict[Any, Dict[str, Any]] = {}
+    for document in documents:
+        key = _expression(document, spec["_id"])
+        group = groups.setdefault(json.dumps(key, default=str), {"_id": key})
+        for field, accumulator in spec.items():
+            if field == "_id":
+                continue
+            (operator, argument), = accumulator.items()
+            if operator != "$sum":
+                raise ValueError(f"Unsupported accumulator {operator}")
+            group[field] = group.get(field, 0) + (_expression(document, argument) or 0)
+    return list(groups.values())
+
+
+class InMemoryDatabase:
+    """Motor-compatible database kept in memory, with an optional per-operation latency"""
+
+    def __init__(self, name: str = "perf", latency: float = 0.0):
+        self.name = name
+        self.latency = latency
+        self._collections: Dict[str, InMemoryCollection] = {}
+
+    async def round_trip(self) -> None:
+        await asyncio.sleep(self.latency)
+
+    def __getattr__(self, name: str) -> InMemoryCollection:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    def __getitem__(self, name: str) -> InMemoryCollection:
+        collection = self._collections.get(name)
+        if collection is None:
+            collection = self._collections[name] = InMemoryCollection(self, name)
+        return collection
+
+    async def command(self, command, value=None, **kwargs) -> Dict[str, Any]:
+        if command == "collStats":
+            documents = self[value].documents
+            size = sum(len(bson.encode(doc)) for doc in documents)
+            return {
+                "count": len(documents),
+                "size": size,
+                "storageSize": size,
+                "totalIndexSize": 0,
+                "avgObjSize": size // len(documents) if documents else 0
+            }
+        return {"ok": 1}
+
+
+# Upstream providers
+
+class FakeSpotify:
+    """spotipy.Spotify stand-in; blocks like the real (synchronous) client"""
+
+    def __init__(self, latency: float = 0.15):
+        self.latency = latency
+
+    def search(self, q: str, type: str = "track", limit: int = 10) -> Dict[str, Any]:
+        time.sleep(self.latency)
+        return {"tracks": {"items": [
+            {
+                "id": f"track{index}",
+                "name": f"{q[:40]} {index}",
+                "artists": [{"name": "Perf Artist"}],
+                "album": {"name": "Perf Album", "release_date": "2020-01-01"},
+                "popularity": 60,
+                "preview_url": None,
+                "duration_ms": 200000
+            }
+            for index in range(limit)
+        ]}}
+
+    def audio_features(self, track_ids) -> List[Dict[str, Any]]:
+        time.sleep(self.latency)
+        return [{"tempo": 118.0, "key": 7}]
+
+
+class FakeGeniusSong:
+    def __init__(self, title: str, artist: str):
+        self.title = title
+        self.artist = artist
+        self.url = "https://genius.invalid/song"
+        self.lyrics = "\n".join(f"[Verse {n}]\nLine of {title} number {n}" for n in range(1, 9))
+
+
+class FakeGenius:
+    """lyricsgenius.Genius stand-in; blocks like the real client"""
+
+    def __init__(self, latency: float = 0.4):
+        self.latency = latency
+
+    def search_song(self, title: str, artist: str) -> FakeGeniusSong:
+        time.sleep(self.latency)
+        return FakeGeniusSong(title, artist)
+
+
+def fake_llm_response(prompt: str) -> str:
+    """Canned replies shaped like what each prompt in the code base asks for"""
+    if "Liste 15 músicas" in prompt:
+        return "\n".join(f"Song {n} - Artist {n} - 3min" for n in range(1, 16))
+    if "Liste 5 músicas reais" in prompt or "Encontre até 6 músicas" in prompt:
+        return json.dumps([{"title": f"Song {n}", "artist": f"Artist {n}", "genre": "Pop", "year": "2001", "popularity": 7} for n in range(5)])
+    if "recomende 5 músicas" in prompt:
+        return "\n".join(f"Song {n} - Artist {n}" for n in range(1, 6))
+    if "Crie um repertório" in prompt:
+        return "\n".join(f"Song {n} - Artist {n} | Tom: G | BPM: 120 | Acordes: G D Em C" for n in range(1, 11))
+    return json.dumps({
+        "lyrics_with_chords": "[Verso 1]\n     C              G              Am             F\nLinha um\n",
+        "lyrics": "\n".join(f"Linha {n}" for n in range(20)),
+        "chords": "C - G - Am - F",
+        "key": "C",
+        "genre": "Pop",
+        "tempo": 120,
+        "bpm": 120,
+        "duration": 240,
+        "structure": "Verso - Refrão"
+    })
+
+
+def install_fake_llm(latency: float = 1.5, streaming: bool = False) -> types.ModuleType:
+    """Register an ``emergentintegrations.llm.chat`` module answering after ``latency`` seconds.
+
+    Like the real ``LlmChat`` the fake only answers whole replies; with
+    ``streaming`` it also gets a ``stream_message`` spreading the reply
+    over the same latency, to model a client that streams.
+    """
+
+    class UserMessage:
+        def __init__(self, text: str):
+            self.text = text
+
+    class LlmChat:
+        latency_seconds = latency
+        calls = 0
+
+        def __init__(self, api_key: Optional[str] = None, session_id: Optional[str] = None, system_message: Optional[str] = None):
+            self.session_id = session_id
+            self.system_message = system_message
+
+        def with_model(self, provider: str, model: str) -> "LlmChat":
+            return self
+
+        async def send_message(self, message: UserMessage) -> str:
+            type(self).calls += 1
+            await asyncio.sleep(type(self).latency_seconds)
+            return fake_llm_response(message.text)
+
+    async def stream_message(self, message: UserMessage):
+        # The same reply, line by line, spread over the same latency
+        type(self).calls += 1
+        lines = fake_llm_response(message.text).splitlines(keepends=True)
+        for line in lines:
+            await asyncio.sleep(type(self).latency_seconds / len(lines))
+            yield line
+
+    if streaming:
+        LlmChat.stream_message = stream_message
+
+    chat = types.ModuleType("emergentintegrations.llm.chat")
+    chat.LlmChat = LlmChat
+    chat.UserMessage = UserMessage
+    llm = types.ModuleType("emergentintegrations.llm")
+    llm.chat = chat
+    package = types.ModuleType("emergentintegrations")
+    package.llm = llm
+    sys.modules.update({"emergentintegrations": package, "emergentintegrations.llm": llm, "emergentintegrations.llm.chat": chat})
+    return chat
+
+
+def import_server(
+    db_latency: float = 0.0005,
+    llm_latency: float = 1.5,
+    spotify_latency: float = 0.15,
+    genius_latency: float = 0.4,
+    audd_latency: float = 0.8,
+    llm_streaming: bool = False,
+    environ: Optional[Dict[str, str]] = None
+):
+    """Import backend/server.py wired to the in-memory database and fake providers"""
+    os.environ.setdefault("MONGO_URL", "mongodb://127.0.0.1:1")
+    os.environ.setdefault("DB_NAME", "perf")
+    os.environ.setdefault("EMERGENT_LLM_KEY", "perf-key")
+    os.environ.setdefault("RECORDINGS_DIR", tempfile.mkdtemp(prefix="perf-recordings-"))
+    os.environ.update(environ or {})
+
+    install_fake_llm(llm_latency, streaming=llm_streaming)
+    if str(BACKEND_DIR) not in sys.path:
+        sys.path.insert(0, str(BACKEND_DIR))
+    server = importlib.import_module("server")
+
+    database = InMemoryDatabase(latency=db_latency)
+    server.db = database
+    server.cache_service.db = database
+    server.cache_service.cache_collection = database.ai_cache
+    server.room_presence.collection = database.room_presence
+
+    music_service = server.music_service
+    music_service.llm_key = "perf-key"
+    music_service.spotify = FakeSpotify(spotify_latency)
+    music_service.genius = FakeGenius(genius_latency)
+    server.improved_music_service.llm_key = "perf-key"
+    server.llm_gateway.api_key = "perf-key"
+
+    async def recognize_audio(audio_file_path: str) -> Dict[str, Any]:
+        await asyncio.sleep(audd_latency)
+        return {"title": "Recognized", "artist": "Perf Artist", "album": "", "release_date": "", "recognition_source": "AUdD"}
+
+    music_service.recognize_audio = recognize_audio
+    return server
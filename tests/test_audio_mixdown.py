@@ -0,0 +1,96 @@
+import asyncio
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend"))
+
+from audio_mixdown import MixdownService, decode_audio, mix_tracks, run_mixdown, write_wav  # noqa: E402
+
+
+def test_mix_tracks_applies_offset_and_gain():
+    first = np.full(4, 0.5, dtype=np.float32)
+    second = np.full(4, 0.2, dtype=np.float32)
+
+    mix = mix_tracks([(first, 0, 1.0), (second, 2, 0.5)])
+
+    np.testing.assert_allclose(mix, [0.5, 0.5, 0.6, 0.6, 0.1, 0.1])
+
+
+def test_mix_tracks_normalizes_only_on_overload():
+    loud = np.full(3, 0.8, dtype=np.float32)
+
+    mix = mix_tracks([(loud, 0, 1.0), (loud, 0, 1.0)])
+    assert float(np.abs(mix).max()) == pytest.approx(1.0)
+
+    quiet = mix_tracks([(loud, 0, 0.5)])
+    np.testing.assert_allclose(quiet, [0.4, 0.4, 0.4])
+
+    assert len(mix_tracks([])) == 0
+
+
+def test_run_mixdown_on_wav_input(tmp_path):
+    sample_rate = 1000
+    write_wav(str(tmp_path / "a.wav"), np.full(1000, 0.5, dtype=np.float32), sample_rate)
+    write_wav(str(tmp_path / "b.wav"), np.full(1000, 0.5, dtype=np.float32), sample_rate)
+
+    result = run_mixdown(
+        [
+            {"path": str(tmp_path / "a.wav"), "start": 100.0, "volume": 1.0},
+            {"path": str(tmp_path / "b.wav"), "start": 100.5, "volume": 0.5},
+            {"path": str(tmp_path / "missing.wav"), "start": 100.0, "volume": 1.0},
+        ],
+        str(tmp_path / "mix.wav"),
+        sample_rate
+    )
+
+    assert result["track_count"] == 2
+    assert [skipped["path"] for skipped in result["skipped"]] == ["missing.wav"]
+
+    mix = decode_audio(str(tmp_path / "mix.wav"), sample_rate)
+    assert len(mix) == 1500
+    assert mix[0] == pytest.approx(0.5, abs=1e-3)
+    assert mix[700] == pytest.approx(0.75, abs=1e-3)
+    assert mix[-1] == pytest.approx(0.25, abs=1e-3)
+
+
+def test_run_mixdown_without_decodable_tracks(tmp_path):
+    with pytest.raises(RuntimeError):
+        run_mixdown([{"path": str(tmp_path / "missing.wav"), "start": 0.0}], str(tmp_path / "mix.wav"))
+
+
+def test_mixdown_service_runs_in_spawned_process(tmp_path):
+    write_wav(str(tmp_path / "a.wav"), np.full(48000, 0.3, dtype=np.float32))
+    recordings = [{"created_at": datetime(2025, 1, 1), "volume": 1.0}]
+
+    async def scenario():
+        service = MixdownService(max_workers=1)
+        try:
+            return await service.mixdown(recordings, [tmp_path / "a.wav"], tmp_path / "mix.wav")
+        finally:
+            service.shutdown()
+
+    result = asyncio.run(scenario())
+    assert result["duration"] == 1
+    assert (tmp_path / "mix.wav").stat().st_size == result["file_size"]
+
+
+def test_mixdown_aligns_by_created_at(tmp_path):
+    write_wav(str(tmp_path / "a.wav"), np.full(48000, 0.3, dtype=np.float32))
+    start = datetime(2025, 1, 1)
+    recordings = [
+        {"created_at": start, "volume": 1.0},
+        {"created_at": start + timedelta(seconds=1), "volume": 1.0},
+    ]
+
+    async def scenario():
+        service = MixdownService(max_workers=1)
+        try:
+            return await service.mixdown(recordings, [tmp_path / "a.wav"] * 2, tmp_path / "mix.wav")
+        finally:
+            service.shutdown()
+
+    assert asyncio.run(scenario())["duration"] == 2
@@ -0,0 +1,67 @@
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend"))
+
+from autocomplete import SongAutocomplete  # noqa: E402
+
+
+def seeded() -> SongAutocomplete:
+    autocomplete = SongAutocomplete()
+    autocomplete.add_many([
+        {"id": "s1", "title": "Garota de Ipanema", "artist": "Tom Jobim", "popularity": 80},
+        {"id": "s2", "title": "Águas de Março", "artist": "Elis Regina", "popularity": 70},
+        {"id": "s3", "title": "Garoto", "artist": "Chico Buarque", "popularity": 20},
+        {"id": "s4", "title": "Yesterday", "artist": "The Beatles", "popularity": 90}
+    ])
+    return autocomplete
+
+
+def titles(suggestions):
+    return [song["title"] for song in suggestions]
+
+
+def test_prefix_matches_title_artist_and_later_words():
+    autocomplete = seeded()
+    assert titles(autocomplete.suggest("gar")) == ["Garota de Ipanema", "Garoto"]
+    assert titles(autocomplete.suggest("ipa")) == ["Garota de Ipanema"]
+    assert titles(autocomplete.suggest("beat")) == ["Yesterday"]
+    # Accents and case fold away, and the query may run into the artist
+    assert titles(autocomplete.suggest("AGUAS DE MARÇO eli")) == ["Águas de Março"]
+    assert autocomplete.suggest("xyz") == []
+    assert autocomplete.suggest("  ") == []
+
+
+def test_ranking_prefers_used_songs_then_popular_ones():
+    autocomplete = seeded()
+    assert titles(autocomplete.suggest("de")) == ["Garota de Ipanema", "Águas de Março"]
+
+    for _ in range(3):
+        autocomplete.record_use({"title": "Garoto", "artist": "Chico Buarque"})
+    suggestions = autocomplete.suggest("gar")
+    assert titles(suggestions) == ["Garoto", "Garota de Ipanema"]
+    assert suggestions[0]["uses"] == 3
+    assert titles(autocomplete.suggest("gar", limit=1)) == ["Garoto"]
+
+
+def test_re_adding_a_song_replaces_it():
+    autocomplete = seeded()
+    autocomplete.add({"id": "s9", "title": "garota de  ipanema", "artist": "TOM JOBIM", "popularity": 10})
+    assert len(autocomplete) == 4
+    assert autocomplete.suggest("ipanema") == [
+        {"id": "s9", "title": "garota de  ipanema", "artist": "TOM JOBIM", "popularity": 10, "uses": 0}
+    ]
+
+
+def test_suggest_stays_fast_on_a_large_catalog():
+    autocomplete = seeded()
+    autocomplete.add_many(
+        {"title": f"Canção {n}", "artist": f"Banda {n % 300}", "popularity": n % 100} for n in range(5000)
+    )
+    start = time.perf_counter()
+    for _ in range(50):
+        suggestions = autocomplete.suggest("can")
+    assert (time.perf_counter() - start) / 50 < 0.02
+    assert len(suggestions) == 8
+    assert all(song["title"].startswith("Canção") for song in suggestions)
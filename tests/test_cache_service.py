@@ -0,0 +1,83 @@
+import asyncio
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend"))
+
+from cache_service import CacheService  # noqa: E402
+
+
+class FakeCollection:
+    """Just enough of a Motor collection for CacheService lookups and writes"""
+
+    name = "ai_cache"
+
+    def __init__(self):
+        self.documents = {}
+
+    async def find_one(self, query):
+        document = self.documents.get(query["cache_key"])
+        if document is None:
+            return None
+        # Mongo returns naive UTC datetimes
+        stored = dict(document)
+        for field in ("created_at", "expires_at"):
+            if field in stored:
+                stored[field] = stored[field].replace(tzinfo=None)
+        return stored
+
+    async def replace_one(self, query, document, upsert=False):
+        self.documents[query["cache_key"]] = document
+
+    async def delete_one(self, query):
+        self.documents.pop(query["cache_key"], None)
+
+
+class FakeDatabase:
+    def __init__(self):
+        self.ai_cache = FakeCollection()
+
+
+def test_lookups_are_counted_per_type():
+    db = FakeDatabase()
+    cache = CacheService(db)
+
+    async def scenario():
+        assert await cache.get_cached_result("stats_test", {"q": "a"}) is None
+        await cache.set_cached_result("stats_test", {"q": "a"}, {"title": "A"})
+        assert await cache.get_cached_result("stats_test", {"q": "a"}) == {"title": "A"}
+
+        # Age the entry past max_age: it is dropped and counted as a stale hit
+        key = cache._generate_cache_key("stats_test", {"q": "a"})
+        db.ai_cache.documents[key]["created_at"] -= timedelta(hours=48)
+        assert await cache.get_cached_result("stats_test", {"q": "a"}, max_age_hours=24) is None
+        assert key not in db.ai_cache.documents
+
+    asyncio.run(scenario())
+    stats = cache.get_live_stats()["stats_test"]["mongo"]
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["stale_hits"] == 1
+    assert stats["expirations"] == 1
+    assert stats["writes"] == 1
+    assert stats["write_bytes"] > 0
+    assert stats["hit_ratio"] == round(1 / 3, 4)
+    assert stats["lookup_p95_seconds"] is not None
+
+
+def test_key_value_entries_expire_after_ttl():
+    db = FakeDatabase()
+    cache = CacheService(db)
+
+    async def scenario():
+        await cache.set("kvtest_abc123", '{"title": "B"}', 60)
+        assert await cache.get("kvtest_abc123") == '{"title": "B"}'
+
+        db.ai_cache.documents["kvtest_abc123"]["expires_at"] = datetime.utcnow() - timedelta(seconds=1)
+        assert await cache.get("kvtest_abc123") is None
+        assert await cache.get("kvtest_missing") is None
+
+    asyncio.run(scenario())
+    stats = cache.get_live_stats()["kvtest"]["mongo"]
+    assert (stats["hits"], stats["stale_hits"], stats["misses"]) == (1, 1, 1)
@@ -0,0 +1,19 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from perf.fanout import format_report, run_fanout_benchmark  # noqa: E402
+
+
+def test_fanout_benchmark_times_every_delivery():
+    rows = run_fanout_benchmark(room_sizes=[3], payload_sizes=[128], broadcasts=3, timeout=5)
+
+    by_event = {row["event"]: row for row in rows}
+    assert set(by_event) == {"playlist_updated", "tempo_changed", "room_sync", "audio_stream"}
+    assert all(row["lost"] == 0 for row in rows)
+    # Server broadcasts reach the whole room; the audio relay skips the sender
+    assert by_event["room_sync"]["deliveries"] == 3 * 3
+    assert by_event["audio_stream"]["deliveries"] == 3 * 2
+    assert all(row["server_cpu_ms_per_broadcast"] > 0 and row["p50_ms"] > 0 for row in rows)
+    assert "audio_stream" in format_report(rows)
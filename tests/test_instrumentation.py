@@ -0,0 +1,68 @@
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend"))
+
+from instrumentation import call_upstream, payload_size, track_upstream, upstream_requests, upstream_summary  # noqa: E402
+
+
+def outcome_count(operation, outcome):
+    return upstream_requests.get(provider="test", operation=operation, outcome=outcome)
+
+
+def test_call_upstream_records_outcomes():
+    async def ok():
+        return {"tracks": ["a", "b"]}
+
+    async def slow():
+        await asyncio.sleep(1)
+
+    async def broken():
+        raise RuntimeError("503")
+
+    async def scenario():
+        assert await call_upstream("test", "search", ok()) == {"tracks": ["a", "b"]}
+        with pytest.raises(asyncio.TimeoutError):
+            await call_upstream("test", "search", slow(), timeout=0.01)
+        with pytest.raises(RuntimeError):
+            await call_upstream("test", "search", broken())
+
+    asyncio.run(scenario())
+    assert outcome_count("search", "ok") == 1
+    assert outcome_count("search", "timeout") == 1
+    assert outcome_count("search", "error") == 1
+
+    summary = next(entry for entry in upstream_summary() if entry["provider"] == "test" and entry["operation"] == "search")
+    assert summary["calls"] == 3
+    assert summary["timeout_rate"] == pytest.approx(1 / 3, abs=1e-3)
+    assert summary["p50_seconds"] is not None
+
+
+def test_track_upstream_marks_cancelled_and_manual_errors():
+    async def scenario():
+        async def sync_style_call():
+            async with track_upstream("test", "lyrics"):
+                await asyncio.sleep(1)
+
+        task = asyncio.create_task(sync_style_call())
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        async with track_upstream("test", "recognize") as call:
+            call.outcome = "error"
+
+    asyncio.run(scenario())
+    assert outcome_count("lyrics", "cancelled") == 1
+    assert outcome_count("recognize", "error") == 1
+
+
+def test_payload_size():
+    assert payload_size(None) == 0
+    assert payload_size(b"abc") == 3
+    assert payload_size("ção") == 5
+    assert payload_size({"a": 1}) == len('{"a": 1}')
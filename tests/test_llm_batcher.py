@@ -0,0 +1,134 @@
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend"))
+
+from llm_batcher import MicroBatcher  # noqa: E402
+from llm_gateway import LLMGateway  # noqa: E402
+from music_services import MusicAPIService  # noqa: E402
+
+
+def test_concurrent_requests_share_one_batch():
+    batches = []
+
+    async def run_batch(items):
+        batches.append(items)
+        return [item * 10 for item in items]
+
+    async def scenario():
+        batcher = MicroBatcher(run_batch, max_batch=10, window=0.01)
+        return await asyncio.gather(*(batcher.submit(n, n) for n in (1, 2, 3, 2)))
+
+    assert asyncio.run(scenario()) == [10, 20, 30, 20]
+    # The repeated key joined the waiting request instead of taking a slot
+    assert batches == [[1, 2, 3]]
+
+
+def test_full_batch_is_sent_without_waiting_for_the_window():
+    batches = []
+
+    async def run_batch(items):
+        batches.append(items)
+        return items
+
+    async def scenario():
+        batcher = MicroBatcher(run_batch, max_batch=2, window=10)
+        start = asyncio.get_running_loop().time()
+        await asyncio.gather(batcher.submit("a", "a"), batcher.submit("b", "b"))
+        assert asyncio.get_running_loop().time() - start < 1
+        third = asyncio.create_task(batcher.submit("c", "c"))
+        await asyncio.sleep(0.01)
+        batcher.flush()
+        return await third
+
+    assert asyncio.run(scenario()) == "c"
+    assert batches == [["a", "b"], ["c"]]
+
+
+def test_errors_reach_only_their_callers():
+    async def run_batch(items):
+        return [ValueError(item) if item == "bad" else item for item in items]
+
+    async def failing_batch(items):
+        raise asyncio.TimeoutError()
+
+    async def scenario():
+        batcher = MicroBatcher(run_batch, window=0.01)
+        good, bad = await asyncio.gather(batcher.submit(1, "good"), batcher.submit(2, "bad"), return_exceptions=True)
+        assert good == "good" and isinstance(bad, ValueError)
+
+        batcher = MicroBatcher(failing_batch, window=0.01)
+        results = await asyncio.gather(batcher.submit(1, 1), batcher.submit(2, 2), return_exceptions=True)
+        assert all(isinstance(result, asyncio.TimeoutError) for result in results)
+
+    asyncio.run(scenario())
+
+
+def test_a_caller_giving_up_does_not_cancel_the_others():
+    async def run_batch(items):
+        await asyncio.sleep(0.05)
+        return items
+
+    async def scenario():
+        batcher = MicroBatcher(run_batch, window=0.01)
+        impatient = asyncio.create_task(batcher.submit("k", "v"))
+        patient = asyncio.create_task(batcher.submit("k", "v"))
+        await asyncio.sleep(0.02)
+        impatient.cancel()
+        assert await patient == "v"
+
+    asyncio.run(scenario())
+
+
+class FakeCache:
+    def __init__(self):
+        self.writes = {}
+
+    async def get_cached_result(self, cache_type, data, max_age_hours=24):
+        return self.writes.get((cache_type, data["title"], data["artist"]))
+
+    async def set_cached_result(self, cache_type, data, result):
+        self.writes[(cache_type, data["title"], data["artist"])] = result
+
+
+class FakeChat:
+    def __init__(self, prompts):
+        self.prompts = prompts
+
+    async def send_message(self, text):
+        self.prompts.append(text)
+        if "Músicas:" not in text:
+            return json.dumps({"chords": "G - D", "key": "G", "tempo": 90})
+        # Out of order, one song missing
+        return json.dumps([
+            {"n": 3, "chords": "Am - F", "key": "Am", "tempo": "100 BPM"},
+            {"n": 1, "chords": "C - G", "key": "C", "tempo": 120.0}
+        ])
+
+
+def test_song_fallbacks_are_batched_and_cached_per_song():
+    prompts = []
+    gateway = LLMGateway("key", chat_factory=lambda *args: FakeChat(prompts), message_factory=lambda text: text)
+    cache = FakeCache()
+    service = MusicAPIService(cache_service=cache, llm_gateway=gateway)
+
+    async def scenario():
+        songs = [("Asa Branca", "Luiz Gonzaga"), ("Garota de Ipanema", "Tom Jobim"), ("Aquarela", "Toquinho")]
+        results = await asyncio.gather(*(service._generate_ai_fallback_fast(title, artist, {}) for title, artist in songs))
+        single = await service._generate_ai_fallback_fast("Evidências", "Chitãozinho & Xororó", {})
+        return results, single
+
+    (first, second, third), single = asyncio.run(scenario())
+    assert len(prompts) == 2
+    assert (first["chords"], first["tempo"]) == ("C - G", 120)
+    assert (third["chords"], third["tempo"]) == ("Am - F", 100)
+    # The song the model skipped gets the basic structure and is not cached
+    assert second["chords"] == "C - G - Am - F" and "Garota de Ipanema" in second["lyrics"]
+    assert single["key"] == "G"
+    assert set(cache.writes) == {
+        ("ai_fallback", "asa branca", "luiz gonzaga"),
+        ("ai_fallback", "aquarela", "toquinho"),
+        ("ai_fallback", "evidências", "chitãozinho & xororó")
+    }
@@ -0,0 +1,243 @@
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend"))
+
+from llm_gateway import LLMGateway, LLMOverloaded, TokenBucket  # noqa: E402
+from structured_output import StructuredOutputError  # noqa: E402
+
+
+class FakeChat:
+    def __init__(self, system_message, reply, latency, tracker):
+        self.system_message = system_message
+        self.messages = [{"role": "system", "content": system_message}]
+        self.reply = reply
+        self.latency = latency
+        self.tracker = tracker
+
+    async def send_message(self, text):
+        self.tracker["running"] += 1
+        self.tracker["peak"] = max(self.tracker["peak"], self.tracker["running"])
+        self.messages.append({"role": "user", "content": text})
+        try:
+            await asyncio.sleep(self.latency)
+        finally:
+            self.tracker["running"] -= 1
+        self.tracker["history"].append(len(self.messages))
+        return self.reply(text)
+
+
+def make_gateway(reply=lambda text: "ok", latency=0.0, **kwargs):
+    tracker = {"running": 0, "peak": 0, "history": [], "created": []}
+
+    def chat_factory(api_key, session_id, system_message, provider, model):
+        chat = FakeChat(system_message, reply, latency, tracker)
+        tracker["created"].append((session_id, system_message, model))
+        return chat
+
+    return LLMGateway("key", chat_factory=chat_factory, message_factory=lambda text: text, **kwargs), tracker
+
+
+def test_clients_are_pooled_per_system_prompt_and_rewound():
+    gateway, tracker = make_gateway()
+
+    async def scenario():
+        for _ in range(3):
+            assert await gateway.complete("hi", system_message="A") == "ok"
+        await gateway.complete("hi", system_message="B")
+        await gateway.complete("hi", system_message="A", model="gpt-5-mini")
+
+    asyncio.run(scenario())
+    assert [(system, model) for _, system, model in tracker["created"]] == [("A", "gpt-5"), ("B", "gpt-5"), ("A", "gpt-5-mini")]
+    # Reused clients never see earlier prompts
+    assert tracker["history"] == [2, 2, 2, 2, 2]
+    assert gateway.stats()["idle_clients"] == 3
+
+
+def test_concurrency_is_capped_globally():
+    gateway, tracker = make_gateway(latency=0.02, max_concurrency=3)
+
+    async def scenario():
+        await asyncio.gather(*(gateway.complete("hi", system_message=f"S{n % 2}") for n in range(12)))
+
+    asyncio.run(scenario())
+    assert tracker["peak"] == 3
+    assert gateway.stats()["in_flight"] == 0
+
+
+def test_timeout_covers_queueing_and_releases_slot():
+    gateway, tracker = make_gateway(latency=0.2, max_concurrency=1)
+
+    async def scenario():
+        first = asyncio.create_task(gateway.complete("hi", system_message="A"))
+        await asyncio.sleep(0)
+        with pytest.raises(asyncio.TimeoutError):
+            await gateway.complete("hi", timeout=0.05, system_message="A")
+        await first
+        # The slot is free again
+        assert await gateway.complete("hi", timeout=1, system_message="A") == "ok"
+
+    asyncio.run(scenario())
+
+
+def test_schema_parses_json_replies():
+    replies = {
+        "dict": json.dumps({"key": "G"}),
+        "list": json.dumps([{"title": "x"}]),
+        "fenced": 'Claro!\n```json\n{"key": "D"}\n```',
+        "text": "not json"
+    }
+    gateway, _ = make_gateway(reply=lambda text: replies[text])
+
+    async def scenario():
+        assert await gateway.complete("dict", schema=dict, system_message="A") == {"key": "G"}
+        assert await gateway.complete("list", schema=list, system_message="A") == [{"title": "x"}]
+        assert await gateway.complete("fenced", schema=dict, system_message="A") == {"key": "D"}
+        with pytest.raises(StructuredOutputError):
+            await gateway.complete("dict", schema=list, system_message="A")
+        with pytest.raises(StructuredOutputError):
+            await gateway.complete("text", schema=dict, system_message="A")
+
+    asyncio.run(scenario())
+
+
+def test_waiting_calls_start_by_priority():
+    order = []
+    gateway, _ = make_gateway(reply=lambda text: order.append(text) or text, latency=0.01, max_concurrency=1)
+
+    async def scenario():
+        first = asyncio.create_task(gateway.complete("first", system_message="A"))
+        await asyncio.sleep(0)
+        queued = [
+            asyncio.create_task(gateway.complete(name, system_message="A", priority=priority))
+            for name, priority in (("background", "background"), ("normal", "normal"), ("interactive", "interactive"))
+        ]
+        await asyncio.gather(first, *queued)
+
+    asyncio.run(scenario())
+    assert order == ["first", "interactive", "normal", "background"]
+
+
+def test_background_work_leaves_slots_for_interactive_calls():
+    gateway, _ = make_gateway(latency=0.05, max_concurrency=3, background_slots=1)
+
+    async def scenario():
+        background = [asyncio.create_task(gateway.complete("bg", system_message="A", priority="background")) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        assert gateway.stats()["in_flight"] == 1
+        start = asyncio.get_running_loop().time()
+        await gateway.complete("now", system_message="A", priority="interactive")
+        # Served alongside the background call instead of behind all three
+        assert asyncio.get_running_loop().time() - start < 0.09
+        await asyncio.gather(*background)
+
+    asyncio.run(scenario())
+
+
+def test_token_bucket_refills_at_rate():
+    now = [0.0]
+    bucket = TokenBucket(rate=2, burst=2, clock=lambda: now[0])
+    assert bucket.take() == 0 and bucket.take() == 0
+    assert bucket.take() == 0.5
+    now[0] = 0.5
+    assert bucket.take() == 0
+    assert bucket.wait_for(3) == 1.5
+
+
+def test_rate_limit_spaces_out_calls():
+    gateway, _ = make_gateway(rate_per_second=50, burst=1)
+
+    async def scenario():
+        start = asyncio.get_running_loop().time()
+        await asyncio.gather(*(gateway.complete("hi", system_message="A") for _ in range(4)))
+        return asyncio.get_running_loop().time() - start
+
+    # One token up front, then one every 20ms
+    assert asyncio.run(scenario()) >= 0.055
+
+
+def test_full_queue_preempts_lower_priority_work_and_sheds_the_rest():
+    gateway, _ = make_gateway(latency=0.05, max_concurrency=1, max_queue=2)
+
+    async def scenario():
+        running = asyncio.create_task(gateway.complete("run", system_message="A"))
+        await asyncio.sleep(0)
+        normal = asyncio.create_task(gateway.complete("n", system_message="A"))
+        background = asyncio.create_task(gateway.complete("b", system_message="A", priority="background"))
+        await asyncio.sleep(0)
+
+        interactive = asyncio.create_task(gateway.complete("i", system_message="A", priority="interactive"))
+        await asyncio.sleep(0)
+        with pytest.raises(LLMOverloaded):
+            await background
+        # Nothing queued is lower than normal work now, so another normal call is shed
+        with pytest.raises(LLMOverloaded):
+            await gateway.complete("late", system_message="A")
+        await asyncio.gather(running, normal, interactive)
+
+    asyncio.run(scenario())
+
+
+def test_calls_that_cannot_start_before_their_timeout_are_shed_at_once():
+    gateway, _ = make_gateway(latency=0.2, max_concurrency=1)
+
+    async def scenario():
+        await gateway.complete("warm", system_message="A")
+        running = asyncio.create_task(gateway.complete("run", system_message="A"))
+        await asyncio.sleep(0)
+        start = asyncio.get_running_loop().time()
+        with pytest.raises(LLMOverloaded):
+            await gateway.complete("hi", timeout=0.05, system_message="A", priority="interactive")
+        assert asyncio.get_running_loop().time() - start < 0.02
+        await running
+
+    asyncio.run(scenario())
+
+
+class StreamingChat(FakeChat):
+    async def stream_message(self, text):
+        self.messages.append({"role": "user", "content": text})
+        for piece in ("Song 1 - A\n", "Song 2", " - B\n"):
+            await asyncio.sleep(self.latency)
+            yield piece
+
+
+def test_stream_yields_pieces_as_they_arrive():
+    tracker = {"running": 0, "peak": 0, "history": [], "created": []}
+    gateway = LLMGateway(
+        "key",
+        chat_factory=lambda *args: StreamingChat("A", None, 0.02, tracker),
+        message_factory=lambda text: text
+    )
+
+    async def scenario():
+        arrivals = []
+        start = asyncio.get_running_loop().time()
+        async for piece in gateway.stream("hi", system_message="A"):
+            arrivals.append((piece, asyncio.get_running_loop().time() - start))
+        return arrivals
+
+    arrivals = asyncio.run(scenario())
+    assert "".join(piece for piece, _ in arrivals) == "Song 1 - A\nSong 2 - B\n"
+    assert arrivals[0][1] < arrivals[-1][1]
+    assert gateway.stats()["in_flight"] == 0
+    assert gateway.stats()["provider_streaming"] is True
+
+
+def test_stream_without_provider_streaming_and_timeouts():
+    gateway, _ = make_gateway(reply=lambda text: "whole reply", latency=0.1)
+
+    async def scenario():
+        assert gateway.stats()["provider_streaming"] is None
+        assert [piece async for piece in gateway.stream("hi", system_message="A")] == ["whole reply"]
+        assert gateway.stats()["provider_streaming"] is False
+        with pytest.raises(asyncio.TimeoutError):
+            async for _ in gateway.stream("hi", timeout=0.02, system_message="A"):
+                pass
+        assert gateway.stats()["in_flight"] == 0
+
+    asyncio.run(scenario())
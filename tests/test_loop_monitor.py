@@ -0,0 +1,54 @@
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend"))
+
+from loop_monitor import LoopMonitor  # noqa: E402
+from metrics import label_current_task  # noqa: E402
+
+
+def blocking_lookup():
+    time.sleep(0.4)
+
+
+def test_blocking_call_is_reported_with_its_label():
+    monitor = LoopMonitor(interval=0.05, threshold=0.1)
+
+    async def handler():
+        label_current_task("GET /api/songs/search")
+        await asyncio.sleep(0.1)
+        blocking_lookup()
+
+    async def scenario():
+        monitor.start()
+        await asyncio.sleep(0.1)
+        await asyncio.create_task(handler())
+        await asyncio.sleep(0.1)
+        monitor.stop()
+
+    asyncio.run(scenario())
+    stats = monitor.stats()
+    assert not stats["enabled"]
+    assert stats["lag_ms"]["max"] >= 200
+
+    event = stats["blocking_events"][0]
+    assert event["label"] == "GET /api/songs/search"
+    assert event["coroutine"].endswith("handler")
+    assert "blocking_lookup" in event["stack"]
+
+
+def test_idle_loop_reports_nothing():
+    monitor = LoopMonitor(interval=0.02, threshold=0.2)
+
+    async def scenario():
+        monitor.start()
+        monitor.start()  # already running: no second sampler
+        await asyncio.sleep(0.2)
+        monitor.stop()
+
+    asyncio.run(scenario())
+    stats = monitor.stats()
+    assert stats["samples"] > 0
+    assert stats["blocking_events"] == []
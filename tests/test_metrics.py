@@ -0,0 +1,84 @@
+import asyncio
+import sys
+from pathlib import Path
+
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend"))
+
+import metrics  # noqa: E402
+from metrics import MetricsMiddleware, MetricsRegistry, instrument_socketio  # noqa: E402
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = MetricsRegistry()
+    latency = registry.histogram("op_seconds", "Operation latency", ("op",), buckets=(0.1, 1.0))
+    latency.observe(0.05, op="a")
+    latency.observe(0.5, op="a")
+    latency.observe(5, op="a")
+
+    text = registry.render()
+    assert "# TYPE op_seconds histogram" in text
+    assert 'op_seconds_bucket{op="a",le="0.1"} 1' in text
+    assert 'op_seconds_bucket{op="a",le="1"} 2' in text
+    assert 'op_seconds_bucket{op="a",le="+Inf"} 3' in text
+    assert 'op_seconds_count{op="a"} 3' in text
+    assert latency.quantile(0.5, op="a") == 1.0
+    assert latency.quantile(0.5, op="missing") is None
+
+
+def test_registry_reuses_metrics_and_escapes_labels():
+    registry = MetricsRegistry()
+    counter = registry.counter("calls_total", "Calls", ("name",))
+    assert registry.counter("calls_total", "Calls", ("name",)) is counter
+    counter.inc(name='say "hi"')
+    assert 'calls_total{name="say \\"hi\\""} 1' in registry.render()
+
+
+def test_middleware_labels_requests_by_route_template():
+    app = FastAPI()
+
+    @app.get("/rooms/{room_id}")
+    async def get_room(room_id: str):
+        if room_id == "missing":
+            raise HTTPException(status_code=404)
+        return {"id": room_id}
+
+    app.add_middleware(MetricsMiddleware)
+    client = TestClient(app)
+    before = metrics.http_requests.get(method="GET", route="/rooms/{room_id}", status="200")
+
+    client.get("/rooms/a")
+    client.get("/rooms/b")
+    client.get("/rooms/missing")
+    client.get("/nowhere")
+
+    assert metrics.http_requests.get(method="GET", route="/rooms/{room_id}", status="200") == before + 2
+    assert metrics.http_requests.get(method="GET", route="/rooms/{room_id}", status="404") >= 1
+    assert metrics.http_requests.get(method="GET", route="unmatched", status="404") >= 1
+    assert metrics.http_latency.count(method="GET", route="/rooms/{room_id}") >= 3
+    assert metrics.http_in_flight.get(method="GET") == 0
+
+
+def test_socketio_events_are_counted():
+    class FakeServer:
+        async def _trigger_event(self, event, namespace, *args):
+            if event == "boom":
+                raise RuntimeError("handler failed")
+            return "ok"
+
+    sio = FakeServer()
+    instrument_socketio(sio)
+
+    async def scenario():
+        assert await sio._trigger_event("join_room", "/", "sid", {}) == "ok"
+        try:
+            await sio._trigger_event("boom", "/", "sid")
+        except RuntimeError:
+            pass
+
+    before = metrics.socketio_events.get(event="join_room", outcome="ok")
+    asyncio.run(scenario())
+    assert metrics.socketio_events.get(event="join_room", outcome="ok") == before + 1
+    assert metrics.socketio_events.get(event="boom", outcome="error") >= 1
@@ -0,0 +1,29 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from perf.microbench import build_cases, compare, load_baselines, measure, save_baselines  # noqa: E402
+
+
+def test_cases_exercise_realistic_paths():
+    cases = build_cases()
+    # Every case has a recorded baseline, so a new case cannot slip in unmeasured
+    assert set(cases) <= set(load_baselines())
+
+    assert len(cases["_parse_ai_repertoire_response 15 lines"]()) == 10
+    assert cases["_search_local_database 5k miss"]() is None
+    assert cases["_search_local_database 5k late hit"]()["source"] == "local_database"
+    assert cases["calculate_transition_chords same key"]() == ["C", "G7", "C"]
+    assert "E  B/D#  C#m7  Amaj7" in cases["transpose_chords_string full chart"]()
+
+
+def test_measure_reports_microseconds_per_call():
+    assert 0 < measure(lambda: sum(range(10)), repeat=3, min_time=0.01) < 1000
+
+
+def test_compare_flags_regressions_beyond_tolerance(tmp_path):
+    path = tmp_path / "baselines.json"
+    save_baselines({"fast": 10.0, "slow": 10.0, "steady": 10.0}, path)
+    rows = compare({"fast": 5.0, "slow": 13.0, "steady": 11.0, "added": 1.0}, load_baselines(path), tolerance=0.25)
+    assert {row["case"]: row["status"] for row in rows} == {"fast": "faster", "slow": "REGRESSION", "steady": "ok", "added": "new"}
@@ -0,0 +1,56 @@
+import asyncio
+import re
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from perf.load_test import run_load_test  # noqa: E402
+from perf.stubs import InMemoryDatabase  # noqa: E402
+
+
+def test_in_memory_database_behaves_like_mongo():
+    db = InMemoryDatabase(latency=0)
+
+    async def scenario():
+        await db.songs.insert_one({"id": "1", "title": "Wonderwall", "tags": ["rock"], "plays": 1, "at": datetime.now(timezone.utc)})
+        await db.songs.insert_one({"id": "2", "title": "Aquarela", "tags": ["mpb"], "plays": 5})
+
+        found = await db.songs.find_one({"title": {"$regex": "^wonderwall$", "$options": "i"}})
+        assert found["id"] == "1"
+        assert "_id" in found
+        # Datetimes come back naive, as from a real server
+        assert found["at"].tzinfo is None
+        assert (await db.songs.find_one({"title": re.compile("arel")}))["id"] == "2"
+        assert await db.songs.count_documents({"tags": "rock"}) == 1
+        assert await db.songs.count_documents({"plays": {"$gt": 2}}) == 1
+
+        await db.songs.update_one({"id": "1"}, {"$set": {"key": "G"}, "$inc": {"plays": 2}, "$push": {"tags": "90s"}})
+        updated = await db.songs.find_one({"id": "1"})
+        assert (updated["key"], updated["plays"], updated["tags"]) == ("G", 3, ["rock", "90s"])
+
+        await db.songs.update_one({"id": "3"}, {"$set": {"title": "New"}}, upsert=True)
+        ordered = await db.songs.find({}).sort("plays", -1).limit(2).to_list(10)
+        assert [song["id"] for song in ordered] == ["2", "1"]
+
+        grouped = await db.songs.aggregate([{"$group": {"_id": None, "bytes": {"$sum": {"$bsonSize": "$$ROOT"}}}}]).to_list(None)
+        assert grouped[0]["bytes"] > 0
+        stats = await db.command("collStats", "songs")
+        assert stats["count"] == 3
+
+        assert (await db.songs.delete_one({"id": "3"})).deleted_count == 1
+        assert await db.songs.find_one({"id": "3"}) is None
+
+    asyncio.run(scenario())
+
+
+def test_load_test_smoke():
+    rows = asyncio.run(run_load_test(
+        users=3, room_size=3, duration=1.0, think_time=0.01,
+        llm_latency=0.01, spotify_latency=0.001, genius_latency=0.001
+    ))
+    by_operation = {row["operation"]: row for row in rows}
+    assert sum(row["count"] for row in rows) > 10
+    assert all(row["errors"] == 0 for row in rows), rows
+    assert by_operation["GET /api/rooms/{room_id}"]["p50_ms"] is not None
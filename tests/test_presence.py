@@ -0,0 +1,102 @@
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend"))
+
+from perf.stubs import InMemoryDatabase  # noqa: E402
+from presence import PresenceRegistry, RoomPresence  # noqa: E402
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_disconnect_returns_the_rooms_of_the_connection():
+    presence = PresenceRegistry()
+    presence.connect("sid-1", "user-1", "Ana")
+    presence.connect("sid-2", "user-1", "Ana")
+    assert presence.join("sid-1", "room-1") is True
+    assert presence.join("sid-1", "room-1") is False
+    presence.join("sid-1", "room-2")
+    assert presence.leave("sid-1", "room-2") is True
+    assert presence.leave("sid-1", "room-2") is False
+
+    connection, rooms = presence.disconnect("sid-1")
+    assert connection.user_id == "user-1"
+    assert rooms == ["room-1"]
+    assert presence.get("sid-1") is None
+    assert presence.user_sids == {"user-1": {"sid-2"}}
+
+    assert presence.disconnect("sid-1") == (None, [])
+
+
+def test_unknown_sid_cannot_join():
+    presence = PresenceRegistry()
+    assert presence.join("ghost", "room-1") is False
+    assert presence.heartbeat("ghost") is False
+
+
+def test_stale_sids_follow_heartbeats(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr("presence.time.monotonic", lambda: clock[0])
+
+    presence = PresenceRegistry(heartbeat_timeout=90)
+    presence.connect("sid-1", "user-1", "Ana")
+    presence.connect("sid-2", "user-2", "Bruno")
+
+    clock[0] += 60
+    presence.heartbeat("sid-2")
+    clock[0] += 60
+    assert presence.stale_sids() == ["sid-1"]
+
+
+def test_workers_sharing_the_store_see_one_presence():
+    collection = InMemoryDatabase().room_presence
+    # Two workers, each with its own RoomPresence over the same collection
+    first, second = RoomPresence(collection), RoomPresence(collection)
+
+    async def scenario():
+        assert await first.join("room-1", "user-1", "Ana", "sid-a") is True
+        # Ana's second tablet is served by the other worker: no second announcement
+        assert await second.join("room-1", "user-1", "Ana", "sid-b") is False
+        assert await second.join("room-1", "user-2", "Bruno", "sid-c") is True
+        assert await first.online_users("room-1") == await second.online_users("room-1") == [
+            {"user_id": "user-1", "user_name": "Ana"},
+            {"user_id": "user-2", "user_name": "Bruno"}
+        ]
+
+        assert await first.leave("room-1", "user-1", "sid-a") is False
+        assert await second.leave("room-1", "user-1", "sid-b") is True
+        assert await first.online_users("room-1") == [{"user_id": "user-2", "user_name": "Bruno"}]
+        assert await first.online_users("room-2") == []
+
+    asyncio.run(scenario())
+
+
+def test_users_of_a_dead_worker_are_reaped_once():
+    clock = FakeClock()
+    collection = InMemoryDatabase().room_presence
+    live, other = RoomPresence(collection, heartbeat_timeout=90, clock=clock), RoomPresence(collection, heartbeat_timeout=90, clock=clock)
+
+    async def scenario():
+        await live.join("room-1", "user-1", "Ana", "sid-a")
+        # Bruno's worker dies without disconnecting him
+        await other.join("room-1", "user-2", "Bruno", "sid-b")
+        clock.now += 60
+        await live.heartbeat("user-1", "sid-a", ["room-1"])
+        clock.now += 60
+
+        online = await live.online_users("room-1")
+        gone = await live.reap(), await other.reap()
+        return online, gone, await other.online_users("room-1")
+
+    online, gone, after = asyncio.run(scenario())
+    assert online == [{"user_id": "user-1", "user_name": "Ana"}]
+    assert gone == ([("room-1", "user-2")], [])
+    assert after == [{"user_id": "user-1", "user_name": "Ana"}]
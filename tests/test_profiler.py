@@ -0,0 +1,49 @@
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend"))
+
+from metrics import label_current_task  # noqa: E402
+from profiler import ProfilerBusy, SamplingProfiler  # noqa: E402
+
+
+def transpose_everything():
+    end = time.monotonic() + 0.3
+    while time.monotonic() < end:
+        sum(range(1000))
+
+
+def test_profile_collapses_stacks_for_one_route():
+    profiler = SamplingProfiler(interval=0.005)
+
+    async def hot_handler():
+        label_current_task("POST /api/transpose")
+        await asyncio.sleep(0.05)
+        transpose_everything()
+
+    async def other_handler():
+        label_current_task("GET /api/rooms")
+        await asyncio.sleep(0.4)
+
+    async def scenario():
+        profile = asyncio.create_task(profiler.profile(0.5, label_filter="/api/transpose"))
+        await asyncio.sleep(0.01)
+        with pytest.raises(ProfilerBusy):
+            await profiler.profile(0.1)
+        await asyncio.gather(hot_handler(), other_handler())
+        return await profile
+
+    result = asyncio.run(scenario())
+    assert result["samples"] > 10
+    lines = result["collapsed"].splitlines()
+    assert lines
+    for line in lines:
+        stack, count = line.rsplit(" ", 1)
+        assert int(count) > 0
+        assert stack.startswith("loop;POST /api/transpose;")
+    assert any("transpose_everything" in line for line in lines)
+    assert not any("GET /api/rooms" in line for line in lines)
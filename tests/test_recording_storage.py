@@ -0,0 +1,226 @@
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend"))
+
+from recording_storage import RecordingStorage  # noqa: E402
+
+
+def test_only_one_worker_owns_a_recording(tmp_path):
+    worker_a = RecordingStorage(tmp_path)
+    worker_b = RecordingStorage(tmp_path)
+    worker_b.worker_id = "other-host:1"
+
+    assert worker_a.claim("take.webm")
+    assert worker_a.claim("take.webm")
+    assert not worker_b.claim("take.webm")
+    assert worker_b.is_live("rec-1", "take.webm")
+
+
+def test_stale_owner_claim_is_taken_over(tmp_path):
+    storage = RecordingStorage(tmp_path)
+    host = storage.worker_id.rpartition(":")[0]
+    (tmp_path / "take.webm.owner").write_text(f"{host}:999999999")
+
+    assert storage.claim("take.webm")
+    assert storage.owner_of("take.webm") == storage.worker_id
+
+
+def test_stop_on_another_worker_is_finalized_by_owner(tmp_path):
+    async def scenario():
+        owner = RecordingStorage(tmp_path)
+        other = RecordingStorage(tmp_path)
+        other.worker_id = "other-host:1"
+
+        assert owner.claim("take.webm")
+        owner.open("rec-1", "take.webm")
+        await owner.append_chunk("rec-1", b"audio", 0)
+
+        # stop_recording handled by a worker that has no writer for the take
+        assert await other.finalize("rec-1") is None
+        other.request_stop("take.webm")
+
+        finalized = {}
+
+        async def on_finalized(recording_id, size):
+            finalized[recording_id] = size
+
+        await owner.reap(on_finalized)
+
+        assert finalized == {"rec-1": 5}
+        assert (tmp_path / "take.webm").read_bytes() == b"audio"
+        assert owner.owner_of("take.webm") is None
+        assert not (tmp_path / "take.webm.stop").exists()
+
+    asyncio.run(scenario())
+
+
+def test_stop_without_a_live_owner_leaves_no_markers(tmp_path):
+    storage = RecordingStorage(tmp_path)
+    assert storage.request_stop("take.webm") is False
+
+    host = storage.worker_id.rpartition(":")[0]
+    (tmp_path / "gone.webm.owner").write_text(f"{host}:999999999")
+    assert storage.request_stop("gone.webm") is False
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_delete_removes_the_file_and_its_markers(tmp_path):
+    storage = RecordingStorage(tmp_path)
+    (tmp_path / "take.webm").write_bytes(b"audio")
+    (tmp_path / "take.webm.owner").write_text("other-host:1")
+    (tmp_path / "take.webm.stop").touch()
+
+    storage.delete("take.webm")
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_delete_on_another_worker_is_carried_out_by_owner(tmp_path):
+    async def scenario():
+        owner = RecordingStorage(tmp_path)
+        other = RecordingStorage(tmp_path)
+        other.worker_id = "other-host:1"
+
+        assert owner.claim("take.webm")
+        owner.open("rec-1", "take.webm")
+        await owner.append_chunk("rec-1", b"audio", 0)
+
+        assert other.request_stop("take.webm", delete=True) is True
+        finalized = {}
+
+        async def on_finalized(recording_id, size):
+            finalized[recording_id] = size
+
+        await owner.reap(on_finalized)
+        assert finalized == {}
+        assert owner.get_writer("rec-1") is None
+        assert list(tmp_path.iterdir()) == []
+
+    asyncio.run(scenario())
+
+
+def test_chunks_are_written_in_index_order(tmp_path):
+    async def scenario():
+        storage = RecordingStorage(tmp_path, flush_bytes=1)
+        storage.open("rec-1", "take.webm")
+
+        assert await storage.append_chunk("rec-1", b"BB", 1) == "received"
+        assert (tmp_path / "take.webm").exists() is False
+        assert await storage.append_chunk("rec-1", b"AA", 0) == "received"
+        assert await storage.append_chunk("rec-1", b"CC", 2) == "received"
+        assert (tmp_path / "take.webm").read_bytes() == b"AABBCC"
+
+        assert await storage.finalize("rec-1") == 6
+
+    asyncio.run(scenario())
+
+
+def test_duplicate_and_late_chunks_are_reported(tmp_path):
+    async def scenario():
+        storage = RecordingStorage(tmp_path)
+        writer = storage.open("rec-1", "take.webm")
+
+        assert await storage.append_chunk("rec-1", b"AA", 0) == "received"
+        assert await storage.append_chunk("rec-1", b"AA", 0) == "duplicate"
+        assert await storage.append_chunk("rec-1", b"CC", 2) == "received"
+        assert await storage.append_chunk("rec-1", b"CC", 2) == "duplicate"
+
+        await writer.finalize()
+        assert await writer.write_chunk(b"DD", 3) == "rejected"
+
+    asyncio.run(scenario())
+
+
+def test_missing_chunks_are_skipped_when_pending_overflows(tmp_path):
+    async def scenario():
+        storage = RecordingStorage(tmp_path, flush_bytes=1, max_pending_chunks=2)
+        writer = storage.open("rec-1", "take.webm")
+
+        for index in (1, 2, 3):
+            await storage.append_chunk("rec-1", bytes([index]), index)
+
+        # Chunk 0 never arrived: the writer moves on instead of holding 1..3
+        assert writer.pending == {}
+        assert (tmp_path / "take.webm").read_bytes() == b"\x01\x02\x03"
+        assert await storage.append_chunk("rec-1", b"\x00", 0) == "duplicate"
+
+    asyncio.run(scenario())
+
+
+def test_pending_is_capped_in_bytes(tmp_path):
+    async def scenario():
+        storage = RecordingStorage(tmp_path, flush_bytes=1, max_pending_bytes=10)
+        writer = storage.open("rec-1", "take.webm")
+
+        await storage.append_chunk("rec-1", b"x" * 6, 1)
+        assert writer.pending_bytes == 6
+        await storage.append_chunk("rec-1", b"y" * 6, 2)
+
+        assert writer.pending_bytes == 0
+        assert (tmp_path / "take.webm").read_bytes() == b"x" * 6 + b"y" * 6
+
+    asyncio.run(scenario())
+
+
+def test_reopened_recording_continues_from_first_arriving_index(tmp_path):
+    async def scenario():
+        (tmp_path / "take.webm").write_bytes(b"earlier")
+        storage = RecordingStorage(tmp_path, flush_bytes=1)
+        writer = storage.open("rec-1", "take.webm")
+
+        for index in range(100, 150):
+            await storage.append_chunk("rec-1", b"z", index)
+
+        assert writer.pending == {}
+        assert (tmp_path / "take.webm").read_bytes() == b"earlier" + b"z" * 50
+
+    asyncio.run(scenario())
+
+
+def test_gaps_are_flushed_on_finalize(tmp_path):
+    async def scenario():
+        storage = RecordingStorage(tmp_path, fsync_policy="finalize")
+        storage.open("rec-1", "take.webm")
+
+        await storage.append_chunk("rec-1", b"AA", 0)
+        await storage.append_chunk("rec-1", b"CC", 2)
+
+        assert await storage.finalize("rec-1") == 4
+        assert (tmp_path / "take.webm").read_bytes() == b"AACC"
+        assert storage.get_writer("rec-1") is None
+
+    asyncio.run(scenario())
+
+
+def test_fsync_policy(tmp_path, monkeypatch):
+    synced = []
+    monkeypatch.setattr("recording_storage.os.fsync", synced.append)
+
+    async def scenario(policy):
+        synced.clear()
+        storage = RecordingStorage(tmp_path / policy, flush_bytes=1, fsync_policy=policy)
+        storage.open("rec-1", "take.webm")
+        await storage.append_chunk("rec-1", b"AA", 0)
+        await storage.append_chunk("rec-1", b"BB", 1)
+        during = len(synced)
+        await storage.finalize("rec-1")
+        return during, len(synced)
+
+    assert asyncio.run(scenario("always")) == (2, 3)
+    assert asyncio.run(scenario("finalize")) == (0, 1)
+    assert asyncio.run(scenario("never")) == (0, 0)
+
+
+def test_invalid_fsync_policy(tmp_path):
+    with pytest.raises(ValueError):
+        RecordingStorage(tmp_path, fsync_policy="sometimes")
+
+
+def test_decode_chunk_formats():
+    assert RecordingStorage.decode_chunk(b"ab") == b"ab"
+    assert RecordingStorage.decode_chunk("YWI=") == b"ab"
+    assert RecordingStorage.decode_chunk("data:audio/webm;base64,YWI=") == b"ab"
+    assert RecordingStorage.decode_chunk([97, 98]) == b"ab"
@@ -0,0 +1,158 @@
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+import httpx
+import pytest
+from starlette.applications import Starlette
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend"))
+
+from recording_storage import RecordingStorage  # noqa: E402
+from recording_streaming import RangeFileResponse, RangeNotSatisfiable, parse_range_header  # noqa: E402
+
+
+def test_parse_range_header():
+    assert parse_range_header(None, 100) is None
+    assert parse_range_header("bytes=10-19", 100) == (10, 19)
+    assert parse_range_header("bytes=90-", 100) == (90, 99)
+    assert parse_range_header("bytes=-5", 100) == (95, 99)
+    assert parse_range_header("bytes=-500", 100) == (0, 99)
+    assert parse_range_header("bytes=50-500", 100) == (50, 99)
+    # Multi-range and malformed headers fall back to the full body
+    assert parse_range_header("bytes=0-1,5-6", 100) is None
+    assert parse_range_header("items=0-1", 100) is None
+    assert parse_range_header("bytes=abc", 100) is None
+
+    for header in ("bytes=100-", "bytes=20-10", "bytes=-0"):
+        with pytest.raises(RangeNotSatisfiable):
+            parse_range_header(header, 100)
+
+
+@pytest.fixture
+def client(tmp_path):
+    path = tmp_path / "take.webm"
+    path.write_bytes(bytes(range(200)))
+
+    async def endpoint(request):
+        return RangeFileResponse(
+            path,
+            range_header=request.headers.get("range"),
+            if_range=request.headers.get("if-range"),
+            if_none_match=request.headers.get("if-none-match")
+        )
+
+    return TestClient(Starlette(routes=[Route("/take", endpoint, methods=["GET", "HEAD"])]))
+
+
+def test_full_and_partial_responses(client):
+    response = client.get("/take")
+    assert response.status_code == 200
+    assert response.content == bytes(range(200))
+    assert response.headers["accept-ranges"] == "bytes"
+    assert response.headers["content-type"] == "audio/webm"
+
+    response = client.get("/take", headers={"Range": "bytes=10-19"})
+    assert response.status_code == 206
+    assert response.content == bytes(range(10, 20))
+    assert response.headers["content-range"] == "bytes 10-19/200"
+    assert response.headers["content-length"] == "10"
+
+    response = client.get("/take", headers={"Range": "bytes=500-"})
+    assert response.status_code == 416
+    assert response.headers["content-range"] == "bytes */200"
+
+    response = client.head("/take")
+    assert response.headers["content-length"] == "200"
+    assert response.content == b""
+
+
+def test_conditional_requests(client):
+    etag = client.get("/take").headers["etag"]
+
+    assert client.get("/take", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get("/take", headers={"Range": "bytes=0-1", "If-Range": etag}).status_code == 206
+    # A stale validator turns the range request into a full response
+    response = client.get("/take", headers={"Range": "bytes=0-1", "If-Range": '"stale"'})
+    assert response.status_code == 200
+    assert len(response.content) == 200
+
+
+def test_live_take_is_followed_until_finalized(tmp_path):
+    async def scenario():
+        storage = RecordingStorage(tmp_path, flush_bytes=1)
+        storage.open("rec-1", "take.webm")
+        await storage.append_chunk("rec-1", b"abc", 0)
+
+        async def endpoint(request):
+            return RangeFileResponse(
+                storage.path_for("take.webm"),
+                range_header=request.headers.get("range"),
+                is_live=lambda: storage.is_live("rec-1")
+            )
+
+        async def record():
+            for index in range(1, 4):
+                await asyncio.sleep(0.3)
+                await storage.append_chunk("rec-1", f"X{index}".encode(), index)
+            await storage.finalize("rec-1")
+
+        transport = httpx.ASGITransport(app=Starlette(routes=[Route("/take", endpoint)]))
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            recorder = asyncio.create_task(record())
+            response = await http.get("/take")
+            await recorder
+
+        assert response.status_code == 200
+        assert "content-length" not in response.headers
+        assert "etag" not in response.headers
+        assert response.content == b"abcX1X2X3"
+
+    asyncio.run(scenario())
+
+
+def live_response(path, **kwargs):
+    path.write_bytes(b"abc")
+    return RangeFileResponse(path, is_live=lambda: True, **kwargs)
+
+
+def test_live_follow_stops_on_client_disconnect(tmp_path):
+    async def scenario():
+        sent = []
+
+        async def receive():
+            await asyncio.sleep(0.3)
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            sent.append(message)
+
+        started = time.monotonic()
+        response = live_response(tmp_path / "take.webm")
+        await asyncio.wait_for(response({"type": "http", "method": "GET"}, receive, send), timeout=5)
+
+        assert time.monotonic() - started < 2
+        assert sent[1]["body"] == b"abc"
+
+    asyncio.run(scenario())
+
+
+def test_live_follow_is_capped(tmp_path):
+    async def scenario():
+        sent = []
+
+        async def receive():
+            await asyncio.Event().wait()
+
+        async def send(message):
+            sent.append(message)
+
+        response = live_response(tmp_path / "take.webm", max_follow_time=0.3)
+        await asyncio.wait_for(response({"type": "http", "method": "GET"}, receive, send), timeout=5)
+
+        assert sent[-1] == {"type": "http.response.body", "body": b"", "more_body": False}
+
+    asyncio.run(scenario())
@@ -0,0 +1,44 @@
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend"))
+
+from repertoire_stream import parse_repertoire_line, sse_event, stream_repertoire_songs  # noqa: E402
+
+
+def test_parse_repertoire_line():
+    assert parse_repertoire_line('  "Tempo Perdido" - Legião Urbana - 5min') == {
+        "title": "Tempo Perdido",
+        "artist": "Legião Urbana",
+        "duration": "5min",
+        "original_line": '"Tempo Perdido" - Legião Urbana - 5min'
+    }
+    assert parse_repertoire_line("Wonderwall - Oasis")["duration"] == "3min"
+    assert parse_repertoire_line("Aqui está o repertório:") is None
+
+
+def test_songs_are_yielded_as_soon_as_their_line_completes():
+    reply = "Tempo Perdido - Legião Urbana - 5min\nAquarela - Toquinho - 4min\nLet It Be - The Beatles - 4min"
+    seen = []
+
+    async def pieces():
+        # Arbitrary chunk boundaries, as tokens arrive from the provider
+        for start in range(0, len(reply), 7):
+            seen.append(reply[:start + 7])
+            yield reply[start:start + 7]
+
+    async def scenario():
+        songs = []
+        async for song in stream_repertoire_songs(pieces()):
+            songs.append((song["title"], len(seen[-1])))
+        return songs
+
+    songs = asyncio.run(scenario())
+    assert [title for title, _ in songs] == ["Tempo Perdido", "Aquarela", "Let It Be"]
+    # The first song was out before the rest of the reply had been read
+    assert songs[0][1] < len(reply) // 2
+
+
+def test_sse_event_format():
+    assert sse_event("song", {"index": 0}) == 'event: song\ndata: {"index": 0}\n\n'
@@ -0,0 +1,230 @@
+import asyncio
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend"))
+
+from instrumentation import upstream_requests, upstream_summary  # noqa: E402
+from music_services import MusicAPIService  # noqa: E402
+from resilience import Bulkhead, BulkheadFull, CircuitBreaker, CircuitOpen, ProviderGuard  # noqa: E402
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_breaker_opens_after_consecutive_failures_and_probes_once():
+    clock = FakeClock()
+    breaker = CircuitBreaker("spotify", failure_threshold=3, reset_timeout=30, clock=clock)
+    for _ in range(2):
+        assert breaker.allow()
+        breaker.record_failure()
+    breaker.record_success()
+    # A success resets the streak
+    for _ in range(3):
+        assert breaker.allow()
+        breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+
+    clock.now = 30
+    assert breaker.allow()
+    # Only one probe at a time while half-open
+    assert breaker.state == "half_open" and not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+
+    clock.now = 60
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow()
+
+
+def test_timeouts_open_the_circuit_and_then_cost_nothing():
+    calls = []
+    guard = ProviderGuard("genius", timeout=0.05, breaker=CircuitBreaker("genius", failure_threshold=2, reset_timeout=60))
+
+    async def slow():
+        calls.append(1)
+        await asyncio.sleep(1)
+
+    async def scenario():
+        for _ in range(2):
+            with pytest.raises(asyncio.TimeoutError):
+                await guard.call("search_song", slow)
+        start = time.perf_counter()
+        with pytest.raises(CircuitOpen):
+            await guard.call("search_song", slow)
+        return time.perf_counter() - start
+
+    assert asyncio.run(scenario()) < 0.01
+    assert len(calls) == 2
+    assert guard.health()["state"] == "open"
+
+
+def test_errors_are_raised_and_counted():
+    guard = ProviderGuard("spotify", timeout=1.0, breaker=CircuitBreaker("spotify", failure_threshold=1))
+
+    async def broken():
+        raise ValueError("bad credentials")
+
+    async def scenario():
+        with pytest.raises(ValueError):
+            await guard.call("search", broken)
+        with pytest.raises(CircuitOpen):
+            await guard.call("search", broken)
+
+    asyncio.run(scenario())
+
+
+def test_slow_attempt_is_hedged_after_the_p95_delay():
+    guard = ProviderGuard("spotify", timeout=2.0, min_samples=5)
+    attempts = []
+
+    async def fast():
+        await asyncio.sleep(0.01)
+        return "warm"
+
+    async def first_slow_then_fast():
+        attempts.append(1)
+        await asyncio.sleep(1.0 if len(attempts) == 1 else 0.01)
+        return f"attempt {len(attempts)}"
+
+    async def scenario():
+        for _ in range(20):
+            await guard.call("search", fast)
+        delay = guard.hedge_delay("search")
+        start = time.perf_counter()
+        result = await guard.call("search", first_slow_then_fast)
+        return delay, result, time.perf_counter() - start
+
+    delay, result, elapsed = asyncio.run(scenario())
+    assert 0.01 <= delay < 0.05
+    assert result == "attempt 2"
+    assert elapsed < 0.2
+    assert guard.health()["hedged_requests"] == 1
+
+
+def test_no_hedge_without_latency_history():
+    guard = ProviderGuard("spotify", timeout=2.0)
+    attempts = []
+
+    async def slow():
+        attempts.append(1)
+        await asyncio.sleep(0.05)
+        return "ok"
+
+    assert asyncio.run(guard.call("search", slow)) == "ok"
+    assert len(attempts) == 1
+
+
+def test_cancelled_probe_lets_the_next_call_probe():
+    clock = FakeClock()
+    breaker = CircuitBreaker("genius", failure_threshold=1, reset_timeout=10, clock=clock)
+    breaker.record_failure()
+    clock.now = 10
+    guard = ProviderGuard("genius", timeout=1.0, breaker=breaker)
+
+    async def quick():
+        return "ok"
+
+    async def scenario():
+        probe = asyncio.create_task(guard.call("search_song", lambda: asyncio.sleep(1)))
+        await asyncio.sleep(0.01)
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+        return await guard.call("search_song", quick)
+
+    assert asyncio.run(scenario()) == "ok"
+    assert breaker.state == "closed"
+
+
+def test_attempts_the_guard_abandons_are_recorded_as_timeouts_and_lost_hedges():
+    guard = ProviderGuard("guarded-outcomes", timeout=0.1, min_samples=5)
+    attempts = []
+
+    async def fast():
+        await asyncio.sleep(0.01)
+
+    async def first_slow_then_fast():
+        attempts.append(1)
+        await asyncio.sleep(1.0 if len(attempts) == 1 else 0.01)
+
+    async def hangs():
+        await asyncio.sleep(1.0)
+
+    async def scenario():
+        for _ in range(20):
+            await guard.call("search", fast)
+        await guard.call("search", first_slow_then_fast)
+        with pytest.raises(asyncio.TimeoutError):
+            await guard.call("search", hangs)
+
+    asyncio.run(scenario())
+    outcomes = {
+        outcome: upstream_requests.get(provider="guarded-outcomes", operation="search", outcome=outcome)
+        for outcome in ("ok", "hedge_lost", "timeout", "cancelled")
+    }
+    # The hung call was hedged too: both of its attempts ran out the deadline
+    assert outcomes == {"ok": 21, "hedge_lost": 1, "timeout": 2, "cancelled": 0}
+    summary = next(row for row in upstream_summary() if row["provider"] == "guarded-outcomes")
+    assert summary["timeout_rate"] > 0 and summary["cancelled_rate"] == 0.0
+
+
+def test_hung_provider_holds_at_most_its_bulkhead_threads():
+    release = threading.Event()
+    bulkhead = Bulkhead("bulkhead-test", threads=1)
+    guard = ProviderGuard("bulkhead-test", timeout=0.05, bulkhead=bulkhead)
+
+    async def scenario():
+        with pytest.raises(asyncio.TimeoutError):
+            await guard.call_blocking("search", lambda: release.wait(5))
+        # The abandoned call still holds the only thread: fail now instead of queueing
+        start = time.perf_counter()
+        with pytest.raises(BulkheadFull):
+            await guard.call_blocking("search", lambda: "queued")
+        refused_in = time.perf_counter() - start
+        busy = bulkhead.busy
+        release.set()
+        for _ in range(100):
+            if bulkhead.busy == 0:
+                break
+            await asyncio.sleep(0.01)
+        return refused_in, busy, await guard.call_blocking("search", lambda: "answered")
+
+    refused_in, busy, answer = asyncio.run(scenario())
+    assert refused_in < 0.01
+    assert busy == 1
+    assert answer == "answered"
+    # A refusal never reached the provider, so it is not an upstream call
+    assert upstream_requests.get(provider="bulkhead-test", operation="search", outcome="error") == 0
+
+
+class FailingGenius:
+    def __init__(self):
+        self.calls = 0
+
+    def search_song(self, title, artist):
+        self.calls += 1
+        raise ConnectionError("Genius is down")
+
+
+def test_failing_genius_is_skipped_once_its_circuit_opens():
+    service = MusicAPIService()
+    service.genius = FailingGenius()
+    service.genius_guard = ProviderGuard("genius", timeout=1.0, breaker=CircuitBreaker("genius", failure_threshold=2, reset_timeout=60))
+
+    async def scenario():
+        return [await service._get_lyrics_genius("Asa Branca", "Luiz Gonzaga") for _ in range(4)]
+
+    assert asyncio.run(scenario()) == [None] * 4
+    assert service.genius.calls == 2
+    assert service.provider_health()[1]["state"] == "open"
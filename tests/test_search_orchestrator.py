@@ -0,0 +1,157 @@
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend"))
+
+from llm_gateway import LLMGateway  # noqa: E402
+from music_services import MusicAPIService  # noqa: E402
+from search_orchestrator import SearchOrchestrator, SearchSource  # noqa: E402
+from song_catalog import SongCatalog  # noqa: E402
+
+
+def source(name, songs, latency=0.0, error=None, calls=None, cancelled=None, **options):
+    async def search(query):
+        if calls is not None:
+            calls.append(name)
+        try:
+            await asyncio.sleep(latency)
+        except asyncio.CancelledError:
+            if cancelled is not None:
+                cancelled.append(name)
+            raise
+        if error:
+            raise error
+        return [{"title": title, "artist": artist} for title, artist in songs]
+    return SearchSource(name, search, **{"timeout": 1.0, **options})
+
+
+def timed_search(orchestrator, query="query"):
+    start = time.perf_counter()
+    results = asyncio.run(orchestrator.search(query))
+    return [(song["title"], song["source"]) for song in results], time.perf_counter() - start
+
+
+def test_sources_run_in_parallel_and_results_are_deduped():
+    orchestrator = SearchOrchestrator([
+        source("catalog", [("Imagine", "John Lennon")]),
+        source("spotify", [("IMAGINE", "john lennon"), ("Imagine", "Ariana Grande")], latency=0.05),
+        source("other", [("Image", "Someone")], latency=0.05)
+    ], enough=10)
+
+    async def scenario():
+        batches = []
+        async for batch in orchestrator.stream("imagine"):
+            batches.append([(song["title"], song["source"]) for song in batch])
+        return batches
+
+    start = time.perf_counter()
+    batches = asyncio.run(scenario())
+    # Both 50 ms sources overlap instead of adding up
+    assert time.perf_counter() - start < 0.09
+    assert batches[0] == [("Imagine", "catalog")]
+    assert sorted(song for batch in batches[1:] for song in batch) == [("Image", "other"), ("Imagine", "spotify")]
+
+
+def test_failing_and_timed_out_sources_do_not_sink_the_search():
+    orchestrator = SearchOrchestrator([
+        source("broken", [], error=RuntimeError("credentials")),
+        source("stuck", [("Never", "Arrives")], latency=5.0, timeout=0.05),
+        source("spotify", [("Yesterday", "The Beatles")], latency=0.01)
+    ])
+    results, elapsed = timed_search(orchestrator)
+    assert results == [("Yesterday", "spotify")]
+    assert elapsed < 0.5
+
+
+def test_speculative_source_is_skipped_when_primaries_are_enough():
+    calls = []
+    orchestrator = SearchOrchestrator([
+        source("spotify", [("A", "x"), ("B", "x"), ("C", "x")], latency=0.02),
+        source("ai", [("D", "y")], calls=calls, speculative=True, delay=0.2)
+    ], enough=3)
+    results, _ = timed_search(orchestrator)
+    assert results == [("A", "spotify"), ("B", "spotify"), ("C", "spotify")]
+    assert calls == []
+
+
+def test_speculative_source_is_cancelled_once_primaries_catch_up():
+    calls, cancelled = [], []
+    orchestrator = SearchOrchestrator([
+        source("spotify", [("A", "x"), ("B", "x"), ("C", "x")], latency=0.1),
+        source("ai", [("D", "y")], latency=1.0, calls=calls, cancelled=cancelled, speculative=True, delay=0.02)
+    ], enough=3)
+    results, elapsed = timed_search(orchestrator)
+    assert [title for title, _ in results] == ["A", "B", "C"]
+    assert calls == cancelled == ["ai"]
+    assert elapsed < 0.5
+
+
+def test_speculative_source_starts_early_when_primaries_come_up_short():
+    orchestrator = SearchOrchestrator([
+        source("catalog", [("Garota de Ipanema", "Tom Jobim")]),
+        source("ai", [("Garota de Ipanema", "Tom Jobim"), ("Wave", "Tom Jobim")], latency=0.01, speculative=True, delay=1.0)
+    ])
+    results, elapsed = timed_search(orchestrator)
+    assert results == [("Garota de Ipanema", "catalog"), ("Wave", "ai")]
+    assert elapsed < 0.5
+
+
+def test_worst_case_is_the_slowest_useful_source_not_the_sum():
+    # Spotify hangs until its timeout; AI started speculatively and answers meanwhile
+    orchestrator = SearchOrchestrator([
+        source("spotify", [], latency=5.0, timeout=0.15),
+        source("ai", [("A", "y"), ("B", "y")], latency=0.1, speculative=True, delay=0.02)
+    ])
+    results, elapsed = timed_search(orchestrator)
+    assert results == [("A", "ai"), ("B", "ai")]
+    assert elapsed < 0.25
+
+
+def test_search_stops_once_the_limit_is_reached():
+    cancelled = []
+    orchestrator = SearchOrchestrator([
+        source("catalog", [(str(n), "x") for n in range(5)]),
+        source("spotify", [("late", "x")], latency=1.0, cancelled=cancelled)
+    ], limit=3)
+    results, elapsed = timed_search(orchestrator)
+    assert [title for title, _ in results] == ["0", "1", "2"]
+    assert cancelled == ["spotify"]
+    assert elapsed < 0.5
+
+
+class FakeChat:
+    async def send_message(self, text):
+        return json.dumps([
+            {"title": "Yesterday", "artist": "The Beatles", "genre": "Rock", "year": 1965, "popularity": 9},
+            {"title": "Yesterday Once More", "artist": "Carpenters", "genre": "Pop", "year": "1973", "popularity": 7}
+        ])
+
+
+class FakeCache:
+    def __init__(self):
+        self.writes = []
+
+    async def get_similar_result(self, cache_type, data, text_field, max_age_hours=24, threshold=None):
+        return None
+
+    async def set_similar_result(self, cache_type, data, text_field, result):
+        self.writes.append((cache_type, data[text_field], result))
+
+
+def test_intelligent_search_merges_catalog_and_ai_and_caches_the_ranking():
+    catalog = SongCatalog()
+    catalog.load_file()
+    gateway = LLMGateway("key", chat_factory=lambda *args: FakeChat(), message_factory=lambda text: text)
+    cache = FakeCache()
+    service = MusicAPIService(cache_service=cache, llm_gateway=gateway, catalog=catalog)
+    service.spotify = None
+
+    results = asyncio.run(service.intelligent_search("yesterday beatles"))
+    assert [(song["title"], song["source"]) for song in results] == [
+        ("Yesterday", "catalog"),
+        ("Yesterday Once More", "ai")
+    ]
+    assert cache.writes == [("intelligent_search", "yesterday beatles", results)]
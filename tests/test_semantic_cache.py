@@ -0,0 +1,68 @@
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend"))
+
+from cache_service import CacheService  # noqa: E402
+from perf.stubs import InMemoryDatabase  # noqa: E402
+from semantic_index import SemanticIndex, normalize_text  # noqa: E402
+
+
+def test_normalize_text_folds_case_accents_and_spacing():
+    assert normalize_text("  Rock   Nacionál! ") == "rock nacional"
+    assert normalize_text("Forró pé-de-serra") == "forro pe de serra"
+
+
+def test_index_finds_close_prompts_only():
+    index = SemanticIndex(threshold=0.85)
+    index.add("style", "musica gospel", "gospel")
+    index.add("style", "rock anos 80", "80s")
+
+    assert index.nearest("style", "Músicas Gospel")[1] == "gospel"
+    # Numbers must match exactly
+    assert index.nearest("style", "rock anos 90") is None
+    assert index.nearest("style", "samba") is None
+    # Namespaces do not leak into each other
+    assert index.nearest("query", "musica gospel") is None
+    assert index.nearest("style", "rock pop", threshold=0.1) is None
+
+    index.discard("style", "Música Gospel")
+    assert index.nearest("style", "musicas gospel") is None
+
+
+def test_index_drops_least_recently_used_entries():
+    index = SemanticIndex(max_entries=2)
+    index.add("q", "aquarela", 1)
+    index.add("q", "asa branca", 2)
+    index.nearest("q", "aquarela")
+    index.add("q", "garota de ipanema", 3)
+    assert len(index) == 2
+    assert index.nearest("q", "asa branca") is None
+    assert index.nearest("q", "aquarela")[1] == 1
+
+
+def test_near_duplicate_prompts_reuse_cached_results():
+    db = InMemoryDatabase(latency=0)
+    cache = CacheService(db)
+    data = {"style": "Sertanejo Universitário", "duration": 60, "energy": "high", "audience": "general"}
+
+    async def scenario():
+        await cache.set_similar_result("semantic_test", data, "style", {"repertoire": ["Evidências"]})
+        assert await cache.get_similar_result("semantic_test", {**data, "style": "sertanejo  universitario "}, "style") == {"repertoire": ["Evidências"]}
+        assert await cache.get_similar_result("semantic_test", {**data, "style": "sertanejo universitarios"}, "style") == {"repertoire": ["Evidências"]}
+        # Other fields must still match exactly
+        assert await cache.get_similar_result("semantic_test", {**data, "style": "sertanejo universitarios", "duration": 90}, "style") is None
+        assert await cache.get_similar_result("semantic_test", {**data, "style": "sertanejo"}, "style") is None
+
+        # A restarted process rebuilds the index from stored entries
+        restarted = CacheService(db)
+        assert await restarted.warm_semantic_index() == 1
+        assert await restarted.get_similar_result("semantic_test", {**data, "style": "sertanejo universitarios"}, "style") == {"repertoire": ["Evidências"]}
+
+    asyncio.run(scenario())
+    stats = cache.get_live_stats()["semantic_test"]["mongo"]
+    # Both services report to the same registry
+    assert (stats["hits"], stats["similar_hits"], stats["misses"]) == (1, 2, 2)
+    assert stats["hit_ratio"] == 0.6
@@ -0,0 +1,72 @@
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend"))
+
+from slow_query_log import SlowQueryListener, command_shape, query_shape  # noqa: E402
+
+
+class Event:
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+
+def started(request_id, command_name, command):
+    return Event(command_name=command_name, command=command, database_name="music", request_id=request_id, connection_id=("localhost", 27017))
+
+
+def succeeded(request_id, command_name, duration_ms):
+    return Event(command_name=command_name, duration_micros=int(duration_ms * 1000), request_id=request_id, connection_id=("localhost", 27017))
+
+
+class FakeDatabase:
+    def __init__(self, calls):
+        self.calls = calls
+
+    def command(self, command):
+        self.calls.append(command)
+        return {"queryPlanner": {"winningPlan": {"stage": "SORT", "inputStage": {"stage": "COLLSCAN"}}}}
+
+
+class FakeClient:
+    def __init__(self):
+        self.calls = []
+
+    def __getitem__(self, name):
+        return FakeDatabase(self.calls)
+
+
+def test_query_shape_hides_values():
+    shape = query_shape({"room_id": "r1", "title": re.compile("love", re.I), "created_at": {"$gt": 5}, "tags": ["a", "b"]})
+    assert shape == {"room_id": "?", "title": "?regex", "created_at": {"$gt": "?"}, "tags": ["?"]}
+
+    aggregate = command_shape("aggregate", {"aggregate": "ai_cache", "pipeline": [{"$match": {"cache_type": "x"}}, {"$group": {"_id": "$cache_type"}}]})
+    assert aggregate == {"pipeline": [{"$match": {"cache_type": "?"}}, {"$group": "..."}]}
+
+
+def test_slow_commands_are_logged_and_explained_once():
+    listener = SlowQueryListener(threshold_ms=50, explain=True)
+    client = FakeClient()
+    listener.attach(client)
+
+    for request_id, duration in ((1, 10), (2, 80), (3, 120)):
+        listener.started(started(request_id, "find", {"find": "recordings", "filter": {"room_id": f"room-{request_id}"}, "lsid": {"id": 1}}))
+        listener.succeeded(succeeded(request_id, "find", duration))
+
+    # Commands without filters are ignored entirely
+    listener.started(started(4, "insert", {"insert": "songs", "documents": [{}]}))
+    listener.succeeded(succeeded(4, "insert", 500))
+
+    report = listener.report()
+    assert [entry["duration_ms"] for entry in report["slow_queries"]] == [80, 120]
+    assert report["slow_queries"][0]["shape"] == {"filter": {"room_id": "?"}}
+
+    deadline = time.monotonic() + 2
+    while not listener.plans and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert len(client.calls) == 1
+    assert "lsid" not in client.calls[0]["explain"]
+    assert listener.report()["plans"][0]["stages"] == ["COLLSCAN", "SORT"]
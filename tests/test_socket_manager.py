@@ -0,0 +1,91 @@
+import asyncio
+import socket
+import sys
+from pathlib import Path
+
+import socketio
+import uvicorn
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend"))
+
+from socket_manager import AsyncLocalManager, LocalPubSubBroker, create_client_manager  # noqa: E402
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def make_worker(broker_url):
+    sio = socketio.AsyncServer(async_mode="asgi", client_manager=AsyncLocalManager(broker_url))
+
+    @sio.event
+    async def join_room(sid, data):
+        await sio.enter_room(sid, data["room_id"])
+        return "joined"
+
+    return sio, socketio.ASGIApp(sio)
+
+
+async def wait_until(predicate, timeout=5.0):
+    async def poll():
+        while not predicate():
+            await asyncio.sleep(0.01)
+    await asyncio.wait_for(poll(), timeout)
+
+
+async def start_worker(app, port):
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    task = asyncio.create_task(server.serve())
+    await wait_until(lambda: server.started)
+    return server, task
+
+
+def test_create_client_manager_selects_backend():
+    assert create_client_manager(None) is None
+    assert create_client_manager("") is None
+    assert isinstance(create_client_manager("local://127.0.0.1:1234"), AsyncLocalManager)
+    assert isinstance(create_client_manager("redis://localhost:6379/0"), socketio.AsyncRedisManager)
+
+
+def test_emit_from_one_worker_reaches_client_on_another():
+    async def scenario():
+        broker = LocalPubSubBroker(port=0)
+        await broker.start()
+        broker_url = f"local://127.0.0.1:{broker.port}"
+
+        sio_a, app_a = make_worker(broker_url)
+        sio_b, app_b = make_worker(broker_url)
+        port_a, port_b = free_port(), free_port()
+        server_a, task_a = await start_worker(app_a, port_a)
+        server_b, task_b = await start_worker(app_b, port_b)
+
+        received = asyncio.Queue()
+        client = socketio.AsyncClient()
+        client.on("playlist_updated", received.put_nowait)
+
+        try:
+            # The client only talks to worker B
+            await client.connect(f"http://127.0.0.1:{port_b}", transports=["websocket"])
+            assert await client.call("join_room", {"room_id": "room-1"}) == "joined"
+
+            # Worker B's manager subscribes once it has a client; A only publishes
+            await wait_until(lambda: len(broker.subscribers.get("socketio", ())) >= 1)
+
+            # A REST handler on worker A broadcasts to the room
+            await sio_a.emit("playlist_updated", {"action": "song_added", "song_id": "s1"}, room="room-1")
+            message = await asyncio.wait_for(received.get(), timeout=5)
+            assert message == {"action": "song_added", "song_id": "s1"}
+
+            # Rooms the client never joined stay silent
+            await sio_a.emit("playlist_updated", {"action": "other"}, room="room-2")
+            await asyncio.sleep(0.2)
+            assert received.empty()
+        finally:
+            await client.disconnect()
+            server_a.should_exit = server_b.should_exit = True
+            await asyncio.gather(task_a, task_b)
+            await broker.stop()
+
+    asyncio.run(scenario())
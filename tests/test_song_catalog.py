@@ -0,0 +1,80 @@
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend"))
+
+from perf.stubs import InMemoryDatabase  # noqa: E402
+from song_catalog import SongCatalog, tokenize  # noqa: E402
+
+
+def seeded() -> SongCatalog:
+    catalog = SongCatalog()
+    catalog.load_file()
+    catalog.add_many([
+        {"id": "s1", "title": "Garota de Ipanema", "artist": "Tom Jobim", "lyrics": "Olha que coisa mais linda", "chords": "Fmaj7 G7"},
+        {"id": "s2", "title": "Águas de Março", "artist": "Elis Regina", "lyrics": "É pau, é pedra, é o fim do caminho", "chords": "Bb"},
+        {"id": "s3", "title": "Imagine", "artist": "Imagine Dragons Tribute", "lyrics": "Cover", "chords": "C"}
+    ])
+    return catalog
+
+
+def test_tokenize_strips_accents_and_underscores():
+    assert tokenize("Águas_de  Março!") == ["aguas", "de", "marco"]
+
+
+def test_ranking_weights_title_and_artist_over_lyrics():
+    catalog = seeded()
+    # "imagine" in both title and artist outranks title and lyrics
+    assert [song["artist"] for _, song in catalog.search("imagine")[:2]] == ["Imagine Dragons Tribute", "John Lennon"]
+    assert catalog.search("lennon")[0][1]["title"] == "Imagine"
+    assert catalog.search("aguas de marco")[0][1]["id"] == "s2"
+    # Lyrics alone (chord marks removed) are enough to find a song
+    assert catalog.search("whisper words of wisdom")[0][1]["title"] == "Let It Be"
+    assert catalog.search("no hell below us")[0][1]["title"] == "Imagine"
+
+
+def test_best_match_tolerates_typos_but_not_partial_titles():
+    catalog = seeded()
+    assert catalog.best_match("Garota de Ipanemma", "Jobim")["id"] == "s1"
+    assert catalog.best_match("let_it_be", "")["title"] == "Let It Be"
+    assert catalog.best_match("yesterday beatles")["title"] == "Yesterday"
+    assert catalog.best_match("Imagine", "John Lennon")["artist"] == "John Lennon"
+    assert catalog.best_match("let") is None
+    assert catalog.best_match("Yesterday", "Queen") is None
+    assert catalog.best_match("Ipanema") is None
+
+
+def test_updates_and_duplicates_keep_one_current_entry():
+    catalog = seeded()
+    size = len(catalog)
+    catalog.add({"id": "s4", "title": "garota de ipanema", "artist": "Tom  Jobim", "lyrics": "Moça do corpo dourado", "chords": "F"})
+    assert len(catalog) == size
+    assert catalog.best_match("Garota de Ipanema")["id"] == "s4"
+    # The old lyrics are gone from the index
+    assert not catalog.search("olha que coisa mais linda")
+
+    catalog.update("s4", {"key": "G", "chords": "G A7"})
+    assert catalog.best_match("Garota de Ipanema")["chords"] == "G A7"
+    catalog.update("missing", {"key": "D"})
+
+    # s1 is a separate document now shadowed by s4: transposing it must not touch s4
+    catalog.update("s1", {"key": "E", "chords": "E B7"})
+    assert catalog.best_match("Garota de Ipanema")["chords"] == "G A7"
+    assert catalog.get("s1") is None and catalog.get("s4")["key"] == "G"
+    assert catalog.same_song("s1")["id"] == "s4"
+
+
+def test_loads_the_songs_collection():
+    db = InMemoryDatabase(latency=0)
+    catalog = SongCatalog()
+
+    async def scenario():
+        await db.songs.insert_one({"id": "a", "title": "Evidências", "artist": "Chitãozinho & Xororó"})
+        await db.songs.insert_one({"id": "b", "title": "Evidencias", "artist": "Chitaozinho & Xororo"})
+        return await catalog.load_collection(db.songs)
+
+    assert asyncio.run(scenario()) == 2
+    assert len(catalog) == 1
+    assert catalog.best_match("evidencias")["id"] == "b"
@@ -0,0 +1,91 @@
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+import pytest
+from pydantic import BaseModel
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend"))
+
+from structured_output import (  # noqa: E402
+    StructuredOutputError,
+    extract_json,
+    parse_structured,
+)
+
+
+class Song(BaseModel):
+    title: str
+    artist: str
+    popularity: int = 5
+
+
+def test_fences_and_prose_are_ignored():
+    assert extract_json('Aqui está:\n```json\n{"key": "G", "tempo": 90}\n```\nBom ensaio!') == {"key": "G", "tempo": 90}
+    assert extract_json('Resposta: [1, 2, 3] fim') == [1, 2, 3]
+
+
+def test_brackets_in_prose_before_the_value_are_skipped():
+    text = 'Use [Verso 1] e [Refrão] assim:\n{"lyrics_with_chords": "[Verso 1]\\nC G", "chords": "C - G"}'
+    assert extract_json(text) == {"lyrics_with_chords": "[Verso 1]\nC G", "chords": "C - G"}
+
+
+def test_braces_inside_strings_do_not_end_the_value():
+    assert extract_json('{"a": "x } ] \\" {", "b": 1} {"c": 2}') == {"a": 'x } ] " {', "b": 1}
+
+
+def test_trailing_commas_are_tolerated():
+    assert extract_json('{"chords": ["C", "G",], "key": "C",}') == {"chords": ["C", "G"], "key": "C"}
+
+
+def test_truncated_values_are_closed_without_partial_values():
+    # "tempo": 1 may have been 120, and the lyrics were cut mid-word: both are dropped
+    assert extract_json('{"key": "C", "tempo": 1') == {"key": "C"}
+    assert extract_json('{"chords": "C - G", "lyrics": "Verso 1\\nMeu can') == {"chords": "C - G"}
+    assert extract_json('[{"title": "A", "artist": "B"}, {"title": "C", "art') == [{"title": "A", "artist": "B"}, {"title": "C"}]
+    assert extract_json('{"key": "C", "nested": {"a": [1, 2], "b": "x"') == {"key": "C", "nested": {"a": [1, 2], "b": "x"}}
+    # A dangling key is dropped
+    assert extract_json('{"key": "C", "tempo":') == {"key": "C"}
+    with pytest.raises(StructuredOutputError):
+        extract_json('{"key": "C", "tempo":', repair=False)
+
+
+def test_no_json_raises():
+    with pytest.raises(StructuredOutputError):
+        extract_json("Desculpe, não sei.")
+
+
+def test_parse_structured_validates_and_keeps_good_list_items():
+    text = '[{"title": "A", "artist": "B", "popularity": 9}, {"title": "sem artista"}, {"title": "C", "artist": "D"}]'
+    songs = parse_structured(text, List[Song])
+    assert [(song.title, song.popularity) for song in songs] == [("A", 9), ("C", 5)]
+    with pytest.raises(StructuredOutputError):
+        parse_structured('[{"title": "sem artista"}]', List[Song])
+    with pytest.raises(StructuredOutputError):
+        parse_structured('{"key": "C"}', list)
+    assert parse_structured('{"key": "C"}', dict) == {"key": "C"}
+
+
+def test_values_nested_in_a_false_start_are_found():
+    assert extract_json('Notas: [1 - intro, {"key": "G", "tempo": 90} fim') == {"key": "G", "tempo": 90}
+    assert extract_json('[nota] e [2 compassos] depois [{"title": "A", "artist": "B"}]') == [{"title": "A", "artist": "B"}]
+
+
+def test_scan_is_linear_with_unclosed_brackets_in_prose():
+    def elapsed(count):
+        text = " ".join(f"[{n} compasso" for n in range(count)) + ' {"key": "C"}'
+        start = time.perf_counter()
+        assert extract_json(text) == {"key": "C"}
+        return time.perf_counter() - start
+
+    elapsed(100)
+    # Quadratic rescanning took seconds here; a single pass takes milliseconds
+    assert elapsed(4000) < 0.5
+
+
+def test_long_truncated_reply_is_repaired():
+    item = '{"title": "Música", "artist": "Artista", "popularity": 7}'
+    reply = "[" + ", ".join([item] * 2000) + ', {"title": "Fim'
+    # The cut-off last song closes as an empty object, which validation drops
+    assert len(parse_structured(reply, List[Song])) == 2000
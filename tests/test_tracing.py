@@ -0,0 +1,105 @@
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from motor.motor_asyncio import AsyncIOMotorClient
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend"))
+
+from tracing import JsonlExporter, TracedDatabase, Tracer, TracingMiddleware, current_trace_id  # noqa: E402
+
+
+class MemoryExporter:
+    def __init__(self):
+        self.spans = []
+
+    def export(self, spans):
+        self.spans.extend(spans)
+
+
+def wait_for_spans(exporter, count, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while len(exporter.spans) < count and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return exporter.spans
+
+
+def test_request_trace_nests_spans_and_returns_header():
+    exporter = MemoryExporter()
+    tracer = Tracer(exporter)
+    app = FastAPI()
+
+    @app.get("/songs/{song_id}")
+    async def get_song(song_id: str):
+        with tracer.span("cache.get", "cache"):
+            with tracer.span("mongo.find_one", "db", collection="songs"):
+                await asyncio.sleep(0)
+        return {"trace_id": current_trace_id()}
+
+    app.add_middleware(TracingMiddleware, tracer=tracer)
+    response = TestClient(app).get("/songs/abc")
+
+    trace_id = response.headers["x-trace-id"]
+    assert response.json() == {"trace_id": trace_id}
+
+    spans = {span["name"]: span for span in wait_for_spans(exporter, 3)}
+    root = spans["GET /songs/{song_id}"]
+    assert root["parent_id"] is None
+    assert root["attributes"]["status"] == 200
+    assert spans["cache.get"]["parent_id"] == root["span_id"]
+    assert spans["mongo.find_one"]["parent_id"] == spans["cache.get"]["span_id"]
+    assert {span["trace_id"] for span in spans.values()} == {trace_id}
+
+
+def test_incoming_trace_id_is_kept():
+    tracer = Tracer()
+    app = FastAPI()
+    app.add_middleware(TracingMiddleware, tracer=tracer)
+    trace_id = "0123456789abcdef0123456789abcdef"
+
+    response = TestClient(app).get("/missing", headers={"X-Trace-Id": trace_id})
+    assert response.headers["x-trace-id"] == trace_id
+
+
+def test_spans_outside_a_trace_are_noops():
+    tracer = Tracer(MemoryExporter())
+    with tracer.span("mongo.find_one") as span:
+        assert span is None
+    assert current_trace_id() is None
+
+
+def test_traced_database_wraps_motor_operations(tmp_path):
+    class RecordingExporter(JsonlExporter):
+        spans = []
+
+        def export(self, spans):
+            super().export(spans)
+            self.spans.extend(spans)
+
+    exporter = RecordingExporter(str(tmp_path / "traces.jsonl"))
+    tracer = Tracer(exporter)
+
+    async def scenario():
+        client = AsyncIOMotorClient("mongodb://127.0.0.1:1", serverSelectionTimeoutMS=50)
+        db = TracedDatabase(client["test"], tracer)
+        assert db.songs.name == "songs"
+        with tracer.trace("GET /songs"):
+            with pytest.raises(Exception):
+                await db.songs.find_one({"id": "x"})
+            with pytest.raises(Exception):
+                await db.songs.find({}).sort("title").limit(5).to_list(5)
+        client.close()
+
+    asyncio.run(scenario())
+    by_name = {span["name"]: span for span in wait_for_spans(exporter, 3)}
+    assert by_name["mongo.find_one"]["status"] == "error"
+    assert by_name["mongo.find"]["attributes"]["collection"] == "songs"
+
+    lines = (tmp_path / "traces.jsonl").read_text().splitlines()
+    assert len(lines) == 3
+    assert json.loads(lines[0])["name"] == "GET /songs"